@@ -0,0 +1,115 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import json
+import tracemalloc
+
+from zwave.message import SerialAPIGetCapabilities
+from zwave.message import SerialAPIGetInitData
+from zwave.message import ZWGetControllerCapabilities
+from zwave.packet import PacketParser
+
+from . import traffic
+
+
+# Memory used per frame kept in a traffic history
+#
+# Usage:
+#     python -m benchmarks.memory [--frames N]
+
+DESCRIPTION = 'Memory used per frame kept in a traffic history'
+
+
+def retained(create, count):
+    """Measure memory retained by objects
+
+    Arguments:
+        create (callable): returns a list of count objects
+        count (int): number of objects created
+
+    Return:
+        dict with bytes and blocks retained per object
+
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        objects = create()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    stats = after.compare_to(before, 'filename')
+    size = sum(stat.size_diff for stat in stats)
+    blocks = sum(stat.count_diff for stat in stats)
+    assert len(objects) == count
+    return {
+        'bytes_per_frame': size / count,
+        'blocks_per_frame': blocks / count,
+    }
+
+
+def parse(frames):
+    """Parse frames into a list of Packets"""
+    parser = PacketParser()
+    packets = []
+    for frame in frames:
+        packets.extend(parser.feed(frame))
+    return packets
+
+
+def run(frames=10000):
+    """Measure memory per frame for Packets and Messages
+
+    Keyword Arguments:
+        frames (int): number of frames to keep, default is 10000
+
+    Return:
+        dict of benchmark name to results
+
+    """
+    results = {}
+
+    data = traffic.synthetic(frames)
+    results['packet'] = retained(lambda: parse(data), frames)
+
+    for name, cls, frame in [
+            ('serial_api_get_init_data', SerialAPIGetInitData,
+             traffic.INIT_DATA),
+            ('serial_api_get_capabilities', SerialAPIGetCapabilities,
+             traffic.CAPABILITIES),
+            ('zw_get_controller_capabilities', ZWGetControllerCapabilities,
+             traffic.CONTROLLER_CAPABILITIES)]:
+        packets = parse([frame] * frames)
+        results[name] = retained(lambda: [cls(p) for p in packets], frames)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument('--frames', type=int, default=10000,
+                        help='number of frames (default: 10000)')
+    args = parser.parse_args()
+
+    print(json.dumps(run(frames=args.frames), indent=4, sort_keys=True))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+
+from zwave.message import decode
+from zwave.message import MESSAGES
+from zwave.packet import Packet
+from zwave.packet import PacketParser
+from zwave.packet import Preamble
+from zwave.ring import RingBuffer
+from zwave.trace import RecordingTracer
+
+from . import memory
+from . import traffic
+
+
+# Speed of parsing, encoding and message decoding
+#
+# Reports frames/sec, ns/frame and ns/byte for every benchmark, with the best
+# time of several runs. Allocations are the memory blocks and bytes kept per
+# frame by the benchmark outputs, as measured by tracemalloc. Temporary
+# objects freed within a frame are not counted.
+#
+# Usage:
+#     python -m benchmarks.speed [--frames N] [--repeat N] [--capture FILE]
+#         [--output FILE] [--compare FILE]
+
+DESCRIPTION = 'Speed of parsing, encoding and message decoding'
+
+
+# Frame of every registered Message class, by MessageType
+MESSAGE_FRAMES = {
+    frame[3]: frame for frame in [
+        traffic.INIT_DATA, traffic.CAPABILITIES,
+        traffic.CONTROLLER_CAPABILITIES, traffic.MEMORY_ID]
+}
+
+
+def best_time(func, repeat):
+    """Best run time of a function, without garbage collection
+
+    Arguments:
+        func (callable): to time
+        repeat (int): number of runs
+
+    Return:
+        int nanoseconds
+
+    """
+    best = None
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter_ns()
+            func()
+            elapsed = time.perf_counter_ns() - start
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        if enabled:
+            gc.enable()
+    return best
+
+
+def measure(func, size, repeat):
+    """Measure speed and allocations of a benchmark
+
+    Arguments:
+        func (callable): returns a list with one output per frame
+        size (int): bytes processed by func
+        repeat (int): number of timed runs
+
+    Return:
+        dict of results
+
+    """
+    frames = len(func())
+    elapsed = max(1, best_time(func, repeat))
+    kept = memory.retained(func, frames)
+    return {
+        'frames': frames,
+        'frames_per_sec': frames * 1e9 / elapsed,
+        'ns_per_frame': elapsed / frames,
+        'ns_per_byte': elapsed / size,
+        'allocations_per_frame': kept['blocks_per_frame'],
+        'allocated_bytes_per_frame': kept['bytes_per_frame'],
+    }
+
+
+def parse(chunks, tracer=None):
+    """Parse chunks into a list of Packets, skipping malformed bytes"""
+    parser = PacketParser(strict=False)
+    parser.tracer = tracer
+    packets = []
+    for chunk in chunks:
+        packets.extend(parser.feed(chunk))
+    return packets
+
+
+def run_mix(chunks, repeat):
+    """Run the parsing and encoding benchmarks on a traffic mix
+
+    Arguments:
+        chunks (list(bytes)): traffic, as read from the controller
+        repeat (int): number of timed runs
+
+    Return:
+        dict of benchmark name to results
+
+    """
+    size = sum(len(chunk) for chunk in chunks)
+    packets = parse(chunks)
+    sof = [Packet.create(packet_type=p.packet_type,
+                         message_type=p.message_type, body=p.body)
+           for p in packets if p.preamble == Preamble.SOF]
+    fields = [(p.packet_type, p.message_type, p.body) for p in sof]
+    sof_size = sum(p.length + 2 for p in sof)
+
+    def update():
+        parser = PacketParser(strict=False)
+        packets = []
+        for chunk in chunks:
+            for n in chunk:
+                packet = parser.update(n)
+                if packet is not None:
+                    packets.append(packet)
+        return packets
+
+    def ring():
+        ring = RingBuffer()
+        views = []
+        for chunk in chunks:
+            ring.write(chunk)
+            views.extend(ring.frames())
+        return views
+
+    def create():
+        return [Packet.create(packet_type=packet_type,
+                              message_type=message_type, body=body)
+                for packet_type, message_type, body in fields]
+
+    results = {
+        'packet_parser_update': measure(update, size, repeat),
+        'packet_parser_feed': measure(lambda: parse(chunks), size, repeat),
+        'packet_parser_feed_traced': measure(
+                lambda: parse(chunks, tracer=RecordingTracer()), size, repeat),
+        'ring_buffer_frames': measure(ring, size, repeat),
+        'decode': measure(lambda: [decode(p) for p in packets], size,
+                          repeat),
+    }
+    if sof:
+        results.update({
+            'packet_create': measure(create, sof_size, repeat),
+            'packet_bytes': measure(lambda: [p.bytes() for p in sof],
+                                    sof_size, repeat),
+            'packet_validate_checksum': measure(
+                    lambda: [p.validate_checksum() for p in sof], sof_size,
+                    repeat),
+        })
+    return results
+
+
+def run_messages(frames, repeat):
+    """Run the constructor benchmark of every registered Message class
+
+    Arguments:
+        frames (int): number of messages constructed
+        repeat (int): number of timed runs
+
+    Return:
+        dict of class name to results
+
+    """
+    results = {}
+    for (_, message_type), cls in sorted(MESSAGES.items()):
+        frame = MESSAGE_FRAMES.get(message_type)
+        if frame is None:
+            continue
+        packets = parse([frame] * frames)
+        results[cls.__name__] = measure(
+                lambda: [cls(p) for p in packets], len(frame) * frames, repeat)
+    return results
+
+
+def run(frames=10000, repeat=5, capture=None):
+    """Run all benchmarks
+
+    Keyword Arguments:
+        frames (int): number of synthetic frames, default is 10000
+        repeat (int): number of timed runs, default is 5
+        capture (str): path to a capture for the captured traffic mix,
+            default is None to skip it
+
+    Return:
+        dict of results
+
+    """
+    results = {
+        'python': '%s %s' % (platform.python_implementation(),
+                             platform.python_version()),
+        'platform': platform.platform(),
+        'frames': frames,
+        'repeat': repeat,
+        'synthetic': run_mix(traffic.synthetic(frames), repeat),
+        'messages': run_messages(frames, repeat),
+        'memory': memory.run(frames),
+    }
+    if capture is not None:
+        results['captured'] = run_mix(traffic.captured(capture), repeat)
+    return results
+
+
+def compare(previous, current):
+    """Print the frames/sec of current relative to previous results
+
+    Arguments:
+        previous (dict): results of an earlier run
+        current (dict): results of this run
+
+    """
+    for group in ['synthetic', 'captured', 'messages']:
+        for name, result in sorted(current.get(group, {}).items()):
+            before = previous.get(group, {}).get(name)
+            if before is None:
+                continue
+            print('%s.%s: %.2fx' % (group, name, result['frames_per_sec'] /
+                                    before['frames_per_sec']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument('--frames', type=int, default=10000,
+                        help='number of frames (default: 10000)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of timed runs (default: 5)')
+    parser.add_argument('--capture', default=None,
+                        help='capture for the captured traffic mix '
+                             '(default: none)')
+    parser.add_argument('--output', default=None,
+                        help='write JSON results to file (default: stdout)')
+    parser.add_argument('--compare', default=None,
+                        help='JSON results of an earlier run to compare with '
+                             '(default: none)')
+    args = parser.parse_args()
+
+    results = run(frames=args.frames, repeat=args.repeat,
+                  capture=args.capture)
+
+    if args.output is None:
+        json.dump(results, sys.stdout, indent=4, sort_keys=True)
+        print()
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import random
+
+from zwave.capture import CaptureReader
+from zwave.capture import Direction
+from zwave.packet import Packet
+from zwave.packet import PacketType
+from zwave.packet import MessageType
+
+
+# SERIAL_API_GET_INIT_DATA response with nodes 1, 2, 3 and 17
+INIT_DATA = bytes(Packet.create(
+        packet_type=PacketType.RESPONSE,
+        message_type=MessageType.SERIAL_API_GET_INIT_DATA,
+        body=[0x05, 0x00, 0x1d, 0x07, 0x00, 0x01] + [0x00] * 26 +
+             [0x05, 0x00]).bytes())
+
+# SERIAL_API_GET_CAPABILITIES response
+CAPABILITIES = bytes(Packet.create(
+        packet_type=PacketType.RESPONSE,
+        message_type=MessageType.SERIAL_API_GET_CAPABILITIES,
+        body=[0x10, 0x20, 0x35, 0x86, 0x19, 0xa7, 0x87, 0x23,
+              0x07, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+              0x00, 0x00, 0xa7, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+              0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x81, 0x05,
+              0x00, 0x80]).bytes())
+
+# ZW_GET_CONTROLLER_CAPABILITIES response
+CONTROLLER_CAPABILITIES = bytes(Packet.create(
+        packet_type=PacketType.RESPONSE,
+        message_type=MessageType.ZW_GET_CONTROLLER_CAPABILITIES,
+        body=[0x1c]).bytes())
+
+# MEMORY_GET_ID response with home id 0xc0ffee42 and node id 1
+MEMORY_ID = bytes(Packet.create(
+        packet_type=PacketType.RESPONSE,
+        message_type=MessageType.MEMORY_GET_ID,
+        body=[0xc0, 0xff, 0xee, 0x42, 0x01]).bytes())
+
+# APPLICATION_COMMAND_HANDLER request with a meter report from node 17
+METER_REPORT = bytes(Packet.create(
+        packet_type=PacketType.REQUEST,
+        message_type=MessageType.APPLICATION_COMMAND_HANDLER,
+        body=[0x00, 0x11, 0x0e, 0x32, 0x02, 0x21, 0x74, 0x00, 0x00, 0x12,
+              0x34, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00]).bytes())
+
+ACK = b'\x06'
+
+# Responses to discovery requests
+DISCOVERY = [INIT_DATA, CAPABILITIES, CONTROLLER_CAPABILITIES, MEMORY_ID]
+
+
+def synthetic(frames, seed=0):
+    """Synthetic traffic of ACKs, discovery responses and meter reports
+
+    Arguments:
+        frames (int): number of frames
+
+    Keyword Arguments:
+        seed (int): random seed, default is 0
+
+    Return:
+        list(bytes) of frames
+
+    """
+    rng = random.Random(seed)
+    choices = [ACK, METER_REPORT, METER_REPORT, METER_REPORT] + DISCOVERY
+    return [rng.choice(choices) for _ in range(frames)]
+
+
+def captured(path):
+    """Traffic read from the controller in a capture. Records are kept as
+    they were read, so a record may hold several or partial frames.
+
+    Arguments:
+        path (str): capture written by zwave.capture.CaptureWriter
+
+    Return:
+        list(bytes) of records
+
+    """
+    with CaptureReader(path) as reader:
+        return [record.data for record in reader
+                if record.direction == Direction.READ]
@@ -1,58 +1,36 @@
 import argparse
 import sys
+import time
 
 import serial
 
+from zwave.analyze import summarize
+from zwave.cache import DiscoveryCache
+from zwave.capture import CaptureReader
+from zwave.capture import CaptureWriter
+from zwave.capture import replay as replay_records
 from zwave.controller import ZWaveController
-from zwave.packet import Packet, Preamble, PacketType, MessageType
-from zwave.packet import PacketACK, PacketNAK, PacketCAN
-from zwave.message import SerialAPIGetInitData
-from zwave.message import SerialAPIGetCapabilities
-from zwave.message import ZWGetControllerCapabilities
+from zwave.controller import ZWaveControllerException
 
 
 def discover(z, args):
-    # Write request
-    z.write(SerialAPIGetInitData.create_request())
-
-    # ACK from controller
-    packet = z.read()
-    if packet.preamble != Preamble.ACK:
-        sys.stderr.write('Failed to get ACK: %s' % (packet))
+    cache = None if args.cache is None else DiscoveryCache(args.cache)
+    try:
+        discovery = z.discover(cache=cache)
+    except ZWaveControllerException as e:
+        sys.stderr.write('%s: %r' % (e, e.packet))
         sys.exit(1)
 
-    # Reply
-    packet = z.read()
-    if packet.preamble != Preamble.SOF:
-        sys.stderr.write('Failed to get SOF packet: %s' % (packet))
-        sys.exit(1)
-    print(packet)
+    serial_api_init_data = discovery.init_data
+    serial_api_capabilities = discovery.capabilities
+    zw_capabilities = discovery.controller_capabilities
 
-    # Parse packet
-    serial_api_init_data = SerialAPIGetInitData(packet)
     print('Serial API Init Data\n====================\n'
           'Version: %s\nSecondary: %s\nStatic Update: %s\nNodes: %s' % (
                 serial_api_init_data.version, serial_api_init_data.secondary,
                 serial_api_init_data.static_update,
                 serial_api_init_data.nodes))
 
-    # Write request
-    z.write(SerialAPIGetCapabilities.create_request())
-
-    # ACK from controller
-    packet = z.read()
-    if packet.preamble != Preamble.ACK:
-        sys.stderr.write('Failed to get ACK: %s' % (packet))
-        sys.exit(1)
-
-    # Reply
-    packet = z.read()
-    if packet.preamble != Preamble.SOF:
-        sys.stderr.write('Failed to get SOF packet: %s' % (packet))
-        sys.exit(1)
-
-    # Parse packet
-    serial_api_capabilities = SerialAPIGetCapabilities(packet)
     print('\nSerial API Capabilities\n=======================\n'
           'Version: %#04x\nManufacturer: %#04x\nProduct type: %#04x\n'
           'Product ID: %#04x' % (
@@ -64,28 +42,25 @@ def discover(z, args):
             ', '.join(['0x%02x' % x for x in
                       serial_api_capabilities.message_types])))
 
-    # Write request
-    z.write(ZWGetControllerCapabilities.create_request())
-
-    # ACK from controller
-    packet = z.read()
-    if packet.preamble != Preamble.ACK:
-        sys.stderr.write('Failed to get ACK: %s' % (packet))
-        sys.exit(1)
-
-    # Reply
-    packet = z.read()
-    if packet.preamble != Preamble.SOF:
-        sys.stderr.write('Failed to get SOF packet: %s' % (packet))
-        sys.exit(1)
-
-    zw_capabilities = ZWGetControllerCapabilities(packet)
     print('\nZW Controller Capabilities\n==========================\n'
           'Secondary: %s\nNon standard home id: %s\nSUC ID server: %s\n'
           'Was primary: %s\nStatic update: %s' % (
             zw_capabilities.secondary, zw_capabilities.non_standard_home_id,
             zw_capabilities.suc_id_server, zw_capabilities.was_primary,
             zw_capabilities.static_update_controller))
+    print('\nHome ID: %#010x\nNode ID: %d' % (
+            discovery.memory_id.home_id, discovery.memory_id.node_id))
+
+    # Refresh cache
+    if z.discovery_stale:
+        try:
+            current = z.revalidate(cache=cache)
+            if ([bytes(m.bytes()) for m in current] !=
+                    [bytes(m.bytes()) for m in discovery]):
+                print('\nController changed since cached')
+        except ZWaveControllerException as e:
+            sys.stderr.write('%s: %r' % (e, e.packet))
+            sys.exit(1)
 
     # Close
     z.close()
@@ -94,16 +69,48 @@ def switch(z, args):
     print('Switch!')
 
 
+def replay(z, args):
+    count = 0
+    start = time.monotonic()
+    with CaptureReader(args.capture_file) as reader:
+        for record, message in replay_records(reader, realtime=args.realtime):
+            count += 1
+            if args.realtime:
+                print('%.6f %s' % (record.timestamp / 1e9, message))
+    elapsed = time.monotonic() - start
+
+    print('%d packets in %.3fs (%.0f packets/s)' % (
+            count, elapsed, count / elapsed if elapsed else 0))
+
+
+def analyze(z, args):
+    start = time.monotonic()
+    summary = summarize(args.capture_file, processes=args.processes)
+    elapsed = time.monotonic() - start
+
+    for name, count in sorted(summary['frames'].items()):
+        print('%s: %d' % (name, count))
+    for name, value in sorted(summary['counters'].items()):
+        print('%s: %d' % (name, value))
+    count = sum(summary['frames'].values())
+    print('%d packets in %.3fs (%.0f packets/s)' % (
+            count, elapsed, count / elapsed if elapsed else 0))
+
+
 def main():
     parser = argparse.ArgumentParser(description='Run zwave commands')
     parser.add_argument('--device', default='/dev/tty.usbmodem1421',
                         help='device path (default: /dev/tty.usbmodem1421)')
+    parser.add_argument('--capture', default=None,
+                        help='record serial traffic to file (default: none)')
 
     subparsers = parser.add_subparsers(dest='COMMAND')
     subparsers.required = True
 
     parser_discover = subparsers.add_parser('discover')
     parser_discover.set_defaults(func=discover)
+    parser_discover.add_argument('--cache', default=None,
+                                 help='discovery cache file (default: none)')
 
     parser_switch = subparsers.add_parser('switch')
     parser_switch.set_defaults(func=switch)
@@ -111,15 +118,45 @@ def main():
                                 help='Node ID in the range of [1, 232]')
     parser_switch.add_argument('mode', choices=['on', 'off'])
 
+    parser_replay = subparsers.add_parser('replay')
+    parser_replay.set_defaults(func=replay)
+    parser_replay.add_argument('capture_file',
+                               help='capture recorded with --capture')
+    parser_replay.add_argument('--realtime', action='store_true',
+                               help='replay with original timing, and print '
+                                    'every packet (default: as fast as '
+                                    'possible)')
+
+    parser_analyze = subparsers.add_parser('analyze')
+    parser_analyze.set_defaults(func=analyze)
+    parser_analyze.add_argument('capture_file',
+                                help='capture recorded with --capture')
+    parser_analyze.add_argument('--processes', type=int, default=None,
+                                help='number of worker processes (default: '
+                                     'one per CPU)')
+
     args = parser.parse_args()
 
     z = None
+    if args.func in (replay, analyze):
+        args.func(z, args)
+        return
+
     try:
         z = ZWaveController(args.device)
     except serial.serialutil.SerialException:
         sys.stderr.write('Serial device [%s] not found' % (args.device))
 
-    args.func(z, args)
+    capture = None
+    if z is not None and args.capture is not None:
+        capture = CaptureWriter(args.capture)
+        z.capture = capture
+
+    try:
+        args.func(z, args)
+    finally:
+        if capture is not None:
+            capture.close()
 
 if __name__ == '__main__':
     main()
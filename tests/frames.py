@@ -0,0 +1,37 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+# Sample frames shared by the tests
+
+from zwave.packet import Packet
+
+
+# SERIAL_API_GET_INIT_DATA response
+RESPONSE = (b'\x01\x25\x01\x02\x05\x00\x1d\x07\x00\x00\x00\x00\x00\x00'
+            b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00'
+            b'\x00\x00\x00\x11\x00\x27\x00\x14\x05\x00\xe1')
+
+# Unsolicited APPLICATION_COMMAND_HANDLER request
+REQUEST = bytes(Packet.create(packet_type=0x00, message_type=0x04,
+                              body=[0x00, 0x02, 0x01, 0x20]).bytes())
+
+# Unsolicited APPLICATION_COMMAND_HANDLER carrying a basic report
+REPORT = bytes(Packet.create(packet_type=0x00, message_type=0x04,
+                             body=[0x00, 0x02, 0x03, 0x20, 0x03,
+                                   0xff]).bytes())
@@ -0,0 +1,198 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import os
+
+from hamcrest import *
+
+from frames import REQUEST
+from frames import RESPONSE
+
+from zwave.aio import AsyncZWaveController
+from zwave.controller import ZWaveControllerClosed
+from zwave.packet import Packet
+from zwave.packet import PACKET_CAN
+from zwave.packet import PACKET_NAK
+from zwave.packet import PacketACK
+from zwave.packet import PacketParserUnknownPreamble
+
+
+class TestAsyncZWaveController(object):
+
+    def setup(self):
+        self.master, self.slave = os.openpty()
+
+    def teardown(self):
+        os.close(self.slave)
+        os.close(self.master)
+
+    def run(self, coroutine, **kwargs):
+        """Run coroutine with a controller on the pty, with a timeout"""
+        async def main():
+            controller = AsyncZWaveController(os.ttyname(self.slave),
+                                              **kwargs)
+            try:
+                return await asyncio.wait_for(coroutine(controller), 5)
+            finally:
+                controller.close()
+        return asyncio.run(main())
+
+    def test_send(self):
+        """Send packet"""
+        async def send(controller):
+            await controller.send(Packet.create(packet_type=0x00,
+                                                message_type=0x02))
+        self.run(send)
+        assert_that(os.read(self.master, 16), equal_to(b'\x01\x03\x00\x02\xfe'))
+
+    def test_send_blocked(self):
+        """Send waits for the device without blocking the event loop"""
+        packet = Packet.create(packet_type=0x00, message_type=0x04,
+                               body=bytes(200))
+        data = bytes(packet.bytes()) * 1000
+
+        async def send(controller):
+            loop = asyncio.get_running_loop()
+            sending = asyncio.gather(*[controller.send(packet)
+                                       for _ in range(1000)])
+            # Nobody reads the pty, so the device stops accepting bytes
+            await asyncio.sleep(0.1)
+            blocked = not sending.done()
+
+            received = bytearray()
+            while len(received) < len(data):
+                received += await loop.run_in_executor(None, os.read,
+                                                       self.master, 65536)
+            await sending
+            return blocked, bytes(received)
+
+        blocked, received = self.run(send)
+        assert_that(blocked, equal_to(True))
+        assert_that(received, equal_to(data))
+
+    def test_send_closed(self):
+        """Send raises once closed"""
+        async def send(controller):
+            controller.close()
+            try:
+                await controller.send(Packet.create(packet_type=0x00,
+                                                    message_type=0x02))
+            except ZWaveControllerClosed as e:
+                return e
+
+        assert_that(self.run(send), instance_of(ZWaveControllerClosed))
+
+    def test_read(self):
+        """Read responses and unsolicited requests"""
+        async def read(controller):
+            os.write(self.master, b'\x06' + REQUEST + RESPONSE)
+            ack = await controller.read()
+            response = await controller.read()
+            async for request in controller:
+                return ack, response, request
+
+        ack, response, request = self.run(read)
+        assert_that(ack, instance_of(PacketACK))
+        assert_that(response.bytes(), equal_to(bytearray(RESPONSE)))
+        assert_that(request.bytes(), equal_to(bytearray(REQUEST)))
+
+        # Both SOF packets were ACKed
+        assert_that(os.read(self.master, 16), equal_to(b'\x06\x06'))
+
+    def test_read_error(self):
+        """Parsing exceptions are raised from read"""
+        async def read(controller):
+            os.write(self.master, b'\x02\x06')
+            try:
+                await controller.read()
+            except PacketParserUnknownPreamble as e:
+                error = e
+            return error, await controller.read()
+
+        error, ack = self.run(read)
+        assert_that(error, instance_of(PacketParserUnknownPreamble))
+        assert_that(ack, instance_of(PacketACK))
+
+    def test_close(self):
+        """Iteration stops once closed"""
+        async def iterate(controller):
+            controller.close()
+            return [packet async for packet in controller]
+
+        async def main():
+            controller = AsyncZWaveController(os.ttyname(self.slave))
+            return await iterate(controller)
+
+        assert_that(asyncio.run(main()), equal_to([]))
+
+    def test_bad_checksum_order(self):
+        """NAK for a corrupted packet goes before the ACK of the next one"""
+        async def read(controller):
+            os.write(self.master, RESPONSE[:-1] + b'\xe0' + RESPONSE)
+            return await controller.read()
+
+        response = self.run(read, strict=False)
+        assert_that(response.bytes(), equal_to(bytearray(RESPONSE)))
+        assert_that(os.read(self.master, 16), equal_to(b'\x15\x06'))
+
+    def test_queue_full(self):
+        """Oldest packets are dropped once the queue is full"""
+        async def read_all(controller):
+            # Unknown preamble marks the end of the packets
+            os.write(self.master, b'\x06\x15\x18\x02')
+            while controller.packet_parser.discarded_bytes == 0:
+                await asyncio.sleep(0.01)
+            return [await controller.read() for _ in range(2)]
+
+        assert_that(self.run(read_all, strict=False, packet_queue_size=2),
+                    equal_to([PACKET_NAK, PACKET_CAN]))
+
+    def test_close_wakes_read(self):
+        """Pending read raises once closed"""
+        async def read(controller):
+            task = asyncio.ensure_future(controller.read())
+            await asyncio.sleep(0)
+            controller.close()
+            try:
+                await task
+            except ZWaveControllerClosed as e:
+                return e
+
+        assert_that(self.run(read), instance_of(ZWaveControllerClosed))
+
+    def test_device_error(self):
+        """Device errors stop reading, and are raised from every read"""
+        async def read(controller):
+            def readinto(buffer):
+                raise OSError('device unplugged')
+            controller.device.readinto = readinto
+            os.write(self.master, b'\x06')
+            errors = []
+            for _ in range(2):
+                try:
+                    await controller.read()
+                except OSError as e:
+                    errors.append(e)
+            return errors, [packet async for packet in controller]
+
+        errors, unsolicited = self.run(read)
+        assert_that(errors, has_length(2))
+        assert_that(errors[0], same_instance(errors[1]))
+        assert_that(unsolicited, equal_to([]))
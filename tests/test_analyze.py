@@ -0,0 +1,109 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import pickle
+import random
+import shutil
+import tempfile
+
+from hamcrest import *
+
+from frames import REPORT
+from frames import RESPONSE
+
+from zwave.analyze import iter_decoded
+from zwave.analyze import summarize
+from zwave.capture import CaptureWriter
+from zwave.capture import Direction
+from zwave.packet import PACKET_ACK
+from zwave.packet import Packet
+from zwave.packet import PacketParser
+from zwave.stream import decoded
+from zwave.stream import iter_packets
+
+
+class TestAnalyze(object):
+
+    # Body holds a whole report and an ACK, which look like a frame boundary
+    WRAPPED = bytes(Packet.create(packet_type=0x00, message_type=0x04,
+                                  body=b'\x00' * 100 + REPORT + b'\x06' +
+                                  b'\x00' * 100).bytes())
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'capture.bin')
+
+        rng = random.Random(0)
+        frames = [b'\x06', REPORT, RESPONSE, self.WRAPPED,
+                  b'\x02', b'\x01\x02', RESPONSE[:-1] + b'\x00']
+        self.data = b''.join(rng.choice(frames) for _ in range(2000))
+        with CaptureWriter(self.path) as writer:
+            writer.record(Direction.WRITE, b'\x06' * 10)
+            i = 0
+            while i < len(self.data):
+                size = rng.randint(1, 300)
+                writer.record(Direction.READ, self.data[i:i + size])
+                i += size
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def expected(self):
+        return [(type(x), bytes(x.bytes())) for x in
+                decoded(iter_packets(self.data))]
+
+    def test_sequential(self):
+        """One process decodes the same as a lenient parser"""
+        for chunk_size in [500, 4096]:
+            actual = [(type(x), bytes(x.bytes())) for x in
+                      iter_decoded(self.path, processes=1,
+                                   chunk_size=chunk_size)]
+            assert_that(actual, equal_to(self.expected()))
+
+    def test_parallel(self):
+        """Chunks decoded in parallel are merged in order"""
+        for chunk_size in [500, 1009, 4096]:
+            actual = [(type(x), bytes(x.bytes())) for x in
+                      iter_decoded(self.path, processes=3,
+                                   chunk_size=chunk_size)]
+            assert_that(actual, equal_to(self.expected()))
+
+    def test_summarize(self):
+        """Frame and error counts are the same as sequential"""
+        parser = PacketParser(strict=False)
+        list(parser.feed(self.data))
+        summary = summarize(self.path, processes=3, chunk_size=700)
+        assert_that(summary, equal_to(summarize(self.path, processes=1)))
+        assert_that(summary['counters'], equal_to(parser.counters()))
+        assert_that(sum(summary['frames'].values()),
+                    equal_to(len(self.expected())))
+
+    def test_write_direction(self):
+        """Records of the other direction"""
+        assert_that(list(iter_decoded(self.path, processes=2,
+                                      direction=Direction.WRITE)),
+                    equal_to([PACKET_ACK] * 10))
+
+    def test_pickle(self):
+        """Parsed packets pickle, and control packets stay shared"""
+        packets = list(iter_packets(RESPONSE + b'\x06'))
+        copies = pickle.loads(pickle.dumps(packets))
+        assert_that(copies[0].bytes(), equal_to(RESPONSE))
+        assert_that(copies[1], same_instance(PACKET_ACK))
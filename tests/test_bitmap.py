@@ -0,0 +1,79 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from hamcrest import *
+
+from zwave.bitmap import NodeBitmap
+
+
+class TestNodeBitmap(object):
+
+    # Nodes 1, 2, 3, 10, 97, 98, 99, 102, 104, 225, 232
+    BITMAP = bytes([0x07, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+                    0x00, 0x00, 0x00, 0xa7, 0x00, 0x00, 0x00, 0x00, 0x00,
+                    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+                    0x00, 0x81])
+    NODES = [1, 2, 3, 10, 97, 98, 99, 102, 104, 225, 232]
+
+    def test_empty(self):
+        """Empty bitmap"""
+        bitmap = NodeBitmap()
+        assert_that(list(bitmap), equal_to([]))
+        assert_that(bitmap, has_length(0))
+        assert_that(bool(bitmap), equal_to(False))
+        assert_that(bitmap.to_bytes(29), equal_to(b'\x00' * 29))
+
+    def test_bad_id(self):
+        """Ids start at 1"""
+        assert_that(calling(NodeBitmap).with_args([0]), raises(ValueError))
+
+    def test_from_bytes(self):
+        """Round trip wire bitmap"""
+        bitmap = NodeBitmap.from_bytes(self.BITMAP)
+
+        assert_that(list(bitmap), equal_to(self.NODES))
+        assert_that(bitmap, has_length(len(self.NODES)))
+        assert_that(bitmap.to_bytes(29), equal_to(self.BITMAP))
+        assert_that(bitmap, equal_to(NodeBitmap(self.NODES)))
+
+    def test_contains(self):
+        """Membership"""
+        bitmap = NodeBitmap(self.NODES)
+        for x in range(-1, 300):
+            assert_that(x in bitmap, equal_to(x in self.NODES))
+
+    def test_set_algebra(self):
+        """Diff node lists"""
+        old = NodeBitmap([1, 2, 3, 10])
+        new = NodeBitmap([1, 3, 10, 11])
+
+        assert_that(list(new - old), equal_to([11]))
+        assert_that(list(old - new), equal_to([2]))
+        assert_that(list(old & new), equal_to([1, 3, 10]))
+        assert_that(list(old | new), equal_to([1, 2, 3, 10, 11]))
+        assert_that(list(old ^ new), equal_to([2, 11]))
+
+    def test_hash(self):
+        """Equal bitmaps hash equal"""
+        assert_that(hash(NodeBitmap([5, 6])),
+                    equal_to(hash(NodeBitmap.from_bytes(b'\x30'))))
+        assert_that(NodeBitmap([5]), is_not(equal_to(NodeBitmap([6]))))
+
+        # Check string functions work correctly
+        string = "%s %r" % (NodeBitmap([5]), NodeBitmap([5]))
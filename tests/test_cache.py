@@ -0,0 +1,96 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import shutil
+import tempfile
+
+from hamcrest import *
+
+from zwave.cache import Discovery
+from zwave.cache import DiscoveryCache
+from zwave.cache import identity
+from zwave.message import MemoryGetId
+from zwave.message import SerialAPIGetCapabilities
+from zwave.message import SerialAPIGetInitData
+from zwave.message import ZWGetControllerCapabilities
+from zwave.packet import Packet
+
+
+class TestDiscoveryCache(object):
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.json')
+        self.discovery = Discovery(
+                init_data=SerialAPIGetInitData(Packet.create(
+                        packet_type=0x01, message_type=0x02,
+                        body=[0x05, 0x00, 0x1d, 0x07] + [0x00] * 28 +
+                             [0x05, 0x00])),
+                capabilities=SerialAPIGetCapabilities(Packet.create(
+                        packet_type=0x01, message_type=0x07,
+                        body=[0x10, 0x20, 0x35, 0x86, 0x19, 0xa7, 0x87,
+                              0x23] + [0x00] * 32)),
+                controller_capabilities=ZWGetControllerCapabilities(
+                        Packet.create(packet_type=0x01, message_type=0x05,
+                                      body=[0x1c])),
+                memory_id=MemoryGetId(Packet.create(
+                        packet_type=0x01, message_type=0x20,
+                        body=[0xc0, 0xff, 0xee, 0x42, 0x01])))
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def test_identity(self):
+        """Controller identity"""
+        assert_that(identity(self.discovery),
+                    equal_to('3586:19a7:8723:c0ffee42'))
+
+    def test_missing(self):
+        """Missing cache file"""
+        cache = DiscoveryCache(self.path)
+        assert_that(cache.get('/dev/ttyACM0'), none())
+
+    def test_round_trip(self):
+        """Store and load discovery"""
+        DiscoveryCache(self.path).put('/dev/ttyACM0', self.discovery)
+
+        cache = DiscoveryCache(self.path)
+        assert_that(cache.get('/dev/ttyACM1'), none())
+
+        discovery = cache.get('/dev/ttyACM0')
+        assert_that(discovery, instance_of(Discovery))
+        assert_that(discovery.init_data.nodes, equal_to([1, 2, 3]))
+        assert_that(discovery.capabilities.manufacturer_id,
+                    equal_to(0x3586))
+        assert_that(discovery.controller_capabilities.capabilities,
+                    equal_to(0x1c))
+        assert_that(discovery.memory_id.home_id, equal_to(0xc0ffee42))
+
+    def test_corrupt(self):
+        """Corrupt cache file is ignored"""
+        with open(self.path, 'w') as f:
+            f.write('{')
+        assert_that(DiscoveryCache(self.path).get('/dev/ttyACM0'), none())
+
+        DiscoveryCache(self.path).put('/dev/ttyACM0', self.discovery)
+        cache = DiscoveryCache(self.path)
+        key = cache.devices['/dev/ttyACM0']
+        cache.controllers[key]['init_data'] = '0102'
+        assert_that(cache.get('/dev/ttyACM0'), none())
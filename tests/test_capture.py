@@ -0,0 +1,114 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+from hamcrest import *
+
+from frames import RESPONSE
+
+from zwave.capture import CaptureException
+from zwave.capture import CaptureReader
+from zwave.capture import CaptureWriter
+from zwave.capture import Direction
+from zwave.capture import replay
+from zwave.message import SerialAPIGetInitData
+from zwave.packet import PacketACK
+
+
+class TestCapture(object):
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'capture.bin')
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        """Records are read back in order, appending to existing capture"""
+        with CaptureWriter(self.path) as writer:
+            writer.record(Direction.WRITE, b'\x01\x03\x00\x02\xfe', 10)
+        with CaptureWriter(self.path) as writer:
+            writer.record(Direction.READ, memoryview(b'\x06'), 20)
+
+        with CaptureReader(self.path) as reader:
+            records = list(reader)
+        assert_that([(r.direction, r.data) for r in records], equal_to([
+                (Direction.SESSION, b''),
+                (Direction.WRITE, b'\x01\x03\x00\x02\xfe'),
+                (Direction.SESSION, b''),
+                (Direction.READ, b'\x06')]))
+        assert_that([records[1].timestamp, records[3].timestamp],
+                    equal_to([10, 20]))
+
+    def test_bad_magic(self):
+        """Not a capture"""
+        with open(self.path, 'wb') as f:
+            f.write(b'not a capture')
+        assert_that(calling(CaptureReader).with_args(self.path),
+                    raises(CaptureException))
+        assert_that(calling(CaptureWriter).with_args(self.path),
+                    raises(CaptureException))
+
+    def test_truncated(self):
+        """Truncated record"""
+        with CaptureWriter(self.path) as writer:
+            writer.record(Direction.READ, b'\x06\x06', 0)
+        with open(self.path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.path) - 1)
+
+        with CaptureReader(self.path) as reader:
+            assert_that(calling(list).with_args(reader),
+                        raises(CaptureException))
+
+    def test_replay(self):
+        """Replay decodes packets split across records"""
+        with CaptureWriter(self.path) as writer:
+            writer.record(Direction.WRITE, b'\x01\x03\x00\x02\xfe', 0)
+            writer.record(Direction.READ, b'\x06' + RESPONSE[:10], 1)
+            writer.record(Direction.READ, RESPONSE[10:], 2)
+
+        with CaptureReader(self.path) as reader:
+            messages = [message for _, message in replay(reader)]
+        assert_that(messages, contains_exactly(
+                instance_of(PacketACK), instance_of(SerialAPIGetInitData)))
+
+    def test_replay_sessions(self):
+        """Realtime replay restarts the timing in every appended session"""
+        start = 10 ** 9
+        with CaptureWriter(self.path) as writer:
+            writer.record(Direction.READ, b'\x06', start)
+            writer.record(Direction.READ, b'\x06', start + 50000000)
+        # Next session is hours later, on another clock
+        with CaptureWriter(self.path) as writer:
+            writer.record(Direction.READ, b'\x06', start * 10 ** 4)
+            writer.record(Direction.READ, b'\x06', start * 10 ** 4 + 1)
+
+        began = time.monotonic()
+        with CaptureReader(self.path) as reader:
+            messages = list(replay(reader, realtime=True))
+        elapsed = time.monotonic() - began
+
+        assert_that(messages, has_length(4))
+        assert_that(elapsed, greater_than_or_equal_to(0.05))
+        assert_that(elapsed, less_than(1.0))
@@ -0,0 +1,467 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import select
+import shutil
+import tempfile
+import threading
+import time
+
+from hamcrest import *
+
+from frames import RESPONSE
+
+from zwave.cache import DiscoveryCache
+from zwave.capture import CaptureReader
+from zwave.capture import CaptureWriter
+from zwave.capture import Direction
+from zwave.controller import ThreadedZWaveController
+from zwave.controller import ZWaveController
+from zwave.controller import ZWaveControllerClosed
+from zwave.controller import ZWaveControllerRejected
+from zwave.controller import ZWaveControllerTimeout
+from zwave.message import MemoryGetId
+from zwave.message import Message
+from zwave.message import SerialAPIGetCapabilities
+from zwave.message import SerialAPIGetInitData
+from zwave.message import ZWGetControllerCapabilities
+from zwave.packet import Packet
+from zwave.packet import PACKET_ACK
+from zwave.packet import PACKET_NAK
+from zwave.packet import PacketACK
+from zwave.packet import PacketParser
+from zwave.packet import PacketParserUnknownPreamble
+from zwave.packet import Preamble
+
+
+class Responder(object):
+    """Answers every SOF packet written by a controller with the next reply,
+    from a thread
+
+    Attributes:
+        data (bytes): everything written by the controller
+
+    """
+
+    def __init__(self, master, replies):
+        self.master = master
+        self.replies = list(replies)
+        self.data = b''
+        self.parser = PacketParser(strict=False)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            if not select.select([self.master], [], [], 0.01)[0]:
+                if self.stopped.is_set():
+                    return
+                continue
+            data = os.read(self.master, 4096)
+            self.data += data
+            for packet in self.parser.feed(data):
+                if packet.preamble == Preamble.SOF and self.replies:
+                    os.write(self.master, self.replies.pop(0))
+
+    def stop(self):
+        """Stop once everything written so far is read"""
+        self.stopped.set()
+        self.thread.join()
+
+
+class TestZWaveController(object):
+
+    def setup(self):
+        self.master, self.slave = os.openpty()
+        self.controller = ZWaveController(os.ttyname(self.slave))
+
+    def teardown(self):
+        self.controller.close()
+        os.close(self.slave)
+        os.close(self.master)
+
+    def wait_in_waiting(self, n):
+        """Wait until the controller has n bytes waiting to be read"""
+        deadline = time.monotonic() + 1.0
+        while (self.controller.device.in_waiting < n and
+               time.monotonic() < deadline):
+            time.sleep(0.001)
+
+    def test_read_burst(self):
+        """Burst of packets is read with one device read"""
+        data = b'\x06' + RESPONSE * 3
+        os.write(self.master, data)
+        self.wait_in_waiting(len(data))
+
+        packet = self.controller.read()
+        assert_that(packet, instance_of(PacketACK))
+        assert_that(self.controller.packets, has_length(3))
+        # ACKs sent back at once, before the packets are read
+        assert_that(os.read(self.master, 3), equal_to(b'\x06' * 3))
+
+        for i in range(3):
+            packet = self.controller.read()
+            assert_that(packet.bytes(), equal_to(bytearray(RESPONSE)))
+
+    def test_read_bad_checksum(self):
+        """Lenient controller sends NAK on bad checksum"""
+        self.controller.close()
+        self.controller = ZWaveController(os.ttyname(self.slave),
+                                          strict=False)
+        data = RESPONSE[:-1] + b'\xe0\x06'
+        os.write(self.master, data)
+        self.wait_in_waiting(len(data))
+
+        assert_that(self.controller.read(), instance_of(PacketACK))
+        assert_that(os.read(self.master, 1), equal_to(b'\x15'))
+        assert_that(self.controller.packet_parser.bad_checksums, equal_to(1))
+
+    def test_read_bad_checksum_order(self):
+        """NAK for a corrupted packet goes before the ACK of the next one"""
+        self.controller.close()
+        self.controller = ZWaveController(os.ttyname(self.slave),
+                                          strict=False)
+        data = RESPONSE[:-1] + b'\xe0' + RESPONSE
+        os.write(self.master, data)
+        self.wait_in_waiting(len(data))
+
+        assert_that(self.controller.read().bytes(),
+                    equal_to(bytearray(RESPONSE)))
+        assert_that(os.read(self.master, 2), equal_to(b'\x15\x06'))
+
+    def test_write_many(self):
+        """Packets are written at once"""
+        self.controller.write_many([PACKET_ACK, PACKET_NAK])
+        assert_that(os.read(self.master, 2), equal_to(b'\x06\x15'))
+
+    def test_capture(self):
+        """Bytes read and written are captured"""
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'capture.bin')
+            with CaptureWriter(path) as capture:
+                self.controller.capture = capture
+                os.write(self.master, RESPONSE)
+                self.wait_in_waiting(len(RESPONSE))
+                self.controller.read()
+            with CaptureReader(path) as reader:
+                records = [(r.direction, r.data) for r in reader
+                           if r.direction != Direction.SESSION]
+        finally:
+            shutil.rmtree(directory)
+
+        assert_that(records, equal_to([(Direction.READ, RESPONSE),
+                                       (Direction.WRITE, b'\x06')]))
+
+    def test_write_newline(self):
+        """Newline after every packet for older versions"""
+        self.controller.close()
+        self.controller = ZWaveController(os.ttyname(self.slave),
+                                          newline=True)
+        self.controller.write_many([PACKET_ACK, PACKET_NAK])
+        assert_that(os.read(self.master, 4), equal_to(b'\x06\n\x15\n'))
+
+    def test_read_after_error(self):
+        """Bytes after a bad byte are still parsed"""
+        os.write(self.master, b'\x02\x06')
+
+        assert_that(calling(self.controller.read),
+                    raises(PacketParserUnknownPreamble))
+        assert_that(self.controller.read(), instance_of(PacketACK))
+
+
+class TestZWaveControllerRequest(object):
+
+    REQUEST = b'\x01\x03\x00\x02\xfe'
+
+    # Unsolicited request
+    UNSOLICITED = bytes(Packet.create(packet_type=0x00, message_type=0x04,
+                                      body=[0x00, 0x02, 0x01, 0x20]).bytes())
+
+    def setup(self):
+        self.master, self.slave = os.openpty()
+        self.controller = ZWaveController(os.ttyname(self.slave))
+        self.responder = None
+
+    def teardown(self):
+        if self.responder is not None:
+            self.responder.stop()
+        self.controller.close()
+        os.close(self.slave)
+        os.close(self.master)
+
+    def respond(self, *replies):
+        """Answer the next requests with replies"""
+        self.responder = Responder(self.master, replies)
+
+    def written(self):
+        """Get everything written by the controller"""
+        self.responder.stop()
+        return self.responder.data
+
+    def test_read_timeout(self):
+        """Read times out"""
+        assert_that(self.controller.read(timeout=0.01), none())
+
+    def test_request(self):
+        """Request with unsolicited packets in between"""
+        self.respond(self.UNSOLICITED + b'\x06' + self.UNSOLICITED +
+                     RESPONSE)
+
+        message = self.controller.request(SerialAPIGetInitData)
+        assert_that(message, instance_of(SerialAPIGetInitData))
+        assert_that(message.version, equal_to(0x05))
+        assert_that(self.controller.unsolicited, has_length(2))
+
+        # Request, then ACK for every SOF packet
+        assert_that(self.written(), equal_to(self.REQUEST + b'\x06' * 3))
+
+    def test_retransmit(self):
+        """Request is retransmitted on NAK and CAN"""
+        self.respond(b'\x15', b'\x18', b'\x06' + RESPONSE)
+
+        message = self.controller.request(SerialAPIGetInitData)
+        assert_that(message, instance_of(SerialAPIGetInitData))
+        assert_that(self.written(), equal_to(self.REQUEST * 3 + b'\x06'))
+
+    def test_stale(self):
+        """Packets left over from earlier transactions are not replies"""
+        os.write(self.master, b'\x06' + self.UNSOLICITED)
+        deadline = time.monotonic() + 1.0
+        while (self.controller.device.in_waiting <
+               1 + len(self.UNSOLICITED) and time.monotonic() < deadline):
+            time.sleep(0.001)
+
+        self.respond(b'\x06' + RESPONSE)
+        message = self.controller.request(SerialAPIGetInitData)
+        assert_that(message, instance_of(SerialAPIGetInitData))
+        assert_that(self.controller.unsolicited, has_length(1))
+        # Stale ACK did not end the request before it was written
+        assert_that(self.written(), equal_to(b'\x06' + self.REQUEST +
+                                             b'\x06'))
+
+    def test_stale_ack(self):
+        """Stale ACK is not taken as the ACK of the next write"""
+        os.write(self.master, b'\x06')
+        deadline = time.monotonic() + 1.0
+        while (not self.controller.device.in_waiting and
+               time.monotonic() < deadline):
+            time.sleep(0.001)
+
+        assert_that(calling(self.controller.send).with_args(
+                            Packet.create(packet_type=0x00,
+                                          message_type=0x02),
+                            ack_timeout=0.05, retransmissions=0),
+                    raises(ZWaveControllerTimeout))
+
+    def test_rejected(self):
+        """Request rejected on every retransmission"""
+        self.respond(b'\x15', b'\x15')
+        assert_that(calling(self.controller.request).with_args(
+                            SerialAPIGetInitData, retransmissions=1),
+                    raises(ZWaveControllerRejected))
+
+    def test_ack_timeout(self):
+        """No ACK"""
+        assert_that(calling(self.controller.request).with_args(
+                            SerialAPIGetInitData, ack_timeout=0.01,
+                            retransmissions=0),
+                    raises(ZWaveControllerTimeout))
+
+    def test_response_timeout(self):
+        """No response"""
+        self.respond(b'\x06')
+        assert_that(calling(self.controller.request).with_args(
+                            SerialAPIGetInitData, response_timeout=0.01),
+                    raises(ZWaveControllerTimeout))
+
+
+class TestZWaveControllerDiscover(object):
+
+    RESPONSES = [
+        RESPONSE,
+        bytes(Packet.create(packet_type=0x01, message_type=0x07,
+                            body=[0x00] * 40).bytes()),
+        bytes(Packet.create(packet_type=0x01, message_type=0x05,
+                            body=[0x1c]).bytes()),
+        bytes(Packet.create(packet_type=0x01, message_type=0x20,
+                            body=[0xc0, 0xff, 0xee, 0x42, 0x01]).bytes()),
+    ]
+
+    def setup(self):
+        self.master, self.slave = os.openpty()
+        self.controller = ZWaveController(os.ttyname(self.slave))
+        self.directory = tempfile.mkdtemp()
+        self.cache = DiscoveryCache(os.path.join(self.directory, 'cache.json'))
+
+    def teardown(self):
+        self.controller.close()
+        os.close(self.slave)
+        os.close(self.master)
+        shutil.rmtree(self.directory)
+
+    def test_discover(self):
+        """Discover from controller, then from cache"""
+        responder = Responder(self.master,
+                              [b'\x06' + x for x in self.RESPONSES])
+        try:
+            discovery = self.controller.discover(cache=self.cache)
+        finally:
+            responder.stop()
+        assert_that(discovery.memory_id.home_id, equal_to(0xc0ffee42))
+        assert_that(self.controller.discovery_stale, equal_to(False))
+
+        # No requests sent
+        controller = ZWaveController(os.ttyname(self.slave))
+        try:
+            discovery = controller.discover(cache=self.cache)
+        finally:
+            controller.close()
+        assert_that(discovery.init_data, instance_of(SerialAPIGetInitData))
+        assert_that(discovery.capabilities,
+                    instance_of(SerialAPIGetCapabilities))
+        assert_that(discovery.controller_capabilities,
+                    instance_of(ZWGetControllerCapabilities))
+        assert_that(discovery.memory_id, instance_of(MemoryGetId))
+        assert_that(controller.discovery_stale, equal_to(True))
+
+
+class TestThreadedZWaveController(object):
+
+    REQUEST = TestZWaveControllerRequest.REQUEST
+    UNSOLICITED = TestZWaveControllerRequest.UNSOLICITED
+
+    def setup(self):
+        self.master, self.slave = os.openpty()
+        self.handled = []
+        self.release = threading.Event()
+        self.controller = ThreadedZWaveController(os.ttyname(self.slave),
+                                                  handler=self.handler)
+
+    def teardown(self):
+        self.release.set()
+        self.controller.close()
+        os.close(self.slave)
+        os.close(self.master)
+
+    def handler(self, packet):
+        """Slow handler"""
+        self.handled.append(packet)
+        self.release.wait(5)
+
+    def read_master(self, n):
+        """Read n bytes written by the controller"""
+        data = b''
+        while len(data) < n:
+            data += os.read(self.master, n - len(data))
+        return data
+
+    def test_immediate_ack(self):
+        """Unsolicited requests are ACKed while the handler is busy"""
+        os.write(self.master, self.UNSOLICITED * 2)
+
+        assert_that(self.read_master(2), equal_to(b'\x06\x06'))
+        # Second request is still waiting for the handler
+        assert_that(self.handled, has_length(1))
+        self.release.set()
+
+    def test_decoded(self):
+        """Handler and read get decoded messages"""
+        os.write(self.master, self.UNSOLICITED + RESPONSE)
+
+        assert_that(self.read_master(2), equal_to(b'\x06\x06'))
+        response = self.controller.read(timeout=1)
+        assert_that(response, instance_of(SerialAPIGetInitData))
+        assert_that(response.bytes(), equal_to(bytearray(RESPONSE)))
+        for _ in range(100):
+            if self.handled:
+                break
+            time.sleep(0.01)
+        assert_that(self.handled, has_length(1))
+        assert_that(self.handled[0], instance_of(Message))
+        assert_that(self.handled[0].bytes(),
+                    equal_to(bytearray(self.UNSOLICITED)))
+
+    def test_bad_checksum_order(self):
+        """NAK for a corrupted packet goes before the ACK of the next one"""
+        self.controller.close()
+        self.controller = ThreadedZWaveController(os.ttyname(self.slave),
+                                                  strict=False)
+        os.write(self.master, RESPONSE[:-1] + b'\xe0' + RESPONSE)
+
+        assert_that(self.read_master(2), equal_to(b'\x15\x06'))
+        assert_that(self.controller.read(timeout=1).bytes(),
+                    equal_to(bytearray(RESPONSE)))
+
+    def test_device_error(self):
+        """Device errors of the reader thread are raised from read"""
+        def readinto(buffer):
+            raise OSError('device unplugged')
+        self.controller.device.readinto = readinto
+
+        errors = []
+        for _ in range(2):
+            try:
+                self.controller.read(timeout=5)
+            except OSError as e:
+                errors.append(e)
+        assert_that(errors, has_length(2))
+        assert_that(errors[0], same_instance(errors[1]))
+
+    def test_close_wakes_read(self):
+        """Pending read raises once closed"""
+        errors = []
+
+        def read():
+            try:
+                self.controller.read(timeout=5)
+            except ZWaveControllerClosed as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=read)
+        thread.start()
+        time.sleep(0.05)
+        self.controller.close()
+        thread.join(5)
+        assert_that(errors, has_length(1))
+
+    def test_request(self):
+        """Requests from multiple threads"""
+        results = []
+
+        def request():
+            results.append(self.controller.request(SerialAPIGetInitData))
+
+        threads = [threading.Thread(target=request) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+
+        for _ in range(2):
+            assert_that(self.read_master(len(self.REQUEST)),
+                        equal_to(self.REQUEST))
+            os.write(self.master, b'\x06' + self.UNSOLICITED + RESPONSE)
+            assert_that(self.read_master(2), equal_to(b'\x06\x06'))
+
+        for thread in threads:
+            thread.join(5)
+        assert_that(results, has_length(2))
+        assert_that(results[0], instance_of(SerialAPIGetInitData))
@@ -0,0 +1,65 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from hamcrest import *
+
+from zwave.functions import FUNCTIONS
+from zwave.functions import Flow
+from zwave.functions import KNOWN
+from zwave.functions import function_name
+from zwave.packet import MessageType
+from zwave.packet import Packet
+
+
+class TestFunctions(object):
+
+    def test_table(self):
+        """Table has an entry for every byte, indexed by MessageType"""
+        assert_that(FUNCTIONS, has_length(256))
+        assert_that(KNOWN, has_length(256))
+        for n, function in enumerate(FUNCTIONS):
+            if function is not None:
+                assert_that(function.message_type, equal_to(n))
+            assert_that(KNOWN[n], equal_to(0 if function is None else 1))
+
+    def test_message_types(self):
+        """Every MessageType constant is in the table by name"""
+        for name, value in vars(MessageType).items():
+            if name.isupper() and name not in ('NONE', 'ALL'):
+                assert_that(FUNCTIONS[value].name, equal_to(name))
+                assert_that(value, is_in(MessageType.ALL))
+
+    def test_all(self):
+        """MessageType.ALL is the known functions"""
+        assert_that(MessageType.ALL, equal_to(
+                set(n for n in range(256) if KNOWN[n])))
+
+    def test_function(self):
+        """Function of a packet"""
+        function = Packet.create(packet_type=0x00, message_type=0x13).function
+        assert_that(function.name, equal_to('ZW_SEND_DATA'))
+        assert_that(function.flow, equal_to(Flow.BOTH))
+        assert_that(function.response, equal_to(True))
+        assert_that(Packet(0x06).function, none())
+
+    def test_function_name(self):
+        """Names of known and unknown functions"""
+        assert_that(function_name(0x04),
+                    equal_to('APPLICATION_COMMAND_HANDLER'))
+        assert_that(function_name(0xff), equal_to('0xff'))
@@ -0,0 +1,169 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import datetime
+import os
+import shutil
+import tempfile
+
+from hamcrest import *
+
+from frames import RESPONSE
+
+from zwave.capture import Direction
+from zwave.controller import ZWaveController
+from zwave.history import History
+from zwave.history import HistoryException
+from zwave.message import SerialAPIGetInitData
+from zwave.packet import PACKET_ACK
+from zwave.packet import MessageType
+from zwave.packet import Packet
+from zwave.packet import PacketType
+from zwave.simulator import SimulatedController
+
+
+class TestHistory(object):
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'history.bin')
+        self.history = History(self.path)
+        self.simulator = None
+        self.controller = None
+
+    def teardown(self):
+        if self.controller is not None:
+            self.controller.close()
+        if self.simulator is not None:
+            self.simulator.close()
+        self.history.close()
+        shutil.rmtree(self.directory)
+
+    def report(self, node):
+        return Packet.create(
+                packet_type=PacketType.REQUEST,
+                message_type=MessageType.APPLICATION_COMMAND_HANDLER,
+                body=[0x00, node, 0x03, 0x20, 0x03, 0xff])
+
+    def send_data(self, node):
+        return Packet.create(packet_type=PacketType.REQUEST,
+                             message_type=MessageType.ZW_SEND_DATA,
+                             body=[node, 0x02, 0x20, 0x02, 0x25, 0x01])
+
+    def fill(self):
+        """Reports from nodes 2 and 17, with an ACK for every one"""
+        for i in range(10):
+            self.history.append(self.report(17 if i % 2 else 2),
+                                timestamp=1000 + i * 10)
+            self.history.append(PACKET_ACK, direction=Direction.WRITE,
+                                timestamp=1000 + i * 10)
+
+    def test_query(self):
+        """Frames by time, MessageType, node and direction"""
+        self.fill()
+        frames = self.history.query(start=1020, end=1060, node=17)
+        assert_that([x.timestamp for x in frames], equal_to([1030, 1050]))
+        assert_that(frames[0].bytes(), equal_to(self.report(17).bytes()))
+        assert_that(frames[0].body[1], equal_to(17))
+        assert_that(frames[0].direction, equal_to(Direction.READ))
+
+        assert_that(self.history.query(
+                message_type=MessageType.APPLICATION_COMMAND_HANDLER),
+                has_length(10))
+        acks = self.history.query(end=1020, direction=Direction.WRITE)
+        assert_that([x.materialize() for x in acks],
+                    equal_to([PACKET_ACK, PACKET_ACK]))
+        assert_that(self.history.query(
+                node=17, message_type=MessageType.ZW_SEND_DATA), empty())
+        assert_that(self.history.query(node=3), empty())
+
+    def test_datetime(self):
+        """Time range as datetimes"""
+        start = datetime.datetime(2016, 5, 1, 2, 0)
+        timestamp = int(start.timestamp()) * 1000000000
+        self.history.append(self.report(17), timestamp=timestamp - 1)
+        self.history.append(self.report(17), timestamp=timestamp)
+        frames = self.history.query(start=start,
+                                    end=start + datetime.timedelta(minutes=5))
+        assert_that([x.timestamp for x in frames], equal_to([timestamp]))
+
+    def test_timestamps_increase(self):
+        """A clock step backwards keeps the previous timestamp"""
+        self.history.append(PACKET_ACK, timestamp=2000)
+        self.history.append(PACKET_ACK, timestamp=1000)
+        assert_that([x.timestamp for x in self.history.query()],
+                    equal_to([2000, 2000]))
+
+    def test_reopen(self):
+        """Indexes are rebuilt, and a partial entry is dropped"""
+        self.fill()
+        self.history.close()
+        with open(self.path, 'ab') as f:
+            f.write(History.ENTRY_HEADER.pack(2000, 0, 0, 10) + b'\x01\x03')
+
+        self.history = History(self.path)
+        assert_that(self.history, has_length(20))
+        assert_that(self.history.query(node=2), has_length(5))
+        self.history.append(self.report(2), timestamp=2000)
+        assert_that([x.timestamp for x in self.history.query(start=1090)],
+                    equal_to([1090, 1090, 2000]))
+
+    def test_bad_magic(self):
+        """Existing file is not a history"""
+        path = os.path.join(self.directory, 'other.bin')
+        with open(path, 'wb') as f:
+            f.write(b'not a history')
+        assert_that(calling(History).with_args(path),
+                    raises(HistoryException))
+
+    def test_record(self):
+        """Recorded bytes are parsed across calls"""
+        data = b'\x06\x02' + RESPONSE
+        self.history.record(Direction.READ, data[:10], timestamp=1)
+        self.history.record(Direction.READ, data[10:], timestamp=2)
+        frames = self.history.query()
+        assert_that([(x.timestamp, x.bytes()) for x in frames], equal_to(
+                [(1, b'\x06'), (2, RESPONSE)]))
+
+    def test_stale(self):
+        """Views are invalid once closed"""
+        self.fill()
+        frame = self.history.query()[0]
+        assert_that(frame.valid, equal_to(True))
+        self.history.close()
+        assert_that(frame.valid, equal_to(False))
+        assert_that(calling(frame.bytes),
+                    raises(ValueError, 'History was closed'))
+        assert_that(calling(getattr).with_args(frame, 'message_type'),
+                    raises(ValueError, 'History was closed'))
+
+    def test_controller(self):
+        """History as the recording sink of a controller"""
+        self.simulator = SimulatedController(seed=0, nodes=[1, 2])
+        self.controller = ZWaveController(self.simulator.path)
+        self.controller.capture = self.history
+        self.controller.request(SerialAPIGetInitData)
+        self.controller.send(self.send_data(2))
+
+        frames = self.history.query(node=2)
+        assert_that([(x.direction, x.bytes()) for x in frames], equal_to(
+                [(Direction.WRITE, self.send_data(2).bytes())]))
+        assert_that([x.direction for x in self.history.query(
+                message_type=MessageType.SERIAL_API_GET_INIT_DATA)],
+                equal_to([Direction.WRITE, Direction.READ]))
@@ -0,0 +1,123 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+
+from hamcrest import *
+
+from frames import RESPONSE
+
+from zwave.manager import ControllerManager
+from zwave.message import SerialAPIGetInitData
+from zwave.packet import PACKET_ACK
+from zwave.packet import Packet
+
+
+class TestControllerManager(object):
+
+    def setup(self):
+        self.received = []
+        self.manager = ControllerManager(
+                lambda controller, message: self.received.append(
+                        (controller, message)))
+        self.ptys = [os.openpty() for _ in range(3)]
+        self.controllers = [self.manager.add(os.ttyname(slave))
+                            for _, slave in self.ptys]
+
+    def teardown(self):
+        self.manager.close()
+        for master, slave in self.ptys:
+            os.close(slave)
+            if master is not None:
+                os.close(master)
+
+    def run_until(self, count):
+        """Serve controllers until count packets are dispatched"""
+        for _ in range(100):
+            if len(self.received) >= count:
+                return
+            self.manager.run_once(timeout=1)
+
+    def test_dispatch(self):
+        """Packets from all controllers are decoded and dispatched"""
+        for master, _ in self.ptys:
+            os.write(master, b'\x06' + RESPONSE)
+        self.run_until(6)
+
+        assert_that(self.received, has_length(6))
+        for controller in self.controllers:
+            messages = [m for c, m in self.received if c is controller]
+            assert_that(messages[0], same_instance(PACKET_ACK))
+            assert_that(messages[1], instance_of(SerialAPIGetInitData))
+
+        # Every response was ACKed on its own device
+        for master, _ in self.ptys:
+            assert_that(os.read(master, 16), equal_to(b'\x06'))
+
+    def test_bad_checksum(self):
+        """Bad checksum is NAKed, before the next packet is ACKed"""
+        master, _ = self.ptys[0]
+        os.write(master, RESPONSE[:-1] + b'\xe0' + RESPONSE)
+        self.run_until(1)
+
+        assert_that(self.received, has_length(1))
+        assert_that(os.read(master, 16), equal_to(b'\x15\x06'))
+
+    def test_send(self):
+        """Packets are written to their own device"""
+        packet = Packet.create(packet_type=0x00, message_type=0x02)
+        self.controllers[1].send(packet)
+        self.manager.run_once(timeout=0)
+
+        assert_that(os.read(self.ptys[1][0], 16),
+                    equal_to(b'\x01\x03\x00\x02\xfe'))
+
+    def test_remove(self):
+        """Closed controllers are not served"""
+        for controller in list(self.controllers):
+            controller.close()
+        assert_that(self.manager.controllers, has_length(0))
+        # Returns right away
+        self.manager.run()
+
+    def test_device_error(self):
+        """A failing controller is closed, and the others are served"""
+        master, slave = self.ptys[0]
+        os.close(master)
+        self.ptys[0] = (None, slave)
+        master, _ = self.ptys[1]
+        os.write(master, RESPONSE)
+        self.run_until(1)
+
+        assert_that(self.manager.controllers, equal_to(self.controllers[1:]))
+        assert_that(self.received, has_length(1))
+        assert_that(self.received[0][0], same_instance(self.controllers[1]))
+
+    def test_handler_error(self):
+        """Handler exceptions don't stop dispatching"""
+        def handler(controller, message):
+            self.received.append(message)
+            raise ValueError('handler failed')
+        self.manager.handler = handler
+        master, _ = self.ptys[0]
+        os.write(master, b'\x06' + RESPONSE)
+        self.run_until(2)
+
+        assert_that(self.received, has_length(2))
+        assert_that(self.manager.controllers, has_length(3))
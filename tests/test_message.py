@@ -19,8 +19,12 @@ This file is part of pyzwave.
 
 from hamcrest import *
 
+from zwave.bitmap import NodeBitmap
+from zwave.packet import PACKET_ACK
 from zwave.packet import Packet
+from zwave.message import decode
 from zwave.message import Message
+from zwave.message import MemoryGetId
 from zwave.message import SerialAPIGetCapabilities
 from zwave.message import SerialAPIGetInitData
 from zwave.message import ZWGetControllerCapabilities
@@ -37,7 +41,7 @@ class TestMessage(object):
         # Check fields
         assert_that((packet.preamble, packet.length, packet.packet_type,
                      packet.message_type, packet.body, packet.checksum),
-                    equal_to((0x03, 0x23, 0x12, 0x13, [0x12, 0x32], 0x13)))
+                    equal_to((0x03, 0x23, 0x12, 0x13, b'\x12\x32', 0x13)))
 
 
 class TestSerialAPIGetCapabilities(object):
@@ -97,7 +101,7 @@ class TestSerialAPIGetCapabilities(object):
 
         # Check body
         assert_that(message.bitmap_bytes, has_length(32))
-        assert_that(message.bitmap_bytes, equal_to(body[8:]))
+        assert_that(message.bitmap_bytes, equal_to(bytes(body[8:])))
 
         # Check supported message types
         assert_that(message.message_types, equal_to(
@@ -106,11 +110,34 @@ class TestSerialAPIGetCapabilities(object):
         for x in range(256):
             assert_that(message.supports_message_type(x),
                         equal_to(x in message.message_types))
+        assert_that(message.message_type_bitmap,
+                    equal_to(NodeBitmap(message.message_types)))
+
+    def test_lazy_fields(self):
+        """SerialAPIGetCapabilities fields are decoded once, on access"""
+        body = [0x10, 0x20, 0x35, 0x86, 0x19, 0xa7, 0x87, 0x23] + [0x00] * 32
+        packet = Packet(0x01, length=0x2b, packet_type=0x01, message_type=0x07,
+                        body=body, checksum=0xe1)
+        message = SerialAPIGetCapabilities(packet)
+
+        # Not decoded yet
+        assert_that(calling(getattr).with_args(message, '_message_types'),
+                    raises(AttributeError))
+
+        # Decoded and cached
+        message_types = message.message_types
+        assert_that(message.message_types, same_instance(message_types))
+
+        # Overridden
+        message.version = 0x1234
+        assert_that(message.version, equal_to(0x1234))
 
     def test_create_request(self):
         """SerialAPIGetCapabilities create request"""
         packet = SerialAPIGetCapabilities.create_request()
         assert_that(packet.bytes(), equal_to(b'\x01\x03\x00\x07\xfb'))
+        assert_that(packet, same_instance(
+                SerialAPIGetCapabilities.create_request()))
 
 
 class TestSerialAPIGetInitData(object):
@@ -152,10 +179,10 @@ class TestSerialAPIGetInitData(object):
         packet.message_type = 0x02
 
         # Bad body bitmap length
-        packet.body[2] = 0x1c
+        packet.body = bytes(body[:2] + [0x1c] + body[3:])
         assert_that(calling(SerialAPIGetInitData).with_args(packet),
                     raises(ValueError))        
-        packet.body[2] = 0x1d
+        packet.body = bytes(body)
 
     def test_good_creation(self):
         """SerialAPIGetInitData parsing"""
@@ -173,6 +200,9 @@ class TestSerialAPIGetInitData(object):
 
         assert_that(message.nodes, equal_to([1, 2, 3, 10, 97, 98, 99, 102, 104,
                                              225, 232]))
+        assert_that(97 in message.node_bitmap, equal_to(True))
+        assert_that(message.node_bitmap.to_bytes(29),
+                    equal_to(message.bitmap_bytes))
 
         # Test capabilities
         message.capabilities = 0x04
@@ -284,3 +314,56 @@ class TestZWGetControllerCapabilities(object):
         assert_that(packet.bytes(), equal_to(b'\x01\x03\x00\x05\xf9'))
 
 
+
+
+class TestDecode(object):
+
+    def test_registered(self):
+        """Decode registered message"""
+        packet = Packet(0x01, length=0x04, packet_type=0x01, message_type=0x05,
+                        body=[0x0f], checksum=0xf4)
+        message = decode(packet)
+        assert_that(message, instance_of(ZWGetControllerCapabilities))
+        assert_that(message.capabilities, equal_to(0x0f))
+
+    def test_unknown(self):
+        """Decode unknown message"""
+        packet = Packet(0x01, length=0x04, packet_type=0x00, message_type=0x05,
+                        body=[0x0f], checksum=0xf5)
+        message = decode(packet)
+        assert_that(type(message), equal_to(Message))
+        assert_that(message.bytes(), equal_to(packet.bytes()))
+
+    def test_control(self):
+        """Decode ACK"""
+        assert_that(decode(PACKET_ACK), same_instance(PACKET_ACK))
+
+    def test_malformed(self):
+        """Decode malformed message"""
+        packet = Packet(0x01, length=0x05, packet_type=0x01, message_type=0x05,
+                        body=[0x0f, 0x00], checksum=0xf1)
+        assert_that(calling(decode).with_args(packet), raises(ValueError))
+
+
+class TestMemoryGetId(object):
+
+    def test_bad_creation(self):
+        """MemoryGetId bad packet"""
+        packet = Packet(0x01, length=0x07, packet_type=0x01, message_type=0x20,
+                        body=[0xc0, 0xff, 0xee, 0x01], checksum=0x00)
+        assert_that(calling(MemoryGetId).with_args(packet),
+                    raises(ValueError))
+
+    def test_good_creation(self):
+        """MemoryGetId parsing"""
+        packet = Packet.create(packet_type=0x01, message_type=0x20,
+                               body=[0xc0, 0xff, 0xee, 0x42, 0x01])
+        message = MemoryGetId(packet)
+
+        assert_that(message.home_id, equal_to(0xc0ffee42))
+        assert_that(message.node_id, equal_to(0x01))
+
+    def test_create_request(self):
+        """MemoryGetId create request"""
+        packet = MemoryGetId.create_request()
+        assert_that(packet.bytes(), equal_to(b'\x01\x03\x00\x20\xdc'))
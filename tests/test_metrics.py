@@ -0,0 +1,117 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from hamcrest import *
+
+from zwave.controller import ZWaveController
+from zwave.controller import ZWaveControllerRejected
+from zwave.message import SerialAPIGetInitData
+from zwave.metrics import Histogram
+from zwave.metrics import Metrics
+from zwave.metrics import frame_name
+from zwave.packet import PACKET_NAK
+from zwave.packet import Packet
+from zwave.simulator import SimulatedController
+
+
+class TestHistogram(object):
+
+    def setup(self):
+        self.histogram = Histogram()
+
+    def test_empty(self):
+        """Empty histogram"""
+        snapshot = self.histogram.snapshot()
+        assert_that(snapshot['count'], equal_to(0))
+        assert_that(snapshot['p50'], none())
+        assert_that(snapshot['buckets'], equal_to({}))
+
+    def test_add(self):
+        """Values are counted in buckets"""
+        for value in [0.00005, 0.0003, 0.0003, 100.0]:
+            self.histogram.add(value)
+        snapshot = self.histogram.snapshot()
+        assert_that(snapshot['count'], equal_to(4))
+        assert_that(snapshot['min'], equal_to(0.00005))
+        assert_that(snapshot['max'], equal_to(100.0))
+        assert_that(snapshot['buckets'], equal_to(
+                {'0.0001': 1, '0.0004': 2, 'inf': 1}))
+        assert_that(snapshot['p50'], equal_to(0.0004))
+        assert_that(snapshot['p99'], equal_to(100.0))
+
+
+class TestMetrics(object):
+
+    def setup(self):
+        self.metrics = Metrics()
+        self.simulator = None
+        self.controller = None
+
+    def teardown(self):
+        if self.controller is not None:
+            self.controller.close()
+        if self.simulator is not None:
+            self.simulator.close()
+
+    def start(self, **kwargs):
+        self.simulator = SimulatedController(seed=0, **kwargs)
+        self.controller = ZWaveController(self.simulator.path,
+                                          metrics=self.metrics)
+
+    def test_frame_name(self):
+        """Frame names"""
+        assert_that(frame_name(PACKET_NAK), equal_to('NAK'))
+        assert_that(frame_name(Packet.create(packet_type=0x01,
+                                             message_type=0x02)),
+                    equal_to('RESPONSE SERIAL_API_GET_INIT_DATA'))
+
+    def test_parser_counters(self):
+        """Parser counter changes are counted"""
+        self.metrics.read(b'\x02\x06', [], {'bad_lengths': 1},
+                          {'bad_lengths': 3})
+        assert_that(self.metrics.snapshot()['counters'], equal_to(
+                {'bytes_read': 2, 'bad_lengths': 2}))
+
+    def test_request(self):
+        """Request latency and traffic"""
+        self.start()
+        for _ in range(3):
+            self.controller.request(SerialAPIGetInitData)
+
+        snapshot = self.metrics.snapshot()
+        for latency in ['ack_latency', 'response_latency']:
+            assert_that(snapshot[latency]['SERIAL_API_GET_INIT_DATA']['count'],
+                        equal_to(3))
+        assert_that(snapshot['frames_read'], equal_to(
+                {'ACK': 3, 'RESPONSE SERIAL_API_GET_INIT_DATA': 3}))
+        assert_that(snapshot['frames_written'], equal_to(
+                {'ACK': 3, 'REQUEST SERIAL_API_GET_INIT_DATA': 3}))
+        assert_that(snapshot['counters']['bytes_written'], equal_to(18))
+
+    def test_rejected(self):
+        """Retransmissions and NAKs"""
+        self.start(nak_rate=1.0)
+        assert_that(calling(self.controller.request).with_args(
+                            SerialAPIGetInitData, retransmissions=1),
+                    raises(ZWaveControllerRejected))
+
+        snapshot = self.metrics.snapshot()
+        assert_that(snapshot['counters']['retransmissions'], equal_to(1))
+        assert_that(snapshot['frames_read'], equal_to({'NAK': 2}))
+        assert_that(snapshot['ack_latency'], equal_to({}))
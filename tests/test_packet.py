@@ -19,15 +19,22 @@ This file is part of pyzwave.
 
 from hamcrest import *
 
+from frames import RESPONSE
+
+from zwave.packet import FrozenPacket
 from zwave.packet import Packet
 from zwave.packet import PacketACK
 from zwave.packet import PacketNAK
 from zwave.packet import PacketCAN
+from zwave.packet import PACKET_ACK
+from zwave.packet import PACKET_NAK
 from zwave.packet import PacketParser
 from zwave.packet import PacketParserBadChecksum
 from zwave.packet import PacketParserUnknownType
 from zwave.packet import PacketParserUnknownPreamble
 from zwave.packet import PacketParserBadLength
+from zwave.packet import acknowledged
+from zwave.packet import parse_chunk
 
 
 class TestPacket(object):
@@ -39,7 +46,7 @@ class TestPacket(object):
         # Check fields
         assert_that((packet.preamble, packet.length, packet.packet_type,
                      packet.message_type, packet.body, packet.checksum),
-                    equal_to((0x06, None, None, None, [], None)))
+                    equal_to((0x06, None, None, None, b'', None)))
         # Validate checksum
         assert_that(packet.validate_checksum(), equal_to(True))
 
@@ -58,7 +65,7 @@ class TestPacket(object):
         # Check fields
         assert_that((packet.preamble, packet.length, packet.packet_type,
                      packet.message_type, packet.body, packet.checksum),
-                    equal_to((0x01, 0x03, None, None, [], None)))
+                    equal_to((0x01, 0x03, None, None, b'', None)))
         # Validate checksum
         assert_that(packet.validate_checksum(), equal_to(False))
 
@@ -74,7 +81,7 @@ class TestPacket(object):
         # Check fields
         assert_that((packet.preamble, packet.length, packet.packet_type,
                      packet.message_type, packet.body, packet.checksum),
-                    equal_to((0x01, 0x03, 0x01, None, [], None)))
+                    equal_to((0x01, 0x03, 0x01, None, b'', None)))
         # Validate checksum
         assert_that(packet.validate_checksum(), equal_to(False))
 
@@ -90,7 +97,7 @@ class TestPacket(object):
         # Check fields
         assert_that((packet.preamble, packet.length, packet.packet_type,
                      packet.message_type, packet.body, packet.checksum),
-                    equal_to((0x01, 0x03, 0x01, 0x02, [], None)))
+                    equal_to((0x01, 0x03, 0x01, 0x02, b'', None)))
         # Validate checksum
         assert_that(packet.validate_checksum(), equal_to(False))
 
@@ -108,7 +115,7 @@ class TestPacket(object):
         # Check fields
         assert_that((packet.preamble, packet.length, packet.packet_type,
                      packet.message_type, packet.body, packet.checksum),
-                    equal_to((0x01, 0x03, 0x01, 0x02, [0x04, 0x05], None)))
+                    equal_to((0x01, 0x03, 0x01, 0x02, b'\x04\x05', None)))
         # Validate checksum
         assert_that(packet.validate_checksum(), equal_to(False))
 
@@ -126,7 +133,7 @@ class TestPacket(object):
         # Check fields
         assert_that((packet.preamble, packet.length, packet.packet_type,
                      packet.message_type, packet.body, packet.checksum),
-                    equal_to((0x01, 0x03, 0x01, 0x02, [0x04, 0x05], 0x34)))
+                    equal_to((0x01, 0x03, 0x01, 0x02, b'\x04\x05', 0x34)))
         # Validate checksum
         assert_that(packet.validate_checksum(), equal_to(False))
 
@@ -144,7 +151,7 @@ class TestPacket(object):
         # Check fields
         assert_that((packet.preamble, packet.length, packet.packet_type,
                      packet.message_type, packet.body, packet.checksum),
-                    equal_to((0x01, 0x03, 0x00, 0x02, [], 0xfe)))
+                    equal_to((0x01, 0x03, 0x00, 0x02, b'', 0xfe)))
         # Validate checksum
         assert_that(packet.validate_checksum(), equal_to(True))
 
@@ -157,11 +164,51 @@ class TestPacket(object):
         # Check fields
         assert_that((packet.preamble, packet.length, packet.packet_type,
                      packet.message_type, packet.body, packet.checksum),
-                    equal_to((0x04, 0x05, 0x00, 0x02, [0x45, 0x78], 0xc5)))
+                    equal_to((0x04, 0x05, 0x00, 0x02, b'\x45\x78', 0xc5)))
         # Validate checksum
         assert_that(packet.validate_checksum(), equal_to(True))
 
 
+class TestFrozenPacket(object):
+
+    def test_create(self):
+        """Create frozen packet"""
+        packet = Packet.create(packet_type=0x00, message_type=0x02,
+                               body=[0x45, 0x78], frozen=True)
+
+        assert_that(packet, instance_of(FrozenPacket))
+        assert_that((packet.preamble, packet.length, packet.packet_type,
+                     packet.message_type, packet.body, packet.checksum),
+                    equal_to((0x01, 0x05, 0x00, 0x02, b'\x45\x78', 0xc5)))
+        assert_that(packet.validate_checksum(), equal_to(True))
+        assert_that(packet.bytes(), equal_to(b'\x01\x05\x00\x02\x45\x78\xc5'))
+        # Cached
+        assert_that(packet.bytes(), same_instance(packet.bytes()))
+
+    def test_freeze(self):
+        """Freeze packet"""
+        packet = Packet(0x01, length=0x03, packet_type=0x01, message_type=0x02,
+                        body=[0x04, 0x05], checksum=0x34)
+        frozen = packet.freeze()
+
+        assert_that(frozen.bytes(), equal_to(packet.bytes()))
+        assert_that(frozen.validate_checksum(), equal_to(False))
+        assert_that(frozen.freeze(), same_instance(frozen))
+
+    def test_immutable(self):
+        """Frozen packet can not be modified"""
+        packet = Packet.create(packet_type=0x00, message_type=0x02,
+                               frozen=True)
+
+        assert_that(calling(setattr).with_args(packet, 'preamble', 0x06),
+                    raises(AttributeError))
+        assert_that(calling(delattr).with_args(packet, 'preamble'),
+                    raises(AttributeError))
+
+        # Check string functions work correctly
+        string = "%s %r" % (packet, packet)
+
+
 class TestPacketParser(object):
 
     def setup(self):
@@ -208,14 +255,16 @@ class TestPacketParser(object):
 
     def test_unknown_message_type(self):
         """Unknown message type"""
-        # Should be handled graceully with a warning in the log
+        # Should be handled graceully, and counted
         packet = (b'\x01\x03\x00\xFF\x03')
         assert_that(self.parse_packet(packet), not_none())
+        assert_that(self.parser.unknown_message_types, equal_to(1))
 
     def test_ack(self):
         """ACK packet"""
         packet = self.parser.update(0x06)
         assert_that(packet, instance_of(PacketACK))
+        assert_that(packet, same_instance(PACKET_ACK))
 
     def test_nak(self):
         """NAK packet"""
@@ -277,7 +326,7 @@ class TestPacketParser(object):
         assert_that(packet.length, equal_to(4))
         assert_that(packet.packet_type, equal_to(0x01))
         assert_that(packet.message_type, equal_to(0x02))
-        assert_that(packet.body, equal_to([0x03]))
+        assert_that(packet.body, equal_to(b'\x03'))
         assert_that(packet.checksum, equal_to(0xfb))
 
     def test_full_packet(self):
@@ -292,9 +341,167 @@ class TestPacketParser(object):
         assert_that(packet.length, equal_to(0x25))
         assert_that(packet.packet_type, equal_to(0x01))
         assert_that(packet.message_type, equal_to(0x02))
-        assert_that(packet.body, equal_to([
+        assert_that(packet.body, equal_to(bytes([
                 0x05, 0x00, 0x1d, 0x07, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
                 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
                 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x11, 0x00, 0x27,
-                0x00, 0x14, 0x05, 0x00]))
+                0x00, 0x14, 0x05, 0x00])))
         assert_that(packet.checksum, equal_to(0xe1))
+
+
+class TestPacketParserFeed(object):
+
+    def setup(self):
+        self.parser = PacketParser()
+
+    def test_empty(self):
+        """Feed no bytes"""
+        assert_that(list(self.parser.feed(b'')), equal_to([]))
+
+    def test_multiple_packets(self):
+        """Multiple packets in one chunk"""
+        data = b'\x06' + RESPONSE + b'\x15\x18' + RESPONSE
+        packets = list(self.parser.feed(data))
+
+        assert_that(packets, has_length(5))
+        assert_that(packets[0], instance_of(PacketACK))
+        assert_that(packets[2], instance_of(PacketNAK))
+        assert_that(packets[3], instance_of(PacketCAN))
+        assert_that(packets[1].bytes(), equal_to(bytearray(RESPONSE)))
+        assert_that(packets[4].bytes(), equal_to(bytearray(RESPONSE)))
+        assert_that(packets[1], instance_of(FrozenPacket))
+        assert_that(packets[1].validate_checksum(), equal_to(True))
+
+    def test_partial_packets(self):
+        """Packets split across chunks"""
+        for size in range(1, len(RESPONSE) + 1):
+            parser = PacketParser()
+            data = memoryview(RESPONSE * 2)
+            packets = []
+            for i in range(0, len(data), size):
+                packets.extend(parser.feed(data[i:i + size]))
+
+            assert_that(packets, has_length(2))
+            for packet in packets:
+                assert_that(packet.bytes(),
+                            equal_to(bytearray(RESPONSE)))
+
+    def test_same_as_update(self):
+        """Bytes fed in bulk produce the same packets as update"""
+        data = bytearray(RESPONSE + b'\x06\x01\x04\x01\x02\x03\xfb')
+        expected = [p for p in (self.parser.update(b) for b in data)
+                    if p is not None]
+        actual = list(PacketParser().feed(data))
+
+        assert_that([p.bytes() for p in actual],
+                    equal_to([p.bytes() for p in expected]))
+
+    def test_error_resume(self):
+        """Parsing resumes after the offending byte"""
+        data = b'\x06\x02' + RESPONSE
+        packets = []
+
+        feed = self.parser.feed(data)
+        assert_that(calling(packets.extend).with_args(feed),
+                    raises(PacketParserUnknownPreamble))
+        assert_that(packets, has_length(1))
+        assert_that(packets[0], instance_of(PacketACK))
+
+        packets = list(self.parser.feed(b''))
+        assert_that(packets, has_length(1))
+        assert_that(packets[0].bytes(), equal_to(bytearray(RESPONSE)))
+
+    def test_update_after_error(self):
+        """Update parses pending bytes first, without losing packets"""
+        data = b'\x02' + RESPONSE + b'\x06'
+        assert_that(calling(list).with_args(self.parser.feed(data)),
+                    raises(PacketParserUnknownPreamble))
+
+        packets = [self.parser.update(n) for n in b'\x15\x18\x06\x06']
+        packets.extend(self.parser.feed(b''))
+
+        assert_that([packet.bytes() for packet in packets], equal_to(
+                [bytearray(RESPONSE), b'\x06', b'\x15', b'\x18',
+                 b'\x06', b'\x06']))
+
+    def test_bad_checksum(self):
+        """Bad checksum in a chunk"""
+        data = RESPONSE[:-1] + b'\xe0' + b'\x06'
+        try:
+            list(self.parser.feed(data))
+            raise AssertionError('No PacketParserBadChecksum')
+        except PacketParserBadChecksum as e:
+            # Malformed packet is kept
+            assert_that(e.packet.bytes(), equal_to(bytearray(data[:-1])))
+        packets = list(self.parser.feed(b''))
+        assert_that(packets, has_length(1))
+        assert_that(packets[0], instance_of(PacketACK))
+
+
+class TestPacketParserLenient(object):
+
+    def setup(self):
+        self.parser = PacketParser(strict=False)
+
+    def test_unknown_preamble(self):
+        """Garbage bytes are skipped"""
+        packets = list(self.parser.feed(b'\x02\xff\x00' + RESPONSE))
+
+        assert_that(packets, has_length(1))
+        assert_that(packets[0].bytes(), equal_to(bytearray(RESPONSE)))
+        assert_that(self.parser.discarded_bytes, equal_to(3))
+        assert_that(self.parser.counters()['unknown_preambles'], equal_to(3))
+
+    def test_bad_length(self):
+        """Bad length is skipped"""
+        packets = list(self.parser.feed(b'\x01\x02\x06'))
+
+        assert_that(packets, has_length(1))
+        assert_that(packets[0], instance_of(PacketACK))
+        assert_that(self.parser.bad_lengths, equal_to(1))
+        assert_that(self.parser.discarded_bytes, equal_to(2))
+
+    def test_unknown_packet_type(self):
+        """Unknown packet type is skipped"""
+        packets = list(self.parser.feed(b'\x01\x03\x02\x06'))
+
+        assert_that(packets, has_length(1))
+        assert_that(packets[0], instance_of(PacketACK))
+        assert_that(self.parser.unknown_types, equal_to(1))
+        assert_that(self.parser.discarded_bytes, equal_to(3))
+
+    def test_bad_checksum(self):
+        """Bad checksum is skipped"""
+        data = RESPONSE[:-1] + b'\xe0' + RESPONSE
+        packets = list(self.parser.feed(data))
+
+        assert_that(packets, has_length(1))
+        assert_that(packets[0].bytes(), equal_to(bytearray(RESPONSE)))
+        assert_that(self.parser.bad_checksums, equal_to(1))
+        assert_that(self.parser.discarded_bytes,
+                    equal_to(len(RESPONSE)))
+
+    def test_acknowledged(self):
+        """Replies are in parse order"""
+        data = (b'\x06' + RESPONSE[:-1] + b'\xe0' + RESPONSE +
+                RESPONSE[:-1] + b'\xe0')
+        control = []
+        packets = list(acknowledged(self.parser, self.parser.feed(data),
+                                    control))
+
+        assert_that(packets, has_length(2))
+        assert_that(control, equal_to([PACKET_NAK, PACKET_ACK, PACKET_NAK]))
+
+    def test_parse_chunk(self):
+        """Parsing resumes after exceptions, with replies in parse order"""
+        parser = PacketParser()
+        data = RESPONSE + b'\x02\x06' + RESPONSE
+        errors = []
+        packets, control = parse_chunk(parser, data, errors.append)
+
+        assert_that(errors, contains_exactly(
+                instance_of(PacketParserUnknownPreamble)))
+        assert_that([packet.bytes() for packet in packets], equal_to([
+                bytearray(RESPONSE), bytearray(b'\x06'),
+                bytearray(RESPONSE)]))
+        assert_that(control, equal_to([PACKET_ACK, PACKET_ACK]))
@@ -0,0 +1,148 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from hamcrest import *
+
+from zwave.controller import ZWaveController
+from zwave.message import SerialAPIGetInitData
+from zwave.packet import PACKET_ACK
+from zwave.packet import Packet
+from zwave.packet import PacketParser
+from zwave.ring import FrameView
+from zwave.ring import RingBuffer
+from zwave.simulator import SimulatedController
+
+
+class TestRingBuffer(object):
+
+    FULL_PACKET = bytes(Packet.create(packet_type=0x00, message_type=0x04,
+                                      body=[0x00, 0x02, 0x01, 0x20]).bytes())
+
+    def setup(self):
+        self.ring = RingBuffer(size=2 * RingBuffer.MAX_FRAME)
+
+    def test_frames(self):
+        """Frames are viewed in place"""
+        self.ring.write(b'\x06' + self.FULL_PACKET)
+        frames = list(self.ring.frames())
+
+        assert_that(frames, contains_exactly(instance_of(FrameView),
+                                             instance_of(FrameView)))
+        assert_that(frames[0].materialize(), same_instance(PACKET_ACK))
+        view = frames[1]
+        assert_that((view.preamble, view.length, view.packet_type,
+                     view.message_type, bytes(view.body), view.checksum),
+                    equal_to((0x01, 0x07, 0x00, 0x04, b'\x00\x02\x01\x20',
+                              self.FULL_PACKET[-1])))
+        packet = view.materialize()
+        assert_that(packet.bytes(), equal_to(self.FULL_PACKET))
+        assert_that(packet.body, equal_to(b'\x00\x02\x01\x20'))
+
+    def test_partial(self):
+        """Partial frame is kept for the next scan"""
+        self.ring.write(self.FULL_PACKET[:5])
+        assert_that(list(self.ring.frames()), empty())
+        self.ring.write(self.FULL_PACKET[5:])
+        assert_that([x.bytes() for x in self.ring.frames()],
+                    equal_to([self.FULL_PACKET]))
+
+    def test_wrap(self):
+        """Views are invalidated when the buffer wraps"""
+        self.ring.write(self.FULL_PACKET)
+        view = list(self.ring.frames())[0]
+        for _ in range(100):
+            self.ring.write(self.FULL_PACKET)
+            assert_that(list(self.ring.frames()), has_length(1))
+
+        assert_that(self.ring.generation, greater_than(0))
+        assert_that(view.valid, equal_to(False))
+        assert_that(calling(view.materialize), raises(ValueError))
+
+    def test_wrap_fields(self):
+        """Fields of a stale view can't be read"""
+        self.ring.write(self.FULL_PACKET)
+        view = list(self.ring.frames())[0]
+        assert_that(view.message_type, equal_to(self.FULL_PACKET[3]))
+        while self.ring.generation == 0:
+            self.ring.write(self.FULL_PACKET)
+            list(self.ring.frames())
+
+        for name in ['preamble', 'length', 'packet_type', 'message_type',
+                     'body', 'checksum']:
+            assert_that(calling(getattr).with_args(view, name),
+                        raises(ValueError))
+
+    def test_lenient(self):
+        """Malformed bytes are skipped like a lenient PacketParser"""
+        data = (b'\x02\x01\x02\x06\x01\x03\x02\x06' + self.FULL_PACKET[:-1] +
+                b'\x00' + self.FULL_PACKET)
+        parser = PacketParser(strict=False)
+        packets = list(parser.feed(data))
+        self.ring.write(data)
+        views = list(self.ring.frames())
+
+        assert_that([x.bytes() for x in views],
+                    equal_to([bytes(x.bytes()) for x in packets]))
+        assert_that(self.ring.counters(), equal_to(parser.counters()))
+
+    def test_lenient_unknown_message_type(self):
+        """Unknown MessageType of a corrupted frame is counted like a lenient
+        PacketParser, however the bytes are split"""
+        unknown = bytes(Packet.create(packet_type=0x00, message_type=0xee,
+                                      body=[0x01]).bytes())
+        data = (unknown[:-1] + bytes((unknown[-1] ^ 0xff,)) + unknown +
+                b'\x06' + self.FULL_PACKET + unknown[:4])
+        for step in range(1, len(data) + 1):
+            parser = PacketParser(strict=False)
+            ring = RingBuffer(size=2 * RingBuffer.MAX_FRAME)
+            packets = []
+            views = []
+            for i in range(0, len(data), step):
+                packets.extend(parser.feed(data[i:i + step]))
+                ring.write(data[i:i + step])
+                views.extend(x.bytes() for x in ring.frames())
+
+            assert_that(views, equal_to([bytes(x.bytes()) for x in packets]))
+            assert_that(ring.counters(), equal_to(parser.counters()))
+            assert_that(ring.unknown_message_types, equal_to(3))
+
+
+class TestZWaveControllerRing(object):
+
+    def setup(self):
+        self.simulator = SimulatedController(nodes=[1, 2], report_rate=2000,
+                                             seed=0)
+        self.controller = ZWaveController(self.simulator.path,
+                                          ring_size=4096)
+
+    def teardown(self):
+        self.controller.close()
+        self.simulator.close()
+
+    def test_read(self):
+        """Reports are read as views, and requests still work"""
+        views = [self.controller.read(timeout=1) for _ in range(100)]
+        assert_that(views, only_contains(instance_of(FrameView)))
+        assert_that(views[-1].body[1], equal_to(2))
+
+        message = self.controller.request(SerialAPIGetInitData)
+        assert_that(list(message.nodes), equal_to([1, 2]))
+        # Reports received during the request are kept as Packets
+        for packet in self.controller.unsolicited:
+            assert_that(packet, instance_of(Packet))
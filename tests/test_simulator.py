@@ -0,0 +1,108 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from hamcrest import *
+
+from zwave.controller import ZWaveController
+from zwave.controller import ZWaveControllerRejected
+from zwave.controller import ZWaveControllerTimeout
+from zwave.message import SerialAPIGetInitData
+from zwave.packet import MessageType
+from zwave.packet import Packet
+from zwave.packet import PacketType
+from zwave.simulator import SimulatedController
+from zwave.simulator import TransmitStatus
+
+
+class TestSimulatedController(object):
+
+    def setup(self):
+        self.simulator = None
+        self.controller = None
+
+    def teardown(self):
+        if self.controller is not None:
+            self.controller.close()
+        if self.simulator is not None:
+            self.simulator.close()
+
+    def start(self, **kwargs):
+        self.simulator = SimulatedController(seed=0, **kwargs)
+        self.controller = ZWaveController(self.simulator.path)
+
+    def send_data(self, node, callback_id):
+        """Send a BASIC GET to a node"""
+        return Packet.create(packet_type=PacketType.REQUEST,
+                             message_type=MessageType.ZW_SEND_DATA,
+                             body=[node, 0x02, 0x20, 0x02, 0x25, callback_id])
+
+    def test_discover(self):
+        """Discovery responses"""
+        self.start(nodes=[1, 2, 17], home_id=0x01020304, latency=0.001)
+        discovery = self.controller.discover()
+        assert_that(list(discovery.init_data.nodes), equal_to([1, 2, 17]))
+        assert_that(discovery.capabilities.supports_message_type(
+                MessageType.ZW_SEND_DATA), equal_to(True))
+        assert_that(discovery.memory_id.home_id, equal_to(0x01020304))
+
+    def test_send_data(self):
+        """Send data response and callbacks"""
+        self.start(nodes=[1, 2])
+        for node, status in [(2, TransmitStatus.OK),
+                             (3, TransmitStatus.NO_ACK)]:
+            self.controller.send(self.send_data(node, 0x42))
+            response = self.controller.read(timeout=1)
+            assert_that(response.body, equal_to(b'\x01'))
+            callback = self.controller.read(timeout=1)
+            assert_that(callback.packet_type, equal_to(PacketType.REQUEST))
+            assert_that(callback.body, equal_to(bytes([0x42, status])))
+
+    def test_nak(self):
+        """Every request is NAKed"""
+        self.start(nak_rate=1.0)
+        assert_that(calling(self.controller.request).with_args(
+                            SerialAPIGetInitData, retransmissions=0),
+                    raises(ZWaveControllerRejected))
+        assert_that(self.simulator.naks, equal_to(1))
+
+    def test_drop(self):
+        """Every request is dropped"""
+        self.start(drop_rate=1.0)
+        assert_that(calling(self.controller.request).with_args(
+                            SerialAPIGetInitData, ack_timeout=0.05,
+                            retransmissions=0),
+                    raises(ZWaveControllerTimeout))
+        assert_that(self.simulator.dropped, equal_to(1))
+
+    def test_reports(self):
+        """Unsolicited reports"""
+        self.start(nodes=[1, 5], report_rate=1000)
+        for _ in range(10):
+            packet = self.controller.read(timeout=1)
+            assert_that(packet.message_type,
+                        equal_to(MessageType.APPLICATION_COMMAND_HANDLER))
+            assert_that(packet.body[1], equal_to(5))
+
+    def test_load(self):
+        """Many requests"""
+        self.start()
+        for _ in range(200):
+            message = self.controller.request(SerialAPIGetInitData)
+            assert_that(list(message.nodes), equal_to([1]))
+        assert_that(self.simulator.requests, equal_to(200))
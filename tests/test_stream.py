@@ -0,0 +1,97 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import io
+import socket
+import threading
+
+from hamcrest import *
+
+from frames import REPORT
+from frames import RESPONSE
+
+from zwave.message import SerialAPIGetInitData
+from zwave.packet import PACKET_ACK
+from zwave.packet import MessageType
+from zwave.packet import PacketParserUnknownPreamble
+from zwave.packet import PacketType
+from zwave.packet import Preamble
+from zwave.stream import decoded
+from zwave.stream import filtered
+from zwave.stream import iter_chunks
+from zwave.stream import iter_messages
+from zwave.stream import iter_packets
+
+
+class TestStream(object):
+
+    DATA = b'\x06' + REPORT + b'\x02' + RESPONSE + REPORT
+
+    def test_chunks(self):
+        """Chunks from bytes, files and iterables"""
+        assert_that(list(iter_chunks(self.DATA)), equal_to([self.DATA]))
+        assert_that(b''.join(iter_chunks(io.BytesIO(self.DATA), size=7)),
+                    equal_to(self.DATA))
+        assert_that(list(iter_chunks(iter([b'\x06', b'\x15']))),
+                    equal_to([b'\x06', b'\x15']))
+
+    def test_packets(self):
+        """Packets split across chunks, skipping malformed bytes"""
+        chunks = [self.DATA[i:i + 5] for i in range(0, len(self.DATA), 5)]
+        packets = list(iter_packets(chunks))
+
+        assert_that(packets, has_length(4))
+        assert_that(packets[0], same_instance(PACKET_ACK))
+        assert_that(packets[2].bytes(), equal_to(RESPONSE))
+
+    def test_strict(self):
+        """Strict parsing raises"""
+        assert_that(calling(list).with_args(iter_packets(self.DATA,
+                                                         strict=True)),
+                    raises(PacketParserUnknownPreamble))
+
+    def test_socket(self):
+        """Packets from a socket"""
+        a, b = socket.socketpair()
+
+        def send():
+            with b:
+                for i in range(0, len(self.DATA), 3):
+                    b.sendall(self.DATA[i:i + 3])
+
+        thread = threading.Thread(target=send)
+        thread.start()
+        with a:
+            packets = list(iter_packets(a))
+        thread.join()
+        assert_that(packets, has_length(4))
+
+    def test_pipeline(self):
+        """Filter and decode stages"""
+        messages = list(decoded(filtered(
+                iter_packets(self.DATA), preamble=Preamble.SOF,
+                packet_type=PacketType.RESPONSE)))
+        assert_that(messages, contains_exactly(
+                instance_of(SerialAPIGetInitData)))
+
+        reports = list(iter_messages(
+                io.BytesIO(self.DATA),
+                message_types=[MessageType.APPLICATION_COMMAND_HANDLER],
+                predicate=lambda packet: packet.body[1] == 0x02))
+        assert_that(reports, has_length(2))
@@ -0,0 +1,111 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from hamcrest import *
+
+from zwave.controller import ZWaveController
+from zwave.message import SerialAPIGetInitData
+from zwave.packet import PACKET_ACK
+from zwave.packet import PacketParser
+from zwave.packet import PacketParserBadChecksum
+from zwave.packet import PacketParserUnknownPreamble
+from zwave.simulator import SimulatedController
+from zwave.trace import RecordingTracer
+from zwave.trace import SamplingTracer
+
+
+class TestParserTracing(object):
+
+    FULL_PACKET = b'\x01\x03\x01\x05\xf8'
+
+    def setup(self):
+        self.tracer = RecordingTracer()
+        self.parser = PacketParser(strict=False)
+        self.parser.tracer = self.tracer
+
+    def names(self):
+        return [event.name for event in self.tracer.events]
+
+    def test_frames(self):
+        """Frame start and complete"""
+        packets = list(self.parser.feed(b'\x06' + self.FULL_PACKET))
+
+        assert_that(self.names(), equal_to(
+                ['frame_complete', 'frame_start', 'frame_complete']))
+        events = self.tracer.events
+        assert_that(events[0].args, equal_to((PACKET_ACK,)))
+        assert_that(events[2].args[0], same_instance(packets[1]))
+        assert_that(events[2].timestamp,
+                    greater_than_or_equal_to(events[1].timestamp))
+
+    def test_errors(self):
+        """Errors are traced when not strict"""
+        list(self.parser.feed(b'\x02' + self.FULL_PACKET[:-1] + b'\x00'))
+
+        assert_that(self.names(), equal_to(['error', 'frame_start', 'error']))
+        assert_that(self.tracer.events[0].args[0],
+                    instance_of(PacketParserUnknownPreamble))
+        assert_that(self.tracer.events[2].args[0],
+                    instance_of(PacketParserBadChecksum))
+
+    def test_strict(self):
+        """Errors are traced and raised when strict"""
+        self.parser.strict = True
+        assert_that(calling(list).with_args(self.parser.feed(b'\x02\x06')),
+                    raises(PacketParserUnknownPreamble))
+        assert_that(self.names(), equal_to(['error']))
+
+
+class TestSamplingTracer(object):
+
+    def test_rate(self):
+        """Nothing or everything is sampled"""
+        for rate, count in [(0.0, 1), (1.0, 5)]:
+            recorder = RecordingTracer()
+            parser = PacketParser(strict=False)
+            parser.tracer = SamplingTracer(recorder, rate, seed=0)
+            list(parser.feed(b'\x06\x02' + TestParserTracing.FULL_PACKET +
+                             b'\x06'))
+            # Errors are always passed on
+            assert_that(recorder.events, has_length(count))
+
+
+class TestControllerTracing(object):
+
+    def setup(self):
+        self.simulator = SimulatedController()
+        self.controller = ZWaveController(self.simulator.path)
+        self.tracer = RecordingTracer()
+        self.controller.tracer = self.tracer
+
+    def teardown(self):
+        self.controller.close()
+        self.simulator.close()
+
+    def test_request(self):
+        """Request exchange"""
+        self.controller.request(SerialAPIGetInitData)
+
+        names = [event.name for event in self.tracer.events]
+        assert_that(names[:2], equal_to(['before_write', 'after_write']))
+        assert_that(names, has_items('frame_received', 'ack_sent'))
+        assert_that(names[-3:], equal_to(
+                ['before_write', 'after_write', 'ack_sent']))
+        timestamps = [event.timestamp for event in self.tracer.events]
+        assert_that(timestamps, equal_to(sorted(timestamps)))
@@ -0,0 +1,283 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import collections
+import logging
+import os
+
+import serial
+
+from .controller import ZWaveController
+from .controller import ZWaveControllerClosed
+from .controller import read_chunk
+from .packet import PacketParser
+from .packet import PacketType
+from .packet import Preamble
+from .packet import parse_chunk
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncZWaveController(object):
+    """Interfaces with serial device controller to read/write packets from an
+    asyncio event loop
+
+    Packets are read by an event loop reader on the serial device, and SOF
+    packets are ACKed as soon as they are parsed. Writes are queued, and
+    drained by an event loop writer, so a device that stops accepting bytes
+    never blocks the event loop. Unsolicited requests from
+    the controller are queued separately, and are returned by iterating
+    over the controller with async for.
+
+    If reading from or writing to the device fails, the reader is removed,
+    and the error is raised from every pending and later read and send.
+
+    Attributes:
+        PACKET_QUEUE_SIZE (int): default maximum packets waiting for read,
+            before the oldest one is dropped
+        UNSOLICITED_QUEUE_SIZE (int): default maximum unsolicited requests
+            kept, before the oldest one is dropped
+
+    """
+    PACKET_QUEUE_SIZE = 256
+    UNSOLICITED_QUEUE_SIZE = 256
+
+    def __init__(self, path, strict=True,
+                 packet_queue_size=PACKET_QUEUE_SIZE,
+                 unsolicited_queue_size=UNSOLICITED_QUEUE_SIZE):
+        """Must be called from a running event loop
+
+        Arguments:
+            path (str): path to serial device
+
+        Keyword Arguments:
+            strict (bool): raise parsing exceptions from read, default is
+                True. If False, malformed bytes are skipped, and a NAK is
+                sent for every packet with a bad checksum
+            packet_queue_size (int): maximum packets waiting for read
+            unsolicited_queue_size (int): maximum unsolicited requests kept
+
+        Raises:
+            serial.serialutil.SerialException: if failed to open device
+            RuntimeError: if there is no running event loop
+
+        """
+        super(AsyncZWaveController, self).__init__()
+        self.loop = asyncio.get_running_loop()
+        self.path = path
+        self.device = serial.Serial(port=self.path, baudrate=115200,
+                                    rtscts=True, dsrdtr=True, timeout=0)
+        self.fd = self.device.fileno()
+        self.packet_parser = PacketParser(strict=strict)
+        # Responses and ACK/NAK/CAN, parsing exceptions, or the error
+        self.packets = asyncio.Queue(maxsize=packet_queue_size)
+        # Requests sent by the controller, None once closed
+        self.unsolicited = asyncio.Queue(maxsize=unsolicited_queue_size)
+        # Device error, or ZWaveControllerClosed, raised by every read
+        self.error = None
+        self.read_buffer = bytearray(ZWaveController.READ_BUFFER_SIZE)
+        self.read_view = memoryview(self.read_buffer)
+        # Bytes waiting to be written, with the future of their send
+        self.write_queue = collections.deque()
+        # Waiting for the device to be writable
+        self.writing = False
+        self.loop.add_reader(self.fd, self._on_readable)
+
+    def _on_readable(self):
+        """Event loop reader callback, parses and dispatches all pending
+        bytes
+
+        """
+        try:
+            data = read_chunk(self.device, self.read_view)
+        except (OSError, serial.SerialException) as e:
+            logger.exception('Failed to read from [%s]', self.path)
+            self._fail(e)
+            return
+
+        # ACK parsed packets, and ask for retransmission of corrupted ones.
+        # Parsing exceptions are handed to read
+        packets, control = parse_chunk(self.packet_parser, data,
+                                       lambda e: self._put(self.packets, e))
+        if control:
+            self._queue(b''.join(packet.bytes() for packet in control))
+
+        for packet in packets:
+            self._dispatch(packet)
+
+    def _fail(self, error):
+        """Stop reading, raise error from every pending and later read, and
+        end iteration
+
+        Arguments:
+            error (Exception): raised by read
+
+        """
+        if self.error is not None:
+            return
+        self.error = error
+        self.loop.remove_reader(self.fd)
+        if self.writing:
+            self.writing = False
+            self.loop.remove_writer(self.fd)
+        while self.write_queue:
+            _, future = self.write_queue.popleft()
+            if future is not None and not future.done():
+                future.set_exception(error)
+        self._put(self.packets, error)
+        self._put(self.unsolicited, None)
+
+    def _put(self, packets, packet):
+        """Queue a packet, dropping the oldest one if the queue is full
+
+        Arguments:
+            packets (asyncio.Queue): to put packet in
+            packet (Packet): to queue
+
+        """
+        if packets.full():
+            dropped = packets.get_nowait()
+            logger.warning('Dropping packet, queue full: %s', dropped)
+        packets.put_nowait(packet)
+
+    def _dispatch(self, packet):
+        """Queue a parsed and ACKed packet
+
+        Arguments:
+            packet (Packet): parsed packet
+
+        """
+        if packet.preamble != Preamble.SOF:
+            self._put(self.packets, packet)
+        elif packet.packet_type == PacketType.REQUEST:
+            self._put(self.unsolicited, packet)
+        else:
+            self._put(self.packets, packet)
+
+    def _queue(self, data, future=None):
+        """Queue bytes to write, and write right away if nothing else is
+        queued
+
+        Arguments:
+            data (bytes): to write
+
+        Keyword Arguments:
+            future (asyncio.Future): resolved once all bytes are written
+
+        """
+        if self.error is not None:
+            if future is not None:
+                future.set_exception(self.error)
+            return
+        self.write_queue.append((data, future))
+        if len(self.write_queue) == 1:
+            self._on_writable()
+
+    def _on_writable(self):
+        """Event loop writer callback, writes as many queued bytes as the
+        device accepts
+
+        """
+        while self.write_queue:
+            data, future = self.write_queue[0]
+            try:
+                written = os.write(self.fd, data)
+            except BlockingIOError:
+                written = 0
+            except OSError as e:
+                logger.exception('Failed to write to [%s]', self.path)
+                self._fail(e)
+                return
+            if written < len(data):
+                # Wait until writable
+                self.write_queue[0] = (data[written:], future)
+                if not self.writing:
+                    self.writing = True
+                    self.loop.add_writer(self.fd, self._on_writable)
+                return
+            self.write_queue.popleft()
+            if future is not None and not future.done():
+                future.set_result(None)
+
+        if self.writing:
+            self.writing = False
+            self.loop.remove_writer(self.fd)
+
+    async def send(self, packet):
+        """Write a packet to the serial device. Returns once all its bytes
+        are written, without blocking the event loop.
+
+        Arguments:
+            packet (Packet): to write
+
+        Raises:
+            zwave.controller.ZWaveControllerClosed: once closed
+            OSError: if writing to the device failed
+
+        """
+        future = self.loop.create_future()
+        self._queue(packet.bytes(), future)
+        await future
+
+    async def read(self):
+        """Read the next response, ACK, NAK or CAN packet
+
+        Return:
+            Packet
+
+        Raises:
+            zwave.packet.PacketParserException: if parsing exception occured
+            zwave.controller.ZWaveControllerClosed: once closed
+            serial.serialutil.SerialException: if reading from the device
+                failed
+
+        """
+        packet = await self.packets.get()
+        if isinstance(packet, Exception):
+            if packet is self.error:
+                # Wake up other readers too
+                self.packets.put_nowait(packet)
+            raise packet
+        return packet
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        """Get the next unsolicited request from the controller
+
+        Return:
+            Packet
+
+        Raises:
+            StopAsyncIteration: once closed
+
+        """
+        packet = await self.unsolicited.get()
+        if packet is None:
+            # Wake up other iterators too
+            self.unsolicited.put_nowait(None)
+            raise StopAsyncIteration
+        return packet
+
+    def close(self):
+        self._fail(ZWaveControllerClosed())
+        self.device.close()
@@ -0,0 +1,293 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import collections
+import multiprocessing
+import os
+
+from .capture import CaptureReader
+from .capture import Direction
+from .metrics import frame_name
+from .packet import CONTROL_PACKETS
+from .packet import PacketParser
+from .packet import PacketType
+from .packet import Preamble
+from .packet import checksum
+from .stream import decoded
+
+
+# Offline analysis of large captures on all cores:
+#
+#     for message in iter_decoded('traffic.zwcap'):
+#         ...
+#
+# The read bytes of a capture are split into chunks of about CHUNK_SIZE
+# bytes at likely frame boundaries, and every chunk is parsed by a lenient
+# PacketParser in a process pool. Results are merged in capture order. A
+# chunk that ends in the middle of a frame means the next split was not a
+# real frame boundary, so the next chunk is parsed again in this process,
+# continuing from the parser state at the end of the chunk. The output is
+# the same as one lenient PacketParser over the whole capture.
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# Bytes searched for a frame boundary after every split
+SEARCH_SIZE = 4 * (0xff + 2)
+
+# Chunks per worker process submitted ahead of the chunk being consumed
+IN_FLIGHT = 2
+
+
+class _Stream(object):
+    """Read bytes of a capture, as one stream split across records
+
+    """
+
+    def __init__(self, path, direction):
+        super(_Stream, self).__init__()
+        self.path = path
+        with CaptureReader(path) as reader:
+            self.segments = reader.segments(direction=direction)
+        # Stream offset of every segment
+        self.offsets = []
+        self.size = 0
+        for _, length in self.segments:
+            self.offsets.append(self.size)
+            self.size += length
+
+    def pieces(self, start, end):
+        """Get the file ranges of stream bytes [start, end)
+
+        Return:
+            list of (file offset, length)
+
+        """
+        pieces = []
+        for (offset, length), position in zip(self.segments, self.offsets):
+            if position >= end:
+                break
+            if position + length <= start:
+                continue
+            skip = max(0, start - position)
+            pieces.append((offset + skip,
+                           min(length, end - position) - skip))
+        return pieces
+
+
+def _read(path, pieces):
+    """Read file ranges
+
+    Yield:
+        bytes of every range
+
+    """
+    with open(path, 'rb') as f:
+        for offset, length in pieces:
+            f.seek(offset)
+            yield f.read(length)
+
+
+def _frame_size(data, i):
+    """Size of the frame at data[i] if it is a valid SOF frame, else 0"""
+    if data[i] != Preamble.SOF or len(data) - i < 3:
+        return 0
+    length = data[i + 1]
+    size = length + 2
+    if (length < 3 or data[i + 2] not in PacketType.ALL or
+            len(data) - i < size or
+            checksum(data[i + 1:i + size - 1]) != data[i + size - 1]):
+        return 0
+    return size
+
+
+def _boundary(data):
+    """Find the first likely frame boundary: a valid SOF frame, followed by
+    another valid frame, or the end of data
+
+    Return:
+        int offset in data, or None if not found
+
+    """
+    for i in range(len(data)):
+        size = _frame_size(data, i)
+        if not size:
+            continue
+        j = i + size
+        if (j == len(data) or data[j] in CONTROL_PACKETS or
+                _frame_size(data, j)):
+            return i
+    return None
+
+
+def _chunks(stream, chunk_size):
+    """Split a stream into chunks at likely frame boundaries
+
+    Return:
+        list of (start, end) stream offsets
+
+    """
+    splits = [0]
+    target = chunk_size
+    while target < stream.size:
+        window = b''.join(_read(stream.path, stream.pieces(
+                target, target + SEARCH_SIZE)))
+        i = _boundary(window)
+        if i is not None:
+            splits.append(target + i)
+        target = max(target, splits[-1]) + chunk_size
+    splits.append(stream.size)
+    return list(zip(splits, splits[1:]))
+
+
+def _decode(packets):
+    return list(decoded(packets))
+
+
+def _count(packets):
+    return collections.Counter(frame_name(packet) for packet in packets)
+
+
+def _run(task):
+    """Parse a chunk in a worker
+
+    Arguments:
+        task (tuple): path, file ranges, PacketParser to continue or None,
+            and function applied to the list of packets
+
+    Return:
+        tuple of result, parser counters of the chunk, and the parser if
+        the chunk ended in the middle of a frame, else None
+
+    """
+    path, pieces, parser, handle = task
+    if parser is None:
+        parser = PacketParser(strict=False)
+    before = parser.counters()
+    packets = []
+    for data in _read(path, pieces):
+        packets.extend(parser.feed(data))
+    counters = dict((name, value - before[name])
+                    for name, value in parser.counters().items())
+    if parser.state == PacketParser.State.PREAMBLE:
+        parser = None
+    return handle(packets), counters, parser
+
+
+def _results(path, handle, processes, chunk_size, direction):
+    """Parse a capture in a process pool
+
+    Yield:
+        (result, counters) of every chunk, in order
+
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    stream = _Stream(path, direction)
+    if processes == 1:
+        # One parser over all chunks, in this process
+        parser = PacketParser(strict=False)
+        for start in range(0, stream.size, chunk_size):
+            result, counters, _ = _run((path, stream.pieces(
+                    start, start + chunk_size), parser, handle))
+            yield result, counters
+        return
+
+    tasks = [(path, stream.pieces(start, end), None, handle)
+             for start, end in _chunks(stream, chunk_size)]
+    with multiprocessing.Pool(processes) as pool:
+        # Only IN_FLIGHT chunks per process are parsed or waiting to be
+        # consumed at once, to bound memory
+        window = processes * IN_FLIGHT
+        pending = collections.deque(pool.apply_async(_run, (task,))
+                                    for task in tasks[:window])
+        parser = None
+        for i, task in enumerate(tasks):
+            result = pending.popleft().get()
+            if i + window < len(tasks):
+                pending.append(pool.apply_async(_run, (tasks[i + window],)))
+            if parser is not None:
+                # Previous chunk ended mid frame, so continue its parser
+                result = _run(task[:2] + (parser, handle))
+            result, counters, parser = result
+            yield result, counters
+
+
+def iter_decoded(path, processes=None, chunk_size=CHUNK_SIZE,
+                 direction=Direction.READ):
+    """Parse and decode a capture in parallel
+
+    Malformed bytes are skipped, as with a PacketParser that is not strict.
+
+    Arguments:
+        path (str): capture written by zwave.capture.CaptureWriter
+
+    Keyword Arguments:
+        processes (int): number of worker processes, default is None for
+            one per CPU. 1 parses in this process
+        chunk_size (int): approximate bytes parsed by a worker at once,
+            default is CHUNK_SIZE
+        direction (int): Direction of records, default is READ
+
+    Yield:
+        Message, or Packet, as yielded by zwave.stream.decoded, in capture
+        order
+
+    Raises:
+        zwave.capture.CaptureException: if capture is malformed
+
+    """
+    for messages, _ in _results(path, _decode, processes, chunk_size,
+                                direction):
+        for message in messages:
+            yield message
+
+
+def summarize(path, processes=None, chunk_size=CHUNK_SIZE,
+              direction=Direction.READ):
+    """Count frames and parsing errors of a capture in parallel
+
+    Arguments:
+        path (str): capture written by zwave.capture.CaptureWriter
+
+    Keyword Arguments:
+        processes (int): number of worker processes, default is None for
+            one per CPU. 1 parses in this process
+        chunk_size (int): approximate bytes parsed by a worker at once,
+            default is CHUNK_SIZE
+        direction (int): Direction of records, default is READ
+
+    Return:
+        dict with 'frames', a dict of zwave.metrics.frame_name to count, and
+        'counters', a dict of PacketParser counter name to value
+
+    Raises:
+        zwave.capture.CaptureException: if capture is malformed
+
+    """
+    frames = collections.Counter()
+    counters = collections.Counter()
+    for chunk_frames, chunk_counters in _results(path, _count, processes,
+                                                 chunk_size, direction):
+        frames.update(chunk_frames)
+        counters.update(chunk_counters)
+    return {
+        'frames': dict(frames),
+        'counters': dict((name, counters[name])
+                         for name in PacketParser(strict=False).counters()),
+    }
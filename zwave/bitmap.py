@@ -0,0 +1,129 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# Positions of the bits set in every byte value
+BIT_POSITIONS = tuple(tuple(b for b in range(8) if x & (1 << b))
+                      for x in range(256))
+
+
+class NodeBitmap(object):
+    """Immutable set of ids starting at 1, such as node ids or supported
+    message types, backed by an int. On the wire, bit b of byte i is set for
+    id 1 + (i * 8) + b.
+
+    Attributes:
+        value (int): bit (id - 1) is set for every id in the set
+
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, ids=(), value=0):
+        """
+        Keyword Arguments:
+            ids (iterable(int)): ids in the set, default is empty
+            value (int): bits of ids in the set, default is 0
+
+        Raises:
+            ValueError: if an id is less than 1
+
+        """
+        super(NodeBitmap, self).__init__()
+        for x in ids:
+            if x < 1:
+                raise ValueError('Bad id: [%d] must be at least 1' % (x))
+            value |= 1 << (x - 1)
+        self.value = value
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Create a NodeBitmap from a wire bitmap
+
+        Arguments:
+            data (bytes, list(int)): bitmap bytes
+
+        Return:
+            NodeBitmap
+
+        """
+        return cls(value=int.from_bytes(bytes(data), byteorder='little'))
+
+    def to_bytes(self, length):
+        """Get the wire bitmap
+
+        Arguments:
+            length (int): number of bytes
+
+        Return:
+            bytes
+
+        Raises:
+            OverflowError: if an id does not fit in length bytes
+
+        """
+        return self.value.to_bytes(length, byteorder='little')
+
+    def __contains__(self, x):
+        return x >= 1 and (self.value >> (x - 1)) & 1 == 1
+
+    def __iter__(self):
+        data = self.value.to_bytes((self.value.bit_length() + 7) // 8,
+                                   byteorder='little')
+        for i, x in enumerate(data):
+            if x:
+                base = 1 + (i * 8)
+                for b in BIT_POSITIONS[x]:
+                    yield base + b
+
+    def __len__(self):
+        return bin(self.value).count('1')
+
+    def __bool__(self):
+        return self.value != 0
+
+    def __eq__(self, other):
+        if not isinstance(other, NodeBitmap):
+            return NotImplemented
+        return self.value == other.value
+
+    def __ne__(self, other):
+        if not isinstance(other, NodeBitmap):
+            return NotImplemented
+        return self.value != other.value
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __or__(self, other):
+        return NodeBitmap(value=self.value | other.value)
+
+    def __and__(self, other):
+        return NodeBitmap(value=self.value & other.value)
+
+    def __sub__(self, other):
+        return NodeBitmap(value=self.value & ~other.value)
+
+    def __xor__(self, other):
+        return NodeBitmap(value=self.value ^ other.value)
+
+    def __str__(self):
+        return 'NodeBitmap: [%s]' % (', '.join(str(x) for x in self))
+
+    def __repr__(self):
+        return 'NodeBitmap(%r)' % (list(self))
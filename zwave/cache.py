@@ -0,0 +1,182 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import collections
+import json
+import logging
+import os
+import tempfile
+
+from .message import decode
+from .message import MemoryGetId
+from .message import SerialAPIGetCapabilities
+from .message import SerialAPIGetInitData
+from .message import ZWGetControllerCapabilities
+from .packet import PacketParser
+from .packet import PacketParserException
+
+
+logger = logging.getLogger(__name__)
+
+
+# Decoded discovery responses of a controller
+Discovery = collections.namedtuple('Discovery', [
+        'init_data', 'capabilities', 'controller_capabilities', 'memory_id'])
+
+# Message class of every Discovery field
+DISCOVERY_MESSAGES = Discovery(
+        init_data=SerialAPIGetInitData,
+        capabilities=SerialAPIGetCapabilities,
+        controller_capabilities=ZWGetControllerCapabilities,
+        memory_id=MemoryGetId)
+
+
+def identity(discovery):
+    """Get the identity of a controller: manufacturer id, product type,
+    product id and home id
+
+    Arguments:
+        discovery (Discovery): of the controller
+
+    Return:
+        str
+
+    """
+    return '%04x:%04x:%04x:%08x' % (
+            discovery.capabilities.manufacturer_id,
+            discovery.capabilities.product_type,
+            discovery.capabilities.product_id,
+            discovery.memory_id.home_id)
+
+
+class DiscoveryCache(object):
+    """On-disk cache of controller discovery responses, keyed by controller
+    identity. The raw response packets are stored, and are parsed and
+    decoded again when loaded.
+
+    The file is JSON:
+        {
+            "version": 1,
+            "devices": {device path: identity},
+            "controllers": {identity: {field: packet hex}}
+        }
+
+    Attributes:
+        VERSION (int): file format version
+        path (str): cache file path
+
+    """
+    VERSION = 1
+
+    def __init__(self, path):
+        """Load a cache file. A missing, unreadable, or different version file
+        is an empty cache.
+
+        Arguments:
+            path (str): cache file path
+
+        """
+        super(DiscoveryCache, self).__init__()
+        self.path = path
+        self.devices = {}
+        self.controllers = {}
+
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning('Ignoring discovery cache [%s]: %s', self.path, e)
+            return
+
+        if data.get('version') != DiscoveryCache.VERSION:
+            logger.warning('Ignoring discovery cache [%s] version [%s]',
+                           self.path, data.get('version'))
+            return
+        self.devices = data.get('devices', {})
+        self.controllers = data.get('controllers', {})
+
+    def get(self, device):
+        """Get the cached discovery of the controller last seen at a device
+        path
+
+        Arguments:
+            device (str): serial device path
+
+        Return:
+            Discovery, or None if not cached
+
+        """
+        frames = self.controllers.get(self.devices.get(device))
+        if frames is None:
+            return None
+
+        try:
+            messages = {}
+            for field, message_class in zip(Discovery._fields,
+                                            DISCOVERY_MESSAGES):
+                parser = PacketParser()
+                packets = list(parser.feed(bytes.fromhex(frames[field])))
+                message = decode(packets[0])
+                if not isinstance(message, message_class):
+                    raise ValueError('Bad cached %s' % (field))
+                messages[field] = message
+        except (KeyError, IndexError, ValueError,
+                PacketParserException) as e:
+            logger.warning('Ignoring discovery cache entry [%s]: %s',
+                           device, e)
+            return None
+
+        return Discovery(**messages)
+
+    def put(self, device, discovery):
+        """Store the discovery of the controller at a device path, and save
+        the cache file
+
+        Arguments:
+            device (str): serial device path
+            discovery (Discovery): of the controller
+
+        """
+        key = identity(discovery)
+        self.devices[device] = key
+        self.controllers[key] = dict(
+                (field, bytes(message.bytes()).hex())
+                for field, message in zip(Discovery._fields, discovery))
+        self.save()
+
+    def save(self):
+        """Atomically write the cache file
+
+        """
+        data = {
+            'version': DiscoveryCache.VERSION,
+            'devices': self.devices,
+            'controllers': self.controllers,
+        }
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.zwave-cache-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=4, sort_keys=True)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
@@ -0,0 +1,275 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import collections
+import os
+import struct
+import time
+
+from .message import decode
+from .packet import PacketParser
+
+
+class Direction(object):
+    """Direction of captured bytes. SESSION records have no bytes, and mark
+    the start of a recording session, which has its own monotonic clock.
+
+    """
+    READ = 0x00
+    WRITE = 0x01
+    SESSION = 0x02
+
+    ALL = [READ, WRITE, SESSION]
+
+
+# Captured bytes: direction, monotonic timestamp in nanoseconds, and raw bytes
+Record = collections.namedtuple('Record', ['direction', 'timestamp', 'data'])
+
+
+class CaptureException(Exception):
+    """Malformed capture file
+
+    Attributes:
+        error (str): description of error
+        offset (int): file offset of the malformed data
+
+    """
+
+    def __init__(self, error, offset):
+        super(CaptureException, self).__init__(error)
+        self.error = error
+        self.offset = offset
+
+
+class CaptureWriter(object):
+    """Append-only binary capture of bytes crossing the serial line
+
+    The file starts with MAGIC, followed by records of:
+        direction (uint8), timestamp (uint64 nanoseconds), length (uint16),
+        and length raw bytes
+
+    All integers are little endian. Timestamps are from time.monotonic_ns,
+    so only differences between records of one session are meaningful.
+    Every CaptureWriter starts a session with a SESSION record.
+
+    Attributes:
+        MAGIC (bytes): file header
+        RECORD_HEADER (struct.Struct): record header before the raw bytes
+        MAX_LENGTH (int): maximum raw bytes in one record, longer writes are
+            split into several records
+
+    """
+    MAGIC = b'ZWCAP\x00\x00\x01'
+    RECORD_HEADER = struct.Struct('<BQH')
+    MAX_LENGTH = 0xffff
+
+    def __init__(self, path):
+        """Open a capture for appending, write the header if it is new, and
+        start a session
+
+        Arguments:
+            path (str): path to capture file
+
+        Raises:
+            CaptureException: if the existing file is not a capture
+
+        """
+        super(CaptureWriter, self).__init__()
+        self.path = path
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(CaptureWriter.MAGIC)
+        else:
+            with open(path, 'rb') as f:
+                magic = f.read(len(CaptureWriter.MAGIC))
+            if magic != CaptureWriter.MAGIC:
+                self.file.close()
+                raise CaptureException('Bad magic: %r' % magic, 0)
+        self.file.write(CaptureWriter.RECORD_HEADER.pack(
+                Direction.SESSION, time.monotonic_ns(), 0))
+
+    def record(self, direction, data, timestamp=None):
+        """Append bytes to the capture. Safe to call from several threads,
+        since every record is written with one buffered write.
+
+        Arguments:
+            direction (int): Direction of bytes
+            data (bytes): raw bytes read or written
+
+        Keyword Arguments:
+            timestamp (int): monotonic nanoseconds, default is now
+
+        """
+        if timestamp is None:
+            timestamp = time.monotonic_ns()
+        header = CaptureWriter.RECORD_HEADER
+        for i in range(0, len(data), CaptureWriter.MAX_LENGTH):
+            chunk = data[i:i + CaptureWriter.MAX_LENGTH]
+            self.file.write(header.pack(direction, timestamp, len(chunk)) +
+                            bytes(chunk))
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class CaptureReader(object):
+    """Reads records from a capture written by CaptureWriter
+
+    """
+
+    def __init__(self, path):
+        """
+        Arguments:
+            path (str): path to capture file
+
+        Raises:
+            CaptureException: if the file is not a capture
+
+        """
+        super(CaptureReader, self).__init__()
+        self.path = path
+        self.file = open(path, 'rb')
+        magic = self.file.read(len(CaptureWriter.MAGIC))
+        if magic != CaptureWriter.MAGIC:
+            self.file.close()
+            raise CaptureException('Bad magic: %r' % magic, 0)
+
+    def __iter__(self):
+        """Iterate over records
+
+        Return:
+            iterator of Record
+
+        Raises:
+            CaptureException: if a record is malformed or truncated
+
+        """
+        header = CaptureWriter.RECORD_HEADER
+        while True:
+            offset = self.file.tell()
+            data = self.file.read(header.size)
+            if not data:
+                return
+            if len(data) != header.size:
+                raise CaptureException('Truncated record header', offset)
+            direction, timestamp, length = header.unpack(data)
+            if direction not in Direction.ALL:
+                raise CaptureException('Bad direction: %#04x' % direction,
+                                       offset)
+            data = self.file.read(length)
+            if len(data) != length:
+                raise CaptureException('Truncated record', offset)
+            yield Record(direction, timestamp, data)
+
+    def segments(self, direction=Direction.READ):
+        """Index the raw bytes of records without reading them
+
+        Keyword Arguments:
+            direction (int): Direction of records, default is READ
+
+        Return:
+            list of (file offset, length) of the raw bytes of every record
+            in direction, in order
+
+        Raises:
+            CaptureException: if a record is malformed or truncated
+
+        """
+        header = CaptureWriter.RECORD_HEADER
+        size = os.fstat(self.file.fileno()).st_size
+        offset = len(CaptureWriter.MAGIC)
+        segments = []
+        while offset < size:
+            self.file.seek(offset)
+            data = self.file.read(header.size)
+            if len(data) != header.size:
+                raise CaptureException('Truncated record header', offset)
+            record_direction, _, length = header.unpack(data)
+            if record_direction not in Direction.ALL:
+                raise CaptureException('Bad direction: %#04x' % (
+                        record_direction), offset)
+            if offset + header.size + length > size:
+                raise CaptureException('Truncated record', offset)
+            if record_direction == direction and length:
+                segments.append((offset + header.size, length))
+            offset += header.size + length
+        self.file.seek(len(CaptureWriter.MAGIC))
+        return segments
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def replay(records, realtime=False, direction=Direction.READ):
+    """Feed captured bytes back through a lenient PacketParser and the
+    message decoders
+
+    Arguments:
+        records (iterable(Record)): captured records, such as a
+            CaptureReader
+
+    Keyword Arguments:
+        realtime (bool): sleep to reproduce the original timing between
+            records of a session, default is False for as fast as possible.
+            Sessions are replayed back to back
+        direction (int): Direction of records to replay, default is READ,
+            the bytes sent by the controller
+
+    Return:
+        iterator of (Record, Message or Packet) for every parsed packet
+
+    """
+    parser = PacketParser(strict=False)
+    start = None
+    for record in records:
+        if record.direction == Direction.SESSION:
+            # Timestamps of the next session are from another clock
+            start = None
+        if record.direction != direction:
+            continue
+        if realtime:
+            now = time.monotonic_ns()
+            if start is None or record.timestamp < start[1]:
+                # Also restart if a capture without sessions goes backwards
+                start = (now, record.timestamp)
+            else:
+                delay = (record.timestamp - start[1]) - (now - start[0])
+                if delay > 0:
+                    time.sleep(delay / 1e9)
+        for packet in parser.feed(record.data):
+            try:
+                yield record, decode(packet)
+            except ValueError:
+                # Malformed body of a known message, keep the raw packet
+                yield record, packet
@@ -19,55 +19,261 @@ This file is part of pyzwave.
 
 import serial
 
+import collections
+import itertools
 import logging
+import queue
+import select
+import threading
+import time
 
-from .packet import PacketACK
+from .cache import DISCOVERY_MESSAGES
+from .cache import Discovery
+from .capture import Direction
+from .message import decode
+from .message import Message
 from .packet import PacketParser
+from .packet import PacketType
 from .packet import Preamble
+from .packet import acknowledged
+from .packet import parse_chunk
+from .ring import RingBuffer
 
 
 logger = logging.getLogger(__name__)
 
 
+def read_chunk(device, view):
+    """Read all pending bytes from a serial device, at least one byte.
+    Blocks until a byte is read, or the device timeout.
+
+    Arguments:
+        device (serial.Serial): to read from
+        view (memoryview): buffer to read into
+
+    Return:
+        memoryview of the bytes read, at most len(view)
+
+    """
+    size = min(max(1, device.in_waiting), len(view))
+    return view[:device.readinto(view[:size])]
+
+
+class ZWaveControllerException(Exception):
+    """A ZWaveController Exception
+
+    Attributes:
+        packet (Packet): request packet
+
+    """
+
+    def __init__(self, error, packet):
+        super(ZWaveControllerException, self).__init__(error)
+        self.packet = packet
+
+
+class ZWaveControllerTimeout(ZWaveControllerException):
+    """ZWaveController error due to no ACK or response in time
+
+    """
+
+    def __init__(self, error, packet):
+        super(ZWaveControllerTimeout, self).__init__(error, packet)
+
+
+class ZWaveControllerRejected(ZWaveControllerException):
+    """ZWaveController error due to a request answered with NAK or CAN on
+    every retransmission
+
+    """
+
+    def __init__(self, packet):
+        super(ZWaveControllerRejected, self).__init__(
+                'Packet rejected by controller', packet)
+
+
+class ZWaveControllerClosed(ZWaveControllerException):
+    """ZWaveController error due to reading from a closed controller
+
+    """
+
+    def __init__(self):
+        super(ZWaveControllerClosed, self).__init__('Controller closed',
+                                                    None)
+
+
+class RequestTiming(object):
+    """Serial API timing for requests
+
+    Attributes:
+        ACK_TIMEOUT (float): seconds to wait for an ACK
+        RESPONSE_TIMEOUT (float): seconds to wait for a response
+        RETRANSMISSIONS (int): maximum number of retransmissions
+        BACKOFF (float): seconds to wait before the first retransmission
+        BACKOFF_STEP (float): extra seconds to wait for every following
+            retransmission
+
+    """
+    ACK_TIMEOUT = 1.6
+    RESPONSE_TIMEOUT = 10.0
+    RETRANSMISSIONS = 3
+    BACKOFF = 0.1
+    BACKOFF_STEP = 1.0
+
+
 class ZWaveController(object):
     """Interfaces with serial device controller to read/write packets
 
+    Requests from the controller received while waiting for an ACK or a
+    response in send or request are queued in unsolicited, instead of
+    being returned by read. SOF packets are ACKed as soon as they are parsed,
+    with one write for all packets read at once.
+
+    Bytes read and written are recorded to capture, if set to a
+    zwave.capture.CaptureWriter or a zwave.history.History, and are
+    counted in metrics, if set to a zwave.metrics.Metrics. Writes, received
+    frames and sent ACKs are passed to tracer, if set to a
+    zwave.trace.Tracer.
+
+    Attributes:
+        READ_BUFFER_SIZE (int): maximum bytes read from the device at once
+        UNSOLICITED_QUEUE_SIZE (int): maximum unsolicited requests kept,
+            before the oldest one is dropped
+
     """
+    READ_BUFFER_SIZE = 4096
+    UNSOLICITED_QUEUE_SIZE = 256
 
-    def __init__(self, path):
+    def __init__(self, path, strict=True, newline=False, metrics=None,
+                 ring_size=None):
         """
         Arguments:
             path (str): path to serial device
 
+        Keyword Arguments:
+            strict (bool): raise parsing exceptions, default is True. If False,
+                malformed bytes are skipped, and a NAK is sent for every
+                packet with a bad checksum
+            newline (bool): write a '\\n' after every packet, like older
+                versions did, default is False
+            metrics (zwave.metrics.Metrics): to count traffic and latency in,
+                default is None
+            ring_size (int): if set, read into a zwave.ring.RingBuffer of
+                this many bytes, and return zwave.ring.FrameViews from read
+                instead of Packets. Malformed bytes are skipped as if strict
+                is False. Default is None
+
         Raises:
             serial.serialutil.SerialException: if failed to open device
 
         """
         super(ZWaveController, self).__init__()
         self.path = path
+        self.newline = newline
         self.device = serial.Serial(port=self.path, baudrate=115200,
                                     rtscts=True, dsrdtr=True)
-        self.packet_parser = PacketParser()
+        self.packet_parser = PacketParser(strict=strict)
+        # Parsed packets not yet returned by read
+        self.packets = collections.deque()
+        # Requests from the controller received during send or request
+        self.unsolicited = collections.deque(
+                maxlen=ZWaveController.UNSOLICITED_QUEUE_SIZE)
+        # Discovery served from a cache, not yet revalidated
+        self.discovery_stale = False
+        self.read_buffer = bytearray(ZWaveController.READ_BUFFER_SIZE)
+        self.read_view = memoryview(self.read_buffer)
+        self.ring = None if ring_size is None else RingBuffer(ring_size)
+        # CaptureWriter recording the serial line, or None
+        self.capture = None
+        self.metrics = metrics
+        # Tracer of writes, received frames and ACKs, or None
+        self.tracer = None
+
+    def _fill(self, timeout=None):
+        """Read all pending bytes from the serial device, at least one byte,
+        and queue any parsed packets. Blocking.
+
+        Keyword Arguments:
+            timeout (float): seconds to wait for a byte, default is None for
+                no timeout
+
+        Raises:
+            zwave.packet.PacketParserException: if parsing exception occured
 
-    def read(self):
+        """
+        ring = self.ring
+        if ring is None and self.packet_parser.pending:
+            # Resume parsing after a previous exception
+            data = b''
+        elif (timeout is not None and not self.device.in_waiting and
+              not select.select([self.device], [], [], max(0, timeout))[0]):
+            # Timed out
+            return
+        else:
+            if ring is None:
+                data = read_chunk(self.device, self.read_view)
+            else:
+                # Read in place, and view frames in the ring buffer
+                size = min(max(1, self.device.in_waiting),
+                           len(self.read_buffer))
+                data = ring.writable(size)
+                data = data[:self.device.readinto(data)]
+                ring.commit(len(data))
+            if self.capture is not None:
+                self.capture.record(Direction.READ, data)
+
+        parser = self.packet_parser if ring is None else ring
+        metrics = self.metrics
+        if metrics is not None:
+            before = parser.counters()
+            parsed = len(self.packets)
+
+        tracer = self.tracer
+        # ACK parsed packets, and ask for retransmission of corrupted ones
+        control = []
+        try:
+            for packet in acknowledged(parser, parser.feed(data)
+                                       if ring is None else ring.frames(),
+                                       control):
+                if tracer is not None:
+                    tracer.frame_received(time.monotonic_ns(), packet)
+                self.packets.append(packet)
+        finally:
+            if metrics is not None:
+                metrics.read(data,
+                             itertools.islice(self.packets, parsed, None),
+                             before, parser.counters())
+            if control:
+                self.write_many(control)
+                if tracer is not None:
+                    tracer.ack_sent(time.monotonic_ns(), control)
+
+    def read(self, timeout=None):
         """Read a packet from the serial device. Blocking.
 
+        Keyword Arguments:
+            timeout (float): seconds to wait for a packet, default is None for
+                no timeout
+
         Return:
-            Packet
+            Packet, or None on timeout. With ring_size, a FrameView, valid
+            until a later read wraps the ring buffer
 
         Raises:
-            ValueError: if bad byte value not in range of [0, 255]
             zwave.packet.PacketParserException: if parsing exception occured
 
         """
-        packet = None
-        while packet is None:
-            b = self.device.read()
-            n = int.from_bytes(b, byteorder='little')
-            packet = self.packet_parser.update(n)
-        if packet.preamble == Preamble.SOF:
-            self.write(PacketACK())
-        return packet
+        if timeout is None:
+            while not self.packets:
+                self._fill()
+        else:
+            deadline = time.monotonic() + timeout
+            while not self.packets:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._fill(remaining)
+        return self.packets.popleft()
 
     def write(self, packet):
         """Write a packet to the serial device.
@@ -76,12 +282,568 @@ class ZWaveController(object):
             packet (Packet): to write
 
         """
-        # Get bytes
-        to_write = packet.bytes()
-        # Add newline
-        to_write.append(ord('\n'))
-        # Write!
-        self.device.write(to_write)
+        data = self._frame(packet)
+        if self.metrics is not None:
+            self.metrics.written(data, (packet,))
+        self._write_bytes(data)
+
+    def write_many(self, packets):
+        """Write packets to the serial device with a single write.
+
+        Arguments:
+            packets (list(Packet)): to write
+
+        """
+        data = b''.join(self._frame(packet) for packet in packets)
+        if self.metrics is not None:
+            self.metrics.written(data, packets)
+        self._write_bytes(data)
+
+    def _write_bytes(self, data):
+        """Write and capture bytes
+
+        Arguments:
+            data (bytes): to write
+
+        """
+        if self.capture is not None:
+            self.capture.record(Direction.WRITE, data)
+        tracer = self.tracer
+        if tracer is None:
+            self.device.write(data)
+        else:
+            tracer.before_write(time.monotonic_ns(), data)
+            self.device.write(data)
+            tracer.after_write(time.monotonic_ns(), data)
+
+    def _frame(self, packet):
+        """Get the bytes to write for a packet
+
+        Arguments:
+            packet (Packet): to write
+
+        Return:
+            bytes, cached for FrozenPacket
+
+        """
+        if self.newline:
+            return packet.bytes() + b'\n'
+        return packet.bytes()
+
+    def _route(self, packet):
+        """Keep a packet received out of turn during send or request
+
+        Arguments:
+            packet (Packet): unexpected packet
+
+        """
+        if (packet.preamble == Preamble.SOF and
+                packet.packet_type == PacketType.REQUEST):
+            self.unsolicited.append(packet.materialize())
+        else:
+            logger.warning('Dropping unexpected packet: %s', packet)
+
+    def _poll(self):
+        """Get a packet that was already received, without waiting
+
+        Return:
+            Packet, or None if there is none
+
+        Raises:
+            zwave.packet.PacketParserException: if parsing exception occured
+
+        """
+        if not self.packets:
+            self._fill(0)
+        return self.packets.popleft() if self.packets else None
+
+    def _drain(self):
+        """Drop ACK, NAK and CAN packets left over from an earlier
+        transaction, like a late ACK after a timeout, so they are not taken
+        as the reply to the next write. Requests are kept in unsolicited.
+
+        Raises:
+            zwave.packet.PacketParserException: if parsing exception occured
+
+        """
+        while True:
+            packet = self._poll()
+            if packet is None:
+                return
+            if packet.preamble == Preamble.SOF:
+                self._route(packet)
+            else:
+                logger.debug('Dropping stale packet: %s', packet)
+
+    def send(self, packet, ack_timeout=RequestTiming.ACK_TIMEOUT,
+             retransmissions=RequestTiming.RETRANSMISSIONS):
+        """Write a packet and wait for the ACK. The packet is retransmitted on
+        NAK, CAN or timeout, after the Serial API backoff. Packets left over
+        from earlier transactions are dropped before every write.
+
+        Arguments:
+            packet (Packet): to write
+
+        Keyword Arguments:
+            ack_timeout (float): seconds to wait for an ACK
+            retransmissions (int): maximum number of retransmissions
+
+        Raises:
+            ZWaveControllerTimeout: if no ACK on the last retransmission
+            ZWaveControllerRejected: if NAK or CAN on the last retransmission
+            zwave.packet.PacketParserException: if parsing exception occured
+
+        """
+        metrics = self.metrics
+        for attempt in range(retransmissions + 1):
+            if attempt > 0:
+                time.sleep(RequestTiming.BACKOFF +
+                           (attempt - 1) * RequestTiming.BACKOFF_STEP)
+                logger.debug('Retransmission %d of %s', attempt, packet)
+                if metrics is not None:
+                    metrics.count('retransmissions')
+
+            self._drain()
+            self.write(packet)
+
+            written = time.monotonic()
+            deadline = written + ack_timeout
+            reply = None
+            while reply is None:
+                reply = self.read(timeout=deadline - time.monotonic())
+                if reply is None:
+                    # Timed out
+                    break
+                elif reply.preamble == Preamble.SOF:
+                    self._route(reply)
+                    reply = None
+
+            if reply is not None and reply.preamble == Preamble.ACK:
+                if metrics is not None:
+                    metrics.ack(packet.message_type,
+                                time.monotonic() - written)
+                return
+
+        if reply is None:
+            if metrics is not None:
+                metrics.count('timeouts')
+            raise ZWaveControllerTimeout('No ACK from controller', packet)
+        raise ZWaveControllerRejected(packet)
+
+    def request(self, message_class,
+                ack_timeout=RequestTiming.ACK_TIMEOUT,
+                response_timeout=RequestTiming.RESPONSE_TIMEOUT,
+                retransmissions=RequestTiming.RETRANSMISSIONS):
+        """Send the request of a Message class, and wait for its response
+
+        Arguments:
+            message_class (type): zwave.message.Message subclass with a
+                create_request classmethod
+
+        Keyword Arguments:
+            ack_timeout (float): seconds to wait for an ACK
+            response_timeout (float): seconds to wait for the response
+            retransmissions (int): maximum number of retransmissions
+
+        Return:
+            Message of message_class
+
+        Raises:
+            ZWaveControllerTimeout: if no ACK or response in time
+            ZWaveControllerRejected: if request is rejected by the controller
+            zwave.packet.PacketParserException: if parsing exception occured
+            ValueError: on malformed response
+
+        """
+        packet = message_class.create_request()
+        self.send(packet, ack_timeout=ack_timeout,
+                  retransmissions=retransmissions)
+
+        acked = time.monotonic()
+        deadline = acked + response_timeout
+        while True:
+            response = self.read(timeout=deadline - time.monotonic())
+            if response is None:
+                if self.metrics is not None:
+                    self.metrics.count('timeouts')
+                raise ZWaveControllerTimeout('No response from controller',
+                                             packet)
+            elif (response.preamble == Preamble.SOF and
+                    response.packet_type == PacketType.RESPONSE and
+                    response.message_type == packet.message_type):
+                if self.metrics is not None:
+                    self.metrics.response(packet.message_type,
+                                          time.monotonic() - acked)
+                return message_class(response)
+            self._route(response)
+
+    def discover(self, cache=None):
+        """Get the discovery responses of the controller. If the controller
+        at this device path is in the cache, the cached responses are returned
+        without any request, and discovery_stale is set until revalidate is
+        called.
+
+        Keyword Arguments:
+            cache (zwave.cache.DiscoveryCache): default is None for no cache
+
+        Return:
+            zwave.cache.Discovery
+
+        Raises:
+            ZWaveControllerException: if a request failed
+            zwave.packet.PacketParserException: if parsing exception occured
+            ValueError: on malformed response
+
+        """
+        if cache is not None:
+            discovery = cache.get(self.path)
+            if discovery is not None:
+                self.discovery_stale = True
+                return discovery
+        return self.revalidate(cache=cache)
+
+    def revalidate(self, cache=None):
+        """Request the discovery responses from the controller, and update
+        the cache
+
+        Keyword Arguments:
+            cache (zwave.cache.DiscoveryCache): default is None for no cache
+
+        Return:
+            zwave.cache.Discovery
+
+        Raises:
+            ZWaveControllerException: if a request failed
+            zwave.packet.PacketParserException: if parsing exception occured
+            ValueError: on malformed response
+
+        """
+        discovery = Discovery(*[self.request(message_class)
+                                for message_class in DISCOVERY_MESSAGES])
+        if cache is not None:
+            cache.put(self.path, discovery)
+        self.discovery_stale = False
+        return discovery
 
     def close(self):
         self.device.close()
+
+
+class ThreadedZWaveController(ZWaveController):
+    """ZWaveController with a background reader thread and a single writer
+    thread that owns the serial device.
+
+    The reader thread parses packets, and ACKs SOF packets as soon as their
+    checksum validates, no matter how long the application takes to handle
+    them. SOF packets are decoded once by the reader thread, into the
+    zwave.message.Message class registered for them. Responses, ACK, NAK
+    and CAN packets are returned by read, send and request. Unsolicited requests from the controller are passed to the
+    handler on a dispatch thread, or are kept in the bounded unsolicited
+    queue if there is no handler.
+
+    Any number of application threads may call write, send and request.
+    Transactions (send and request) are serialized.
+
+    If the reader thread fails to read from the device, the error is
+    raised from every pending and later read, and so from send and request.
+    Once closed, read raises ZWaveControllerClosed.
+
+    Attributes:
+        READ_TIMEOUT (float): seconds the reader thread blocks on the device
+        PACKET_QUEUE_SIZE (int): maximum packets waiting for read, before
+            new packets are dropped
+
+    """
+    READ_TIMEOUT = 0.1
+    PACKET_QUEUE_SIZE = 256
+
+    def __init__(self, path, strict=True, newline=False, handler=None,
+                 metrics=None):
+        """
+        Arguments:
+            path (str): path to serial device
+
+        Keyword Arguments:
+            strict (bool): raise parsing exceptions from read, default is
+                True. If False, malformed bytes are skipped, and a NAK is
+                sent for every packet with a bad checksum
+            newline (bool): write a '\\n' after every packet, like older
+                versions did, default is False
+            handler (callable): called with every decoded unsolicited request
+                Message on the dispatch thread, default is None to queue them
+                in unsolicited
+            metrics (zwave.metrics.Metrics): to count traffic and latency in,
+                default is None
+
+        Raises:
+            serial.serialutil.SerialException: if failed to open device
+
+        """
+        super(ThreadedZWaveController, self).__init__(path, strict=strict,
+                                                      newline=newline,
+                                                      metrics=metrics)
+        self.device.timeout = ThreadedZWaveController.READ_TIMEOUT
+        self.handler = handler
+        # Responses and ACK/NAK/CAN, parsing exceptions, or the error
+        self.packets = queue.Queue(
+                maxsize=ThreadedZWaveController.PACKET_QUEUE_SIZE)
+        # Device error, or ZWaveControllerClosed, raised by every read
+        self.error = None
+        # Requests from the controller, None once closed
+        self.unsolicited = queue.Queue(
+                maxsize=ZWaveController.UNSOLICITED_QUEUE_SIZE)
+        # Bytes to write, None once closed
+        self.write_queue = queue.Queue()
+        self.transaction_lock = threading.RLock()
+        self.stopped = threading.Event()
+
+        self.threads = [
+            threading.Thread(target=self._reader, name='zwave-reader'),
+            threading.Thread(target=self._writer, name='zwave-writer'),
+        ]
+        if handler is not None:
+            self.threads.append(threading.Thread(target=self._dispatcher,
+                                                 name='zwave-dispatcher'))
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+    def _reader(self):
+        """Reader thread: parse, ACK and queue packets until closed
+
+        """
+        while not self.stopped.is_set():
+            try:
+                data = read_chunk(self.device, self.read_view)
+                if data and self.capture is not None:
+                    self.capture.record(Direction.READ, data)
+            except (OSError, serial.SerialException, TypeError) as e:
+                if not self.stopped.is_set():
+                    logger.exception('Failed to read from [%s]', self.path)
+                    self._fail(e)
+                return
+
+            metrics = self.metrics
+            if metrics is not None:
+                before = self.packet_parser.counters()
+
+            # ACK parsed packets, and ask for retransmission of corrupted
+            # ones. Parsing exceptions are handed to read
+            packets, control = parse_chunk(
+                    self.packet_parser, data,
+                    lambda e: self._put(self.packets, e))
+
+            if metrics is not None:
+                metrics.read(data, packets, before,
+                             self.packet_parser.counters())
+            tracer = self.tracer
+            if tracer is not None:
+                now = time.monotonic_ns()
+                for packet in packets:
+                    tracer.frame_received(now, packet)
+
+            if control:
+                self.write_many(control)
+                if tracer is not None:
+                    tracer.ack_sent(time.monotonic_ns(), control)
+
+            for packet in packets:
+                try:
+                    packet = decode(packet)
+                except ValueError as e:
+                    logger.warning('Malformed packet from [%s]: %s',
+                                   self.path, e)
+                    packet = Message(packet)
+                self._dispatch(packet)
+
+    def _fail(self, error):
+        """Raise error from every pending and later read
+
+        Arguments:
+            error (Exception): raised by read
+
+        """
+        if self.error is not None:
+            return
+        self.error = error
+        while True:
+            try:
+                self.packets.put_nowait(error)
+                return
+            except queue.Full:
+                # Make room, the error matters more than old packets
+                try:
+                    self.packets.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _dispatch(self, packet):
+        """Queue a parsed, ACKed and decoded packet
+
+        Arguments:
+            packet (Packet): Message, or ACK, NAK or CAN packet
+
+        """
+        if packet.preamble != Preamble.SOF:
+            self._put(self.packets, packet)
+        elif packet.packet_type == PacketType.REQUEST:
+            self._put(self.unsolicited, packet)
+        else:
+            self._put(self.packets, packet)
+
+    def _put(self, packets, packet):
+        """Queue a packet without blocking the reader thread
+
+        Arguments:
+            packets (queue.Queue): to put packet in
+            packet (Packet): to queue
+
+        """
+        try:
+            packets.put_nowait(packet)
+        except queue.Full:
+            logger.warning('Dropping packet, queue full: %s', packet)
+
+    def _writer(self):
+        """Writer thread: write queued bytes until closed. Everything queued
+        at the same time is written at once.
+
+        """
+        while True:
+            data = [self.write_queue.get()]
+            try:
+                while True:
+                    data.append(self.write_queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            closed = None in data
+            if closed:
+                data = data[:data.index(None)]
+            try:
+                if data:
+                    self._write_bytes(b''.join(data))
+            except (OSError, serial.SerialException):
+                logger.exception('Failed to write to [%s]', self.path)
+            if closed:
+                return
+
+    def _dispatcher(self):
+        """Dispatch thread: pass unsolicited requests to the handler until
+        closed
+
+        """
+        while True:
+            packet = self.unsolicited.get()
+            if packet is None:
+                return
+            try:
+                self.handler(packet)
+            except Exception:
+                logger.exception('Handler failed for %s', packet)
+
+    def _route(self, packet):
+        """Keep a packet received out of turn during send or request
+
+        Arguments:
+            packet (Packet): unexpected packet
+
+        """
+        logger.warning('Dropping unexpected packet: %s', packet)
+
+    def read(self, timeout=None):
+        """Read the next response, ACK, NAK or CAN packet. SOF packets were
+        already ACKed and decoded by the reader thread. Blocking.
+
+        Keyword Arguments:
+            timeout (float): seconds to wait for a packet, default is None for
+                no timeout
+
+        Return:
+            zwave.message.Message, ACK, NAK or CAN Packet, or None on timeout
+
+        Raises:
+            zwave.packet.PacketParserException: if parsing exception occured
+            ZWaveControllerClosed: once closed
+            serial.serialutil.SerialException: if the reader thread failed
+                to read from the device
+
+        """
+        try:
+            packet = self.packets.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if isinstance(packet, Exception):
+            if packet is self.error:
+                # Wake up other readers too
+                self._put(self.packets, packet)
+            raise packet
+        return packet
+
+    def _poll(self):
+        return self.read(timeout=0)
+
+    _poll.__doc__ = ZWaveController._poll.__doc__
+
+    def write(self, packet):
+        """Queue a packet for the writer thread. Non-blocking.
+
+        Arguments:
+            packet (Packet): to write
+
+        """
+        data = self._frame(packet)
+        if self.metrics is not None:
+            self.metrics.written(data, (packet,))
+        self.write_queue.put(data)
+
+    def write_many(self, packets):
+        """Queue packets for the writer thread, to be written at once.
+        Non-blocking.
+
+        Arguments:
+            packets (list(Packet)): to write
+
+        """
+        data = b''.join(self._frame(packet) for packet in packets)
+        if self.metrics is not None:
+            self.metrics.written(data, packets)
+        self.write_queue.put(data)
+
+    def send(self, packet, ack_timeout=RequestTiming.ACK_TIMEOUT,
+             retransmissions=RequestTiming.RETRANSMISSIONS):
+        with self.transaction_lock:
+            return super(ThreadedZWaveController, self).send(
+                    packet, ack_timeout=ack_timeout,
+                    retransmissions=retransmissions)
+
+    send.__doc__ = ZWaveController.send.__doc__
+
+    def request(self, message_class,
+                ack_timeout=RequestTiming.ACK_TIMEOUT,
+                response_timeout=RequestTiming.RESPONSE_TIMEOUT,
+                retransmissions=RequestTiming.RETRANSMISSIONS):
+        with self.transaction_lock:
+            return super(ThreadedZWaveController, self).request(
+                    message_class, ack_timeout=ack_timeout,
+                    response_timeout=response_timeout,
+                    retransmissions=retransmissions)
+
+    request.__doc__ = ZWaveController.request.__doc__
+
+    def close(self):
+        """Stop the threads, and close the serial device
+
+        """
+        self.stopped.set()
+        self._fail(ZWaveControllerClosed())
+        self.write_queue.put(None)
+        try:
+            self.unsolicited.put_nowait(None)
+        except queue.Full:
+            self.unsolicited.get_nowait()
+            self.unsolicited.put_nowait(None)
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join()
+        super(ThreadedZWaveController, self).close()
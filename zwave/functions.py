@@ -0,0 +1,140 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import collections
+
+
+class Flow(object):
+    """Who sends requests of a Serial API function
+
+    HOST - the host sends requests to the controller
+    CONTROLLER - the controller sends requests to the host, as callbacks of
+        a host request or unsolicited
+    BOTH - host requests with controller callbacks
+
+    """
+    HOST = 0x01
+    CONTROLLER = 0x02
+    BOTH = HOST | CONTROLLER
+
+
+# Serial API function: MessageType byte, name, Flow, and whether a host
+# request is answered with a RESPONSE packet
+Function = collections.namedtuple('Function', [
+        'message_type', 'name', 'flow', 'response'])
+
+
+def _table(functions):
+    """Build a 256 entry table of Functions indexed by MessageType byte
+
+    Arguments:
+        functions (list(tuple)): Function fields
+
+    Return:
+        tuple with a Function, or None, for every byte value
+
+    """
+    table = [None] * 256
+    for fields in functions:
+        function = Function(*fields)
+        assert table[function.message_type] is None, function
+        table[function.message_type] = function
+    return tuple(table)
+
+
+FUNCTIONS = _table([
+    (0x02, 'SERIAL_API_GET_INIT_DATA', Flow.HOST, True),
+    (0x03, 'SERIAL_API_APPL_NODE_INFORMATION', Flow.HOST, False),
+    (0x04, 'APPLICATION_COMMAND_HANDLER', Flow.CONTROLLER, False),
+    (0x05, 'ZW_GET_CONTROLLER_CAPABILITIES', Flow.HOST, True),
+    (0x06, 'SERIAL_API_SET_TIMEOUTS', Flow.HOST, True),
+    (0x07, 'SERIAL_API_GET_CAPABILITIES', Flow.HOST, True),
+    (0x08, 'SERIAL_API_SOFT_RESET', Flow.HOST, False),
+    (0x09, 'ZW_GET_PROTOCOL_VERSION', Flow.HOST, True),
+    (0x0a, 'SERIAL_API_STARTED', Flow.CONTROLLER, False),
+    (0x10, 'ZW_SET_RF_RECEIVE_MODE', Flow.HOST, True),
+    (0x11, 'ZW_SET_SLEEP_MODE', Flow.HOST, False),
+    (0x12, 'ZW_SEND_NODE_INFORMATION', Flow.BOTH, True),
+    (0x13, 'ZW_SEND_DATA', Flow.BOTH, True),
+    (0x14, 'ZW_SEND_DATA_MULTI', Flow.BOTH, True),
+    (0x15, 'ZW_GET_VERSION', Flow.HOST, True),
+    (0x16, 'ZW_SEND_DATA_ABORT', Flow.HOST, False),
+    (0x17, 'ZW_R_F_POWER_LEVEL_SET', Flow.HOST, True),
+    (0x18, 'ZW_SEND_DATA_META', Flow.BOTH, True),
+    (0x1c, 'ZW_GET_RANDOM', Flow.HOST, True),
+    (0x20, 'MEMORY_GET_ID', Flow.HOST, True),
+    (0x21, 'MEMORY_GET_BYTE', Flow.HOST, True),
+    (0x22, 'MEMORY_PUT_BYTE', Flow.HOST, True),
+    (0x23, 'MEMORY_GET_BUFFER', Flow.HOST, True),
+    (0x24, 'MEMORY_PUT_BUFFER', Flow.BOTH, True),
+    (0x40, 'ZW_SET_LEARN_NODE_STATE', Flow.BOTH, False),
+    (0x41, 'ZW_GET_NODE_PROTOCOL_INFO', Flow.HOST, True),
+    (0x42, 'ZW_SET_DEFAULT', Flow.BOTH, False),
+    (0x43, 'ZW_NEW_CONTROLLER', Flow.BOTH, False),
+    (0x44, 'ZW_REPLICATION_COMMAND_COMPLETE', Flow.HOST, False),
+    (0x45, 'ZW_REPLICATION_SEND_DATA', Flow.BOTH, True),
+    (0x46, 'ZW_ASSIGN_RETURN_ROUTE', Flow.BOTH, True),
+    (0x47, 'ZW_DELETE_RETURN_ROUTE', Flow.BOTH, True),
+    (0x48, 'ZW_REQUEST_NODE_NEIGHBOR_UPDATE', Flow.BOTH, False),
+    (0x49, 'ZW_APPLICATION_UPDATE', Flow.CONTROLLER, False),
+    (0x4a, 'ZW_ADD_NODE_TO_NETWORK', Flow.BOTH, False),
+    (0x4b, 'ZW_REMOVE_NODE_FROM_NETWORK', Flow.BOTH, False),
+    (0x4c, 'ZW_CREATE_NEW_PRIMARY', Flow.BOTH, False),
+    (0x4d, 'ZW_CONTROLLER_CHANGE', Flow.BOTH, False),
+    (0x50, 'ZW_SET_LEARN_MODE', Flow.BOTH, False),
+    (0x51, 'ZW_ASSIGN_SUC_RETURN_ROUTE', Flow.BOTH, True),
+    (0x52, 'ZW_ENABLE_SUC', Flow.HOST, True),
+    (0x53, 'ZW_REQUEST_NETWORK_UPDATE', Flow.BOTH, True),
+    (0x54, 'ZW_SET_SUC_NODE_ID', Flow.BOTH, True),
+    (0x55, 'ZW_DELETE_SUC_RETURN_ROUTE', Flow.BOTH, True),
+    (0x56, 'ZW_GET_SUC_NODE_ID', Flow.HOST, True),
+    (0x5a, 'ZW_REQUEST_NODE_NEIGHBOR_UPDATE_OPTIONS', Flow.BOTH, False),
+    (0x5e, 'ZW_EXPLORE_REQUEST_INCLUSION', Flow.HOST, True),
+    (0x60, 'ZW_REQUEST_NODE_INFO', Flow.HOST, True),
+    (0x61, 'ZW_REMOVE_FAILED_NODE_ID', Flow.BOTH, True),
+    (0x62, 'ZW_IS_FAILED_NODE_ID', Flow.HOST, True),
+    (0x63, 'ZW_REPLACE_FAILED_NODE', Flow.BOTH, True),
+    (0x80, 'ZW_GET_ROUTING_INFO', Flow.HOST, True),
+    (0xa0, 'SERIAL_API_SLAVE_NODE_INFO', Flow.HOST, True),
+    (0xa1, 'APPLICATION_SLAVE_COMMAND_HANDLER', Flow.CONTROLLER, False),
+    (0xa2, 'ZW_SEND_SLAVE_NODE_INFO', Flow.BOTH, True),
+    (0xa3, 'ZW_SEND_SLAVE_DATA', Flow.BOTH, True),
+    (0xa4, 'ZW_SET_SLAVE_LEARN_MODE', Flow.BOTH, True),
+    (0xa5, 'ZW_GET_VIRTUAL_NODES', Flow.HOST, True),
+    (0xa6, 'ZW_IS_VIRTUAL_NODE', Flow.HOST, True),
+    (0xd0, 'ZW_SET_PROMISCUOUS_MODE', Flow.HOST, False),
+    (0xd1, 'PROMISCUOUS_APPLICATION_COMMAND_HANDLER', Flow.CONTROLLER, False),
+])
+
+# 1 for every known MessageType byte, else 0
+KNOWN = bytes(0 if x is None else 1 for x in FUNCTIONS)
+
+
+def function_name(message_type):
+    """Get the name of a Serial API function
+
+    Arguments:
+        message_type (int): MessageType byte
+
+    Return:
+        str, hex of message_type if unknown
+
+    """
+    function = FUNCTIONS[message_type]
+    return '%#04x' % message_type if function is None else function.name
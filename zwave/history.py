@@ -0,0 +1,354 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import array
+import bisect
+import collections
+import datetime
+import mmap
+import struct
+import threading
+import time
+
+from .capture import Direction
+from .packet import MessageType
+from .packet import PacketParser
+from .packet import PacketType
+from .packet import Preamble
+from .ring import FrameView
+
+
+# Body offset of the node id, by direction, PacketType and MessageType
+NODE_OFFSETS = {
+    (Direction.READ, PacketType.REQUEST,
+     MessageType.APPLICATION_COMMAND_HANDLER): 1,
+    (Direction.READ, PacketType.REQUEST,
+     MessageType.ZW_APPLICATION_UPDATE): 1,
+    (Direction.WRITE, PacketType.REQUEST, MessageType.ZW_SEND_DATA): 0,
+    (Direction.WRITE, PacketType.REQUEST,
+     MessageType.ZW_GET_NODE_PROTOCOL_INFO): 0,
+    (Direction.WRITE, PacketType.REQUEST, MessageType.ZW_REQUEST_NODE_INFO): 0,
+}
+
+
+def node_id(packet, direction):
+    """Get the node a packet is from or to
+
+    Arguments:
+        packet (Packet): parsed packet
+        direction (int): Direction of packet
+
+    Return:
+        int node id, or 0 if the packet is not about a node
+
+    """
+    if packet.preamble != Preamble.SOF:
+        return 0
+    offset = NODE_OFFSETS.get((direction, packet.packet_type,
+                               packet.message_type))
+    if offset is None or len(packet.body) <= offset:
+        return 0
+    return packet.body[offset]
+
+
+def _nanoseconds(value):
+    """Nanoseconds since the epoch of an int or a datetime.datetime"""
+    if isinstance(value, datetime.datetime):
+        return int(value.timestamp()) * 1000000000 + value.microsecond * 1000
+    return value
+
+
+class HistoryException(Exception):
+    """Malformed history file
+
+    Attributes:
+        error (str): description of error
+        offset (int): file offset of the malformed data
+
+    """
+
+    def __init__(self, error, offset):
+        super(HistoryException, self).__init__(error)
+        self.error = error
+        self.offset = offset
+
+
+class HistoryFrame(FrameView):
+    """A frame in a History, read from the memory mapped file on access
+
+    Views stay valid until the History is closed.
+
+    Attributes:
+        timestamp (int): nanoseconds since the epoch
+        direction (int): Direction of frame
+        node (int): node id the frame is from or to, or 0
+
+    """
+    __slots__ = ('timestamp', 'direction', 'node')
+
+    def __init__(self, history, offset, size, timestamp, direction, node):
+        super(HistoryFrame, self).__init__(history, offset, size)
+        self.timestamp = timestamp
+        self.direction = direction
+        self.node = node
+
+    def _check(self):
+        if not self.valid:
+            raise ValueError('Stale HistoryFrame, the History was closed')
+
+    def __repr__(self):
+        return 'HistoryFrame(timestamp=%d, direction=%d, node=%d, size=%d)' % (
+                self.timestamp, self.direction, self.node, self.size)
+
+
+class History(object):
+    """Append-only store of frames, memory mapped for queries
+
+    The file starts with MAGIC, followed by entries of:
+        timestamp (uint64 nanoseconds since the epoch), direction (uint8),
+        node id (uint8, 0 for none), size (uint16), and size frame bytes
+
+    All integers are little endian. Timestamps never decrease, a clock step
+    backwards is stored as the previous timestamp.
+
+    Frames are indexed in memory by timestamp, MessageType and node id. The
+    indexes are rebuilt from the entry headers when the file is opened, and
+    queries only read the frames they return.
+
+    A History is a recording sink: set it as the capture of a
+    zwave.controller.ZWaveController, and every valid frame read or written
+    is stored.
+
+    Attributes:
+        MAGIC (bytes): file header
+        ENTRY_HEADER (struct.Struct): entry header before the frame bytes
+        path (str): path to history file
+        generation (int): incremented on close, which invalidates all views
+
+    """
+    MAGIC = b'ZWHIST\x00\x01'
+    ENTRY_HEADER = struct.Struct('<QBBH')
+
+    def __init__(self, path):
+        """Open a history for appending, and index the existing frames
+
+        Arguments:
+            path (str): path to history file
+
+        Raises:
+            HistoryException: if the existing file is not a history
+
+        """
+        super(History, self).__init__()
+        self.path = path
+        self.lock = threading.Lock()
+        self.generation = 0
+        # Frame number to entry offset and timestamp
+        self.offsets = array.array('Q')
+        self.timestamps = array.array('Q')
+        # MessageType or node id to frame numbers
+        self.message_types = collections.defaultdict(
+                lambda: array.array('I'))
+        self.nodes = collections.defaultdict(lambda: array.array('I'))
+        # Lenient parsers of recorded bytes, by Direction
+        self.parsers = dict((direction, PacketParser(strict=False))
+                            for direction in Direction.ALL)
+
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(History.MAGIC)
+            self.file.flush()
+        self.size = self.file.tell()
+        self.buffer = None
+        self.view = None
+        self._remap()
+        if self.buffer[:len(History.MAGIC)] != History.MAGIC:
+            self.file.close()
+            raise HistoryException('Bad magic: %r' % (
+                    self.buffer[:len(History.MAGIC)]), 0)
+        self._index()
+
+    def _remap(self):
+        """Map the whole file. Old maps are kept alive by their views.
+
+        """
+        self.file.flush()
+        with open(self.path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.buffer)
+
+    def _index(self):
+        """Index existing entries, and drop a partial entry at the end
+
+        """
+        header = History.ENTRY_HEADER
+        offset = len(History.MAGIC)
+        while offset + header.size <= self.size:
+            timestamp, direction, node, size = header.unpack_from(
+                    self.buffer, offset)
+            if offset + header.size + size > self.size:
+                break
+            message_type = (self.buffer[offset + header.size + 3]
+                            if size > 1 else None)
+            self._add(offset, timestamp, node, message_type)
+            offset += header.size + size
+
+        if offset != self.size:
+            # Interrupted write
+            self.file.truncate(offset)
+            self.size = offset
+            self._remap()
+
+    def _add(self, offset, timestamp, node, message_type):
+        """Add an entry to the indexes"""
+        number = len(self.offsets)
+        self.offsets.append(offset)
+        self.timestamps.append(timestamp)
+        if message_type is not None:
+            self.message_types[message_type].append(number)
+        if node:
+            self.nodes[node].append(number)
+
+    def append(self, packet, direction=Direction.READ, timestamp=None):
+        """Store a frame
+
+        Arguments:
+            packet (Packet): valid packet
+
+        Keyword Arguments:
+            direction (int): Direction of packet, default is READ
+            timestamp (int): nanoseconds since the epoch, default is now
+
+        """
+        if timestamp is None:
+            timestamp = time.time_ns()
+        frame = bytes(packet.bytes())
+        node = node_id(packet, direction)
+        message_type = (packet.message_type
+                        if packet.preamble == Preamble.SOF else None)
+        with self.lock:
+            if self.timestamps:
+                timestamp = max(timestamp, self.timestamps[-1])
+            self.file.write(History.ENTRY_HEADER.pack(
+                    timestamp, direction, node, len(frame)) + frame)
+            self._add(self.size, timestamp, node, message_type)
+            self.size += History.ENTRY_HEADER.size + len(frame)
+
+    def record(self, direction, data, timestamp=None):
+        """Parse and store the valid frames of bytes crossing the serial
+        line. Frames may be split across calls. Safe to call from several
+        threads.
+
+        Arguments:
+            direction (int): Direction of bytes
+            data (bytes): raw bytes read or written
+
+        Keyword Arguments:
+            timestamp (int): nanoseconds since the epoch, default is now
+
+        """
+        if timestamp is None:
+            timestamp = time.time_ns()
+        with self.lock:
+            packets = list(self.parsers[direction].feed(data))
+        for packet in packets:
+            self.append(packet, direction=direction, timestamp=timestamp)
+
+    def query(self, start=None, end=None, message_type=None, node=None,
+              direction=None):
+        """Find frames matching every given condition, in time order
+
+        Arguments:
+            start (int or datetime.datetime): earliest timestamp in
+                nanoseconds since the epoch, default is None for any
+            end (int or datetime.datetime): timestamp after the last frame,
+                default is None for any
+            message_type (int): MessageType, default is None for any
+            node (int): node id, default is None for any
+            direction (int): Direction, default is None for any
+
+        Return:
+            list(HistoryFrame)
+
+        """
+        with self.lock:
+            if self.size > len(self.buffer):
+                self._remap()
+            lo = 0
+            hi = len(self.offsets)
+            if start is not None:
+                lo = bisect.bisect_left(self.timestamps, _nanoseconds(start))
+            if end is not None:
+                hi = bisect.bisect_left(self.timestamps, _nanoseconds(end))
+
+            # Smallest index of the conditions, or every frame in range
+            candidates = []
+            if message_type is not None:
+                candidates.append(self.message_types.get(
+                        message_type, array.array('I')))
+            if node is not None:
+                candidates.append(self.nodes.get(node, array.array('I')))
+            if candidates:
+                numbers = min(candidates, key=len)
+                numbers = numbers[bisect.bisect_left(numbers, lo):
+                                  bisect.bisect_left(numbers, hi)]
+            else:
+                numbers = range(lo, hi)
+            buffer = self.buffer
+            offsets = [self.offsets[i] for i in numbers]
+            timestamps = [self.timestamps[i] for i in numbers]
+
+        header = History.ENTRY_HEADER
+        frames = []
+        for offset, timestamp in zip(offsets, timestamps):
+            _, frame_direction, frame_node, size = header.unpack_from(
+                    buffer, offset)
+            if direction is not None and frame_direction != direction:
+                continue
+            if node is not None and frame_node != node:
+                continue
+            if (message_type is not None and
+                    (size == 1 or
+                     buffer[offset + header.size + 3] != message_type)):
+                continue
+            frames.append(HistoryFrame(self, offset + header.size, size,
+                                       timestamp, frame_direction,
+                                       frame_node))
+        return frames
+
+    def flush(self):
+        with self.lock:
+            self.file.flush()
+
+    def close(self):
+        """Close the file, and invalidate all views
+
+        """
+        with self.lock:
+            self.file.close()
+            self.generation += 1
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,286 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import collections
+import logging
+import os
+import selectors
+
+import serial
+
+from .controller import ZWaveController
+from .controller import read_chunk
+from .message import decode
+from .message import Message
+from .packet import PacketParser
+from .packet import parse_chunk
+
+
+logger = logging.getLogger(__name__)
+
+
+class ManagedController(object):
+    """A serial device controller served by a ControllerManager. Packets are
+    parsed in lenient mode: malformed bytes are skipped, and a NAK is sent for
+    every packet with a bad checksum. SOF packets are ACKed as soon as they
+    are parsed.
+
+    Attributes:
+        manager (ControllerManager): serving this controller
+        path (str): path to serial device
+
+    """
+
+    def __init__(self, manager, path):
+        """
+        Arguments:
+            manager (ControllerManager): serving this controller
+            path (str): path to serial device
+
+        Raises:
+            serial.serialutil.SerialException: if failed to open device
+
+        """
+        super(ManagedController, self).__init__()
+        self.manager = manager
+        self.path = path
+        self.device = serial.Serial(port=self.path, baudrate=115200,
+                                    rtscts=True, dsrdtr=True, timeout=0)
+        self.fd = self.device.fileno()
+        self.packet_parser = PacketParser(strict=False)
+        self.read_buffer = bytearray(ZWaveController.READ_BUFFER_SIZE)
+        self.read_view = memoryview(self.read_buffer)
+        # Bytes waiting to be written
+        self.write_queue = collections.deque()
+        # Waiting for the device to be writable
+        self.writing = False
+
+    def send(self, packet):
+        """Queue a packet to write to the serial device. Non-blocking.
+
+        Arguments:
+            packet (Packet): to write
+
+        """
+        self._queue(packet.bytes())
+
+    def _queue(self, data):
+        """Queue bytes to write, and write right away if nothing else is
+        queued
+
+        Arguments:
+            data (bytes): to write
+
+        """
+        self.write_queue.append(data)
+        if len(self.write_queue) == 1:
+            self._on_writable()
+
+    def _on_readable(self):
+        """Parse all pending bytes, ACK SOF packets, and dispatch decoded
+        packets
+
+        Return:
+            list(Packet) of decoded packets
+
+        """
+        data = read_chunk(self.device, self.read_view)
+
+        # ACK parsed packets, and ask for retransmission of corrupted ones.
+        # Lenient parsing skips malformed bytes instead of raising
+        packets, control = parse_chunk(
+                self.packet_parser, data,
+                lambda e: logger.warning('Parsing error on [%s]: %s',
+                                         self.path, e))
+        if control:
+            self._queue(b''.join(packet.bytes() for packet in control))
+
+        messages = []
+        for packet in packets:
+            try:
+                messages.append(decode(packet))
+            except ValueError as e:
+                logger.warning('Malformed packet from [%s]: %s', self.path, e)
+                messages.append(Message(packet))
+        return messages
+
+    def _on_writable(self):
+        """Write as many queued bytes as the device accepts
+
+        """
+        while self.write_queue:
+            data = self.write_queue[0]
+            try:
+                written = os.write(self.fd, data)
+            except BlockingIOError:
+                written = 0
+            if written < len(data):
+                # Wait until writable
+                self.write_queue[0] = data[written:]
+                if not self.writing:
+                    self.writing = True
+                    self.manager._watch(self, write=True)
+                return
+            self.write_queue.popleft()
+
+        if self.writing:
+            self.writing = False
+            self.manager._watch(self, write=False)
+
+    def close(self):
+        self.manager.remove(self)
+        self.device.close()
+
+
+class ControllerManager(object):
+    """Serves any number of serial device controllers from a single selector
+    loop. Every controller has its own PacketParser and write queue, and
+    decoded packets from all controllers go to a shared handler.
+
+    Attributes:
+        handler (callable): called with (ManagedController, Message or
+            Packet) for every decoded packet
+        controllers (list(ManagedController)): served controllers
+
+    """
+
+    def __init__(self, handler):
+        """
+        Arguments:
+            handler (callable): called with (ManagedController, Message or
+                Packet) for every decoded packet. ACK, NAK and CAN packets are
+                passed as Packets
+
+        """
+        super(ControllerManager, self).__init__()
+        self.handler = handler
+        self.selector = selectors.DefaultSelector()
+        self.controllers = []
+
+    def add(self, path):
+        """Open and serve a serial device controller
+
+        Arguments:
+            path (str): path to serial device
+
+        Return:
+            ManagedController
+
+        Raises:
+            serial.serialutil.SerialException: if failed to open device
+
+        """
+        controller = ManagedController(self, path)
+        self.selector.register(controller.fd, selectors.EVENT_READ,
+                               controller)
+        self.controllers.append(controller)
+        return controller
+
+    def remove(self, controller):
+        """Stop serving a controller, without closing it
+
+        Arguments:
+            controller (ManagedController): to remove
+
+        """
+        if controller in self.controllers:
+            self.selector.unregister(controller.fd)
+            self.controllers.remove(controller)
+
+    def _watch(self, controller, write):
+        """Change if a controller is waited on for writing
+
+        Arguments:
+            controller (ManagedController): to change
+            write (bool): wait until writable
+
+        """
+        if controller not in self.controllers:
+            return
+        events = selectors.EVENT_READ
+        if write:
+            events |= selectors.EVENT_WRITE
+        self.selector.modify(controller.fd, events, controller)
+
+    def run_once(self, timeout=None):
+        """Wait for ready controllers, and serve them once. A controller
+        failing to read or write is logged, removed and closed, without
+        affecting the others. Handler exceptions are logged.
+
+        Keyword Arguments:
+            timeout (float): seconds to wait, default is None for no timeout
+
+        Return:
+            int number of packets dispatched
+
+        """
+        dispatched = 0
+        for key, events in self.selector.select(timeout):
+            controller = key.data
+            if controller not in self.controllers:
+                # Closed by a handler during this round
+                continue
+            try:
+                if events & selectors.EVENT_WRITE:
+                    controller._on_writable()
+                messages = []
+                if events & selectors.EVENT_READ:
+                    messages = controller._on_readable()
+            except Exception:
+                logger.exception('Controller [%s] failed, closing it',
+                                 controller.path)
+                self._close(controller)
+                continue
+
+            for message in messages:
+                try:
+                    self.handler(controller, message)
+                except Exception:
+                    logger.exception('Handler failed on [%s]: %s',
+                                     controller.path, message)
+                dispatched += 1
+        return dispatched
+
+    def _close(self, controller):
+        """Remove and close a failed controller
+
+        Arguments:
+            controller (ManagedController): to close
+
+        """
+        self.remove(controller)
+        try:
+            controller.device.close()
+        except Exception:
+            logger.exception('Failed to close [%s]', controller.path)
+
+    def run(self):
+        """Serve controllers until all are removed
+
+        """
+        while self.controllers:
+            self.run_once()
+
+    def close(self):
+        """Close all controllers
+
+        """
+        for controller in list(self.controllers):
+            controller.close()
+        self.selector.close()
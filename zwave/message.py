@@ -19,12 +19,98 @@ This file is part of pyzwave.
 
 import struct
 
+from zwave.bitmap import NodeBitmap
 from zwave.packet import Packet
 from zwave.packet import Preamble
 from zwave.packet import PacketType
 from zwave.packet import MessageType
 
+
+# Message classes by (PacketType, MessageType)
+MESSAGES = {}
+
+
+class lazy(object):
+    """Decorator for a Message field decoded on first access. The decoded
+    value is cached in the slot with the same name prefixed by an underscore,
+    which the Message class must declare in __slots__. Assigning to the
+    field overrides the cached value.
+
+    """
+
+    def __init__(self, decode):
+        """
+        Arguments:
+            decode (callable): decodes the field from a Message
+
+        """
+        super(lazy, self).__init__()
+        self.decode = decode
+        self.slot = None
+        self.__doc__ = decode.__doc__
+
+    def __set_name__(self, owner, name):
+        self.slot = getattr(owner, '_' + name)
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        try:
+            return self.slot.__get__(instance, owner)
+        except AttributeError:
+            value = self.decode(instance)
+            self.slot.__set__(instance, value)
+            return value
+
+    def __set__(self, instance, value):
+        self.slot.__set__(instance, value)
+
+
+def register(packet_type, message_type):
+    """Class decorator to register a Message class, used by decode for
+    packets of the given types
+
+    Arguments:
+        packet_type (int): PacketType
+        message_type (int): MessageType
+
+    Return:
+        decorator
+
+    """
+    def decorator(cls):
+        MESSAGES[(packet_type, message_type)] = cls
+        return cls
+    return decorator
+
+
+def decode(packet):
+    """Decode a packet into the Message class registered for its PacketType
+    and MessageType. Unknown SOF packets are decoded as a plain Message, and
+    ACK, NAK and CAN packets are returned as they are.
+
+    Arguments:
+        packet (Packet): to decode
+
+    Return:
+        Message, or packet if not SOF
+
+    Raises:
+        ValueError: on malformed message
+
+    """
+    if packet.preamble != Preamble.SOF:
+        return packet
+    return MESSAGES.get((packet.packet_type, packet.message_type),
+                        Message)(packet)
+
+
 class Message(Packet):
+    """A Packet with decoded fields. Shares the immutable body of the Packet it
+    was created from, without copying it.
+
+    """
+    __slots__ = ()
 
     def __init__(self, packet):
         super(Message, self).__init__(packet.preamble, length=packet.length,
@@ -32,18 +118,34 @@ class Message(Packet):
                                       message_type=packet.message_type,
                                       body=packet.body,
                                       checksum=packet.checksum)
-        
 
+
+
+@register(PacketType.RESPONSE, MessageType.SERIAL_API_GET_CAPABILITIES)
 class SerialAPIGetCapabilities(Message):
     """Reply to SERIAL_API_GET_CAPABILITIES
 
+    Fields are decoded on first access.
+
     Attributes:
+        REQUEST (FrozenPacket): SERIAL_API_GET_CAPABILITIES request
         version (int):
         manufacturer_id (int):
         product_type (int):
         product_id (int):
+        bitmap_bytes (bytes): bitmap of 32 bytes
+        message_type_bitmap (NodeBitmap): of supported message types
+        message_types (list(int)): of supported message types
 
     """
+    __slots__ = ('_version', '_manufacturer_id', '_product_type',
+                 '_product_id', '_bitmap_bytes', '_message_type_bitmap',
+                 '_message_types')
+
+    REQUEST = Packet.create(
+            packet_type=PacketType.REQUEST,
+            message_type=MessageType.SERIAL_API_GET_CAPABILITIES, frozen=True)
+
     def __init__(self, message):
         """Create a SerialAPIGetCapabilities response from a response packet
 
@@ -65,24 +167,33 @@ class SerialAPIGetCapabilities(Message):
             raise ValueError('Bad discover message prefix: [%s]' % (
                     str(actual_prefix)))
 
-        # Parse version
-        self.version = struct.unpack('<H', bytearray(self.body[0:2]))[0]
-        # Parse manufacturer
-        self.manufacturer_id = struct.unpack('>H', bytearray(self.body[2:4]))[0]
-        # Parse product type
-        self.product_type = struct.unpack('>H', bytearray(self.body[4:6]))[0]
-        # Parse product id
-        self.product_id = struct.unpack('>H', bytearray(self.body[6:8]))[0]
-
-        # Store bytes, and extract node ids
-        self.bitmap_bytes = self.body[8:]
-
-        # Store bitmap values
-        self.message_types = []
-        for i, x in enumerate(self.bitmap_bytes):
-            for b in range(8):
-                if (x & (1 << b)) != 0:
-                    self.message_types.append(1 + (i * 8) + b)
+    @lazy
+    def version(self):
+        return struct.unpack_from('<H', self.body, 0)[0]
+
+    @lazy
+    def manufacturer_id(self):
+        return struct.unpack_from('>H', self.body, 2)[0]
+
+    @lazy
+    def product_type(self):
+        return struct.unpack_from('>H', self.body, 4)[0]
+
+    @lazy
+    def product_id(self):
+        return struct.unpack_from('>H', self.body, 6)[0]
+
+    @lazy
+    def bitmap_bytes(self):
+        return self.body[8:]
+
+    @lazy
+    def message_type_bitmap(self):
+        return NodeBitmap.from_bytes(self.bitmap_bytes)
+
+    @lazy
+    def message_types(self):
+        return list(self.message_type_bitmap)
 
     def supports_message_type(self, message_type):
         """Check if a given message type is supported
@@ -94,33 +205,44 @@ class SerialAPIGetCapabilities(Message):
             bool
 
         """
-        return (message_type in self.message_types)
+        return (message_type in self.message_type_bitmap)
 
     @classmethod
-    def create_request(self):
-        """Create a request packet for SERIAL_API_GET_CAPABILITIES
+    def create_request(cls):
+        """Get the request packet for SERIAL_API_GET_CAPABILITIES
 
         Return:
-            Packet
+            FrozenPacket, shared by all calls
 
         """
-        return Packet.create(packet_type=PacketType.REQUEST,
-                             message_type=MessageType.SERIAL_API_GET_CAPABILITIES)
+        return cls.REQUEST
 
 
+@register(PacketType.RESPONSE, MessageType.SERIAL_API_GET_INIT_DATA)
 class SerialAPIGetInitData(Message):
     """Reply to SERIAL_API_GET_INIT_DATA
 
+    Fields are decoded on first access.
+
     Attributes:
+        REQUEST (FrozenPacket): SERIAL_API_GET_INIT_DATA request
         version (int):
         capabilities (int):
         bitmap_byte_length (int): always 0x1d
-        bitmap_bytes (list(int)): bitmap of 29 bytes
+        bitmap_bytes (bytes): bitmap of 29 bytes
+        node_bitmap (NodeBitmap): of node ids on the network
         nodes (list(int)): of node ids on the network
         secondary (bool): is controller secondary (based on capabilities)
         static_update (bool): is controller static update (based on capabilities)
 
     """
+    __slots__ = ('_version', '_capabilities', '_bitmap_bytes', '_node_bitmap',
+                 '_nodes')
+
+    REQUEST = Packet.create(
+            packet_type=PacketType.REQUEST,
+            message_type=MessageType.SERIAL_API_GET_INIT_DATA, frozen=True)
+
     def __init__(self, packet):
         """Create a SerialAPIGetInitData response from a response packet
 
@@ -142,24 +264,34 @@ class SerialAPIGetInitData(Message):
             raise ValueError('Bad discover message prefix: [%s] expected '
                              '[%s]' % (actual_prefix, expected_prefix))
 
-        # Parse version and capabilities
-        self.version = self.body[0]
-        self.capabilities = self.body[1]
-        self.bitmap_byte_length = self.body[2]
-
         # Should be 29 for 29 * 8 = 232 bits / node ids
         if self.bitmap_byte_length != 0x1d:
             raise ValueError('Bad bitmap byte length: [%#02x] expected '
                              '[0x1d]' % (self.bitmap_byte_length))
 
-        # Store bytes, and extract node ids
-        self.bitmap_bytes = self.body[3 : 3 + 29]
+    @lazy
+    def version(self):
+        return self.body[0]
 
-        self.nodes = []
-        for i, x in enumerate(self.bitmap_bytes):
-            for b in range(8):
-                if (x & (1 << b)) != 0:
-                    self.nodes.append(1 + (i * 8) + b)
+    @lazy
+    def capabilities(self):
+        return self.body[1]
+
+    @property
+    def bitmap_byte_length(self):
+        return self.body[2]
+
+    @lazy
+    def bitmap_bytes(self):
+        return self.body[3 : 3 + 29]
+
+    @lazy
+    def node_bitmap(self):
+        return NodeBitmap.from_bytes(self.bitmap_bytes)
+
+    @lazy
+    def nodes(self):
+        return list(self.node_bitmap)
 
     @property
     def secondary(self):
@@ -171,20 +303,21 @@ class SerialAPIGetInitData(Message):
 
     @classmethod
     def create_request(cls):
-        """Create a request packet for SERIAL_API_GET_INIT_DATA
+        """Get the request packet for SERIAL_API_GET_INIT_DATA
 
         Return:
-            Packet
+            FrozenPacket, shared by all calls
 
         """
-        return Packet.create(packet_type=PacketType.REQUEST,
-                             message_type=MessageType.SERIAL_API_GET_INIT_DATA)
+        return cls.REQUEST
 
 
+@register(PacketType.RESPONSE, MessageType.ZW_GET_CONTROLLER_CAPABILITIES)
 class ZWGetControllerCapabilities(Message):
     """Reply to ZW_GET_CONTROLLER_CAPABILITIES
 
     Attribytes:
+        REQUEST (FrozenPacket): ZW_GET_CONTROLLER_CAPABILITIES request
         capabilities (int):
         secondary (bool): if controller is secondary (based on capabilities)
         non_standard_home_id (bool): using a different home id (based on capabilities)
@@ -193,6 +326,12 @@ class ZWGetControllerCapabilities(Message):
         static_update_controller (bool): controller is static update (based on capabilities)
 
     """
+    __slots__ = ('_capabilities',)
+
+    REQUEST = Packet.create(
+            packet_type=PacketType.REQUEST,
+            message_type=MessageType.ZW_GET_CONTROLLER_CAPABILITIES,
+            frozen=True)
 
     def __init__(self, packet):
         """Create a ZWGetControllerCapabilities response from a response packet
@@ -216,7 +355,9 @@ class ZWGetControllerCapabilities(Message):
             raise ValueError('Bad discover packet prefix: [%s]' % (
                     str(actual_prefix)))
 
-        self.capabilities = self.body[0]
+    @lazy
+    def capabilities(self):
+        return self.body[0]
 
     @property
     def secondary(self):
@@ -240,11 +381,69 @@ class ZWGetControllerCapabilities(Message):
 
     @classmethod
     def create_request(cls):
-        """Create a request packet for ZW_GET_CONTROLLER_CAPABILITIES
+        """Get the request packet for ZW_GET_CONTROLLER_CAPABILITIES
+
+        Return:
+            FrozenPacket, shared by all calls
+
+        """
+        return cls.REQUEST
+
+
+@register(PacketType.RESPONSE, MessageType.MEMORY_GET_ID)
+class MemoryGetId(Message):
+    """Reply to MEMORY_GET_ID
+
+    Fields are decoded on first access.
+
+    Attributes:
+        REQUEST (FrozenPacket): MEMORY_GET_ID request
+        home_id (int): network home id
+        node_id (int): node id of the controller
+
+    """
+    __slots__ = ('_home_id', '_node_id')
+
+    REQUEST = Packet.create(packet_type=PacketType.REQUEST,
+                            message_type=MessageType.MEMORY_GET_ID,
+                            frozen=True)
+
+    def __init__(self, packet):
+        """Create a MemoryGetId response from a response packet
+
+        Arguments:
+            packet (Packet): from a MEMORY_GET_ID request
+
+        Raises:
+            ValueError: on malformed message
+
+        """
+        super(MemoryGetId, self).__init__(packet)
+
+        # Check prefix matches
+        expected_prefix = (Preamble.SOF, 0x08, PacketType.RESPONSE,
+                           MessageType.MEMORY_GET_ID)
+        actual_prefix = (self.preamble, self.length, self.packet_type,
+                         self.message_type)
+
+        if actual_prefix != expected_prefix:
+            raise ValueError('Bad memory get id prefix: [%s]' % (
+                    str(actual_prefix)))
+
+    @lazy
+    def home_id(self):
+        return struct.unpack_from('>I', self.body, 0)[0]
+
+    @lazy
+    def node_id(self):
+        return self.body[4]
+
+    @classmethod
+    def create_request(cls):
+        """Get the request packet for MEMORY_GET_ID
 
         Return:
-            Packet
+            FrozenPacket, shared by all calls
 
         """
-        return Packet.create(packet_type=PacketType.REQUEST,
-                             message_type=MessageType.ZW_GET_CONTROLLER_CAPABILITIES)
+        return cls.REQUEST
@@ -0,0 +1,270 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import bisect
+import collections
+import threading
+
+from .functions import function_name
+from .packet import PacketType
+from .packet import Preamble
+
+
+# Names of frames by Preamble, for frames other than SOF
+PREAMBLE_NAMES = {
+    Preamble.ACK: 'ACK',
+    Preamble.NAK: 'NAK',
+    Preamble.CAN: 'CAN',
+}
+
+# Names of SOF frames by PacketType
+PACKET_TYPE_NAMES = {
+    PacketType.REQUEST: 'REQUEST',
+    PacketType.RESPONSE: 'RESPONSE',
+}
+
+
+def frame_name(packet):
+    """Get the name a frame is counted under
+
+    Arguments:
+        packet (Packet): frame
+
+    Return:
+        str such as 'ACK' or 'RESPONSE SERIAL_API_GET_INIT_DATA'
+
+    """
+    if packet.preamble != Preamble.SOF:
+        return PREAMBLE_NAMES.get(packet.preamble, '%#04x' % packet.preamble)
+    return '%s %s' % (PACKET_TYPE_NAMES.get(packet.packet_type, '?'),
+                      function_name(packet.message_type))
+
+
+class Histogram(object):
+    """Latency histogram with exponential buckets
+
+    Attributes:
+        BOUNDS (tuple(float)): upper bounds of buckets in seconds, from
+            100us doubling up to about 13s. Larger values are counted in
+            one more bucket
+        counts (list(int)): values counted in every bucket
+        count (int): number of values
+        total (float): sum of values
+        minimum (float): smallest value, None if empty
+        maximum (float): largest value, None if empty
+
+    """
+    BOUNDS = tuple(0.0001 * 2 ** i for i in range(18))
+
+    def __init__(self):
+        super(Histogram, self).__init__()
+        self.counts = [0] * (len(Histogram.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, value):
+        """Count a value
+
+        Arguments:
+            value (float): seconds
+
+        """
+        self.counts[bisect.bisect_left(Histogram.BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def percentile(self, p):
+        """Estimate a percentile by the upper bound of its bucket
+
+        Arguments:
+            p (float): percentile in the range of [0, 100]
+
+        Return:
+            float seconds, None if empty
+
+        """
+        if not self.count:
+            return None
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                if i < len(Histogram.BOUNDS):
+                    return min(Histogram.BOUNDS[i], self.maximum)
+                break
+        return self.maximum
+
+    def snapshot(self):
+        """Get the histogram as a dict
+
+        Return:
+            dict of count, sum, min, max, mean, p50, p90, p99, and buckets
+            of bucket upper bound ('inf' for the last one) to count
+
+        """
+        bounds = ['%g' % x for x in Histogram.BOUNDS] + ['inf']
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'min': self.minimum,
+            'max': self.maximum,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'buckets': dict((bound, count) for bound, count in
+                            zip(bounds, self.counts) if count),
+        }
+
+
+class Metrics(object):
+    """Counters and latency histograms of controllers
+
+    Pass to a controller as metrics. Disabled metrics (None) cost a single
+    attribute check. One Metrics may be shared by several controllers, and
+    is safe to update from several threads.
+
+    Counters include the PacketParser errors (discarded_bytes,
+    bad_checksums, bad_lengths, unknown_types, unknown_preambles,
+    unknown_message_types), and bytes_read, bytes_written, retransmissions
+    and timeouts. NAK and CAN frames are counted in frames_read and
+    frames_written.
+
+    Attributes:
+        counters (collections.Counter): event name to count
+        frames_read (collections.Counter): frame name to count
+        frames_written (collections.Counter): frame name to count
+        ack_latency (dict): MessageType to Histogram of request to ACK
+        response_latency (dict): MessageType to Histogram of ACK to response
+
+    """
+
+    def __init__(self):
+        super(Metrics, self).__init__()
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clear all counters and histograms
+
+        """
+        with self.lock:
+            self.counters = collections.Counter()
+            self.frames_read = collections.Counter()
+            self.frames_written = collections.Counter()
+            self.ack_latency = collections.defaultdict(Histogram)
+            self.response_latency = collections.defaultdict(Histogram)
+
+    def count(self, name, n=1):
+        """Count an event
+
+        Arguments:
+            name (str): event name
+
+        Keyword Arguments:
+            n (int): number of events, default is 1
+
+        """
+        with self.lock:
+            self.counters[name] += n
+
+    def read(self, data, packets, before=None, after=None):
+        """Count bytes read and their parsed frames
+
+        Arguments:
+            data (bytes): read
+            packets (iterable(Packet)): parsed from data
+
+        Keyword Arguments:
+            before (dict): PacketParser.counters before parsing data
+            after (dict): PacketParser.counters after parsing data
+
+        """
+        with self.lock:
+            self.counters['bytes_read'] += len(data)
+            for packet in packets:
+                self.frames_read[frame_name(packet)] += 1
+            if before is not None:
+                for name, value in after.items():
+                    if value != before[name]:
+                        self.counters[name] += value - before[name]
+
+    def written(self, data, packets):
+        """Count bytes written and their frames
+
+        Arguments:
+            data (bytes): written
+            packets (list(Packet)): framed in data
+
+        """
+        with self.lock:
+            self.counters['bytes_written'] += len(data)
+            for packet in packets:
+                self.frames_written[frame_name(packet)] += 1
+
+    def ack(self, message_type, seconds):
+        """Add a request to ACK latency
+
+        Arguments:
+            message_type (int): MessageType of request
+            seconds (float): from write to ACK
+
+        """
+        with self.lock:
+            self.ack_latency[message_type].add(seconds)
+
+    def response(self, message_type, seconds):
+        """Add an ACK to response latency
+
+        Arguments:
+            message_type (int): MessageType of request
+            seconds (float): from ACK to response
+
+        """
+        with self.lock:
+            self.response_latency[message_type].add(seconds)
+
+    def snapshot(self):
+        """Get a copy of all metrics
+
+        Return:
+            dict of counters, frames_read, frames_written, ack_latency and
+            response_latency. Latencies are keyed by function name, and are
+            Histogram.snapshot dicts
+
+        """
+        with self.lock:
+            return {
+                'counters': dict(self.counters),
+                'frames_read': dict(self.frames_read),
+                'frames_written': dict(self.frames_written),
+                'ack_latency': dict(
+                        (function_name(k), v.snapshot())
+                        for k, v in self.ack_latency.items()),
+                'response_latency': dict(
+                        (function_name(k), v.snapshot())
+                        for k, v in self.response_latency.items()),
+            }
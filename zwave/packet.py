@@ -17,9 +17,13 @@ This file is part of pyzwave.
     along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import logging
+import collections
+import functools
+import operator
+import time
 
-logger = logging.getLogger(__name__)
+from .functions import FUNCTIONS
+from .functions import KNOWN
 
 
 class Preamble(object):
@@ -53,17 +57,39 @@ class PacketType(object):
 
 
 class MessageType(object):
-    """Specific API call
+    """Specific API call. ALL has every function in
+    zwave.functions.FUNCTIONS, like zwave.functions.KNOWN. NONE is not a
+    function, and is not in ALL.
 
     """
     NONE = 0x00
     SERIAL_API_GET_INIT_DATA = 0x02
+    APPLICATION_COMMAND_HANDLER = 0x04
     ZW_GET_CONTROLLER_CAPABILITIES = 0x05
     SERIAL_API_GET_CAPABILITIES = 0x07
     ZW_SEND_DATA = 0x13
+    MEMORY_GET_ID = 0x20
+    ZW_GET_NODE_PROTOCOL_INFO = 0x41
+    ZW_APPLICATION_UPDATE = 0x49
+    ZW_REQUEST_NODE_INFO = 0x60
 
-    ALL = set([NONE, SERIAL_API_GET_INIT_DATA, ZW_GET_CONTROLLER_CAPABILITIES,
-               SERIAL_API_GET_CAPABILITIES, ZW_SEND_DATA])
+    ALL = set(x.message_type for x in FUNCTIONS if x)
+
+
+def checksum(data, check=0xff):
+    """XOR checksum of bytes
+
+    Arguments:
+        data (bytes, list(int)): bytes to checksum
+
+    Keyword Arguments:
+        check (int): initial value, default is 0xff
+
+    Return:
+        int
+
+    """
+    return functools.reduce(operator.xor, data, check)
 
 
 class Packet(object):
@@ -74,10 +100,12 @@ class Packet(object):
         length (int): can be None
         packet_type (int): PacketType can be None
         message_type (int): MessageType can be None
-        body (list(int)): bytes of body
+        body (bytes): bytes of body
         checksum (int): can be None
 
     """
+    __slots__ = ('preamble', 'length', 'packet_type', 'message_type', 'body',
+                 'checksum')
 
     def __init__(self, preamble, length=None, packet_type=None,
                  message_type=None, body=None, checksum=None):
@@ -90,7 +118,7 @@ class Packet(object):
             length (int): default is None
             packet_type (int): PacketType, defeault is None
             message_type (int): MessageType, default is None
-            body (list(int)): default is empty list
+            body (bytes, list(int)): default is empty bytes
             checksum (int): default is None
 
         """
@@ -99,9 +127,29 @@ class Packet(object):
         self.length = length
         self.packet_type = packet_type
         self.message_type = message_type
-        self.body = body or list()
+        # NOTE: bytes(body) does not copy if body is already bytes
+        self.body = bytes(body) if body else b''
         self.checksum = checksum
 
+    def materialize(self):
+        """Get a Packet that stays valid, like FrameView.materialize
+
+        Return:
+            self
+
+        """
+        return self
+
+    @property
+    def function(self):
+        """zwave.functions.Function of the MessageType, None if unknown or
+        not a SOF packet
+
+        """
+        if self.message_type is None:
+            return None
+        return FUNCTIONS[self.message_type]
+
     def validate_checksum(self):
         """Check if checksum validates for message. If preamble is ACK, NAK, or
         CAN, then the checksum always validates, because there is none
@@ -115,14 +163,7 @@ class Packet(object):
             return True
 
         # Skip preamble and checksum
-        b = self.bytes()[1:-1]
-        # Checksum starts with 0xff
-        check = 0xff
-        for x in b:
-            # XOR bytes
-            check ^= x
-        # Compare
-        return check == self.checksum
+        return checksum(self.bytes()[1:-1]) == self.checksum
 
     def bytes(self):
         """Get the bytes that form this packet
@@ -139,15 +180,14 @@ class Packet(object):
             b.append(self.packet_type)
         if self.message_type is not None:
             b.append(self.message_type)
-        for x in self.body:
-            b.append(x)
+        b += self.body
         if self.checksum is not None:
             b.append(self.checksum)
         return b
 
     @staticmethod
     def create(preamble=Preamble.SOF, packet_type=None, message_type=None,
-               body=None):
+               body=None, frozen=False):
         """Create a Packet. The checksum is filled in based on the given
         parameters. Note that no logic checks exist to validate the message,
         i.e. you can create an ACK with a body and checksum...
@@ -156,7 +196,8 @@ class Packet(object):
             preamble (int): Preamble, default is SOF
             packet_type (int): PacketType default is None
             message_type (int): MessageType, default is None
-            body (list(int)): default is None
+            body (bytes, list(int)): default is None
+            frozen (bool): create a FrozenPacket, default is False
 
         Return:
             Packet
@@ -164,7 +205,7 @@ class Packet(object):
         """
 
         length = None
-        checksum = None
+        check_value = None
 
         # Get length, excluding preamble
         computed_length = 0
@@ -194,13 +235,30 @@ class Packet(object):
                 check ^= message_type
             # Body
             if body is not None:
-                for x in body:
-                    check ^= x
+                check = checksum(body, check)
             # Final checksum
-            checksum = check
+            check_value = check
 
+        if frozen:
+            return FrozenPacket(preamble, length=length,
+                                packet_type=packet_type,
+                                message_type=message_type, body=body,
+                                checksum=check_value, valid=True)
         return Packet(preamble, length=length, packet_type=packet_type,
-                      message_type=message_type, body=body, checksum=checksum)
+                      message_type=message_type, body=body,
+                      checksum=check_value)
+
+    def freeze(self):
+        """Get an immutable copy of this packet
+
+        Return:
+            FrozenPacket
+
+        """
+        return FrozenPacket(self.preamble, length=self.length,
+                            packet_type=self.packet_type,
+                            message_type=self.message_type, body=self.body,
+                            checksum=self.checksum)
 
     def __str__(self):
         return 'Packet: P:[0x%02x] L:[%s] T:[%s] M:[%s] B:[%s] C:[%s]' % (
@@ -218,31 +276,204 @@ class Packet(object):
         return 'Packet: [%s]' % (self.bytes())
 
 
-class PacketACK(Packet):
-    """A simple ACK packet
+class FrozenPacket(Packet):
+    """An immutable Packet. The bytes of the packet and the result of the
+    checksum validation are computed once, and are reused afterwards.
+
+    Attributes:
+        frame (bytes): bytes that form this packet
+        valid (bool): checksum validates
+
+    """
+    __slots__ = ('frame', 'valid')
+
+    def __init__(self, preamble, length=None, packet_type=None,
+                 message_type=None, body=None, checksum=None, frame=None,
+                 valid=None):
+        """New immutable ZWave packet
+
+        Arguments:
+            preamble (int):
+
+        Keyword Arguments:
+            length (int): default is None
+            packet_type (int): PacketType, defeault is None
+            message_type (int): MessageType, default is None
+            body (bytes, list(int)): default is empty bytes
+            checksum (int): default is None
+            frame (bytes): bytes that form this packet, default is None to
+                compute them
+            valid (bool): checksum validates, default is None to compute it
+
+        """
+        set_field = super(FrozenPacket, self).__setattr__
+        set_field('preamble', preamble)
+        set_field('length', length)
+        set_field('packet_type', packet_type)
+        set_field('message_type', message_type)
+        set_field('body', bytes(body) if body else b'')
+        set_field('checksum', checksum)
+        set_field('frame', bytes(Packet.bytes(self)) if frame is None
+                  else frame)
+        set_field('valid', Packet.validate_checksum(self) if valid is None
+                  else valid)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('FrozenPacket is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('FrozenPacket is immutable')
+
+    def __reduce__(self):
+        # Attributes can't be set by pickle, so pass them to __init__
+        return (self.__class__, (self.preamble, self.length, self.packet_type,
+                                 self.message_type, self.body, self.checksum,
+                                 self.frame, self.valid))
+
+    def validate_checksum(self):
+        """Check if checksum validates for message. If preamble is ACK, NAK, or
+        CAN, then the checksum always validates, because there is none
+
+        Return
+            True/False
+
+        """
+        return self.valid
+
+    def bytes(self):
+        """Get the bytes that form this packet
+
+        Return:
+            bytes
+
+        """
+        return self.frame
+
+    def freeze(self):
+        """Get an immutable copy of this packet
+
+        Return:
+            self
+
+        """
+        return self
+
+
+class PacketACK(FrozenPacket):
+    """A simple ACK packet. Use the shared PACKET_ACK instead of creating new
+    ones
 
     """
+    __slots__ = ()
+
+    def __reduce__(self):
+        return 'PACKET_ACK'
 
     def __init__(self):
-        super(PacketACK, self).__init__(Preamble.ACK)
+        super(PacketACK, self).__init__(Preamble.ACK,
+                                        frame=bytes((Preamble.ACK,)),
+                                        valid=True)
 
 
-class PacketNAK(Packet):
-    """A simple NAK packet
+class PacketNAK(FrozenPacket):
+    """A simple NAK packet. Use the shared PACKET_NAK instead of creating new
+    ones
 
     """
+    __slots__ = ()
+
+    def __reduce__(self):
+        return 'PACKET_NAK'
 
     def __init__(self):
-        super(PacketNAK, self).__init__(Preamble.NAK)
+        super(PacketNAK, self).__init__(Preamble.NAK,
+                                        frame=bytes((Preamble.NAK,)),
+                                        valid=True)
 
 
-class PacketCAN(Packet):
-    """A simple CAN packet
+class PacketCAN(FrozenPacket):
+    """A simple CAN packet. Use the shared PACKET_CAN instead of creating new
+    ones
 
     """
+    __slots__ = ()
+
+    def __reduce__(self):
+        return 'PACKET_CAN'
 
     def __init__(self):
-        super(PacketCAN, self).__init__(Preamble.CAN)
+        super(PacketCAN, self).__init__(Preamble.CAN,
+                                        frame=bytes((Preamble.CAN,)),
+                                        valid=True)
+
+
+# Shared control packets
+PACKET_ACK = PacketACK()
+PACKET_NAK = PacketNAK()
+PACKET_CAN = PacketCAN()
+
+# Control packets by Preamble
+CONTROL_PACKETS = {
+    Preamble.ACK: PACKET_ACK,
+    Preamble.NAK: PACKET_NAK,
+    Preamble.CAN: PACKET_CAN,
+}
+
+
+def acknowledged(parser, packets, control):
+    """Pass through parsed packets, and collect the replies to them in the
+    order the frames were parsed: an ACK for every SOF packet, and a NAK
+    for every packet with a bad checksum
+
+    Arguments:
+        parser: PacketParser or zwave.ring.RingBuffer parsing packets
+        packets (iterable(Packet)): parsed by parser
+        control (list): PACKET_ACK and PACKET_NAK are appended to it
+
+    Yield:
+        packets
+
+    """
+    bad_checksums = parser.bad_checksums
+    try:
+        for packet in packets:
+            if parser.bad_checksums != bad_checksums:
+                control.extend([PACKET_NAK] * (parser.bad_checksums -
+                                               bad_checksums))
+                bad_checksums = parser.bad_checksums
+            if packet.preamble == Preamble.SOF:
+                control.append(PACKET_ACK)
+            yield packet
+    finally:
+        # Bad checksums after the last packet, or before an exception
+        control.extend([PACKET_NAK] * (parser.bad_checksums - bad_checksums))
+
+
+def parse_chunk(parser, data, on_error):
+    """Parse a chunk of bytes read from a serial device, and collect the ACK
+    and NAK replies to write for it, in the order the frames were parsed.
+    Parsing resumes after every parsing exception.
+
+    Arguments:
+        parser (PacketParser): to feed data to
+        data (bytes): read from the serial device
+        on_error (callable): called with every PacketParserException
+
+    Return:
+        tuple(list(Packet), list(Packet)) of the parsed packets, and of the
+        PACKET_ACK and PACKET_NAK replies to write at once
+
+    """
+    control = []
+    packets = []
+    while True:
+        try:
+            for packet in acknowledged(parser, parser.feed(data), control):
+                packets.append(packet)
+            return packets, control
+        except PacketParserException as e:
+            on_error(e)
+            data = b''
 
 
 class PacketParserException(Exception):
@@ -302,9 +533,23 @@ class PacketParserBadLength(PacketParserException):
 class PacketParser(object):
     """Parses packet bytes into Packets
 
+    In strict mode (the default) malformed input raises a
+    PacketParserException. Otherwise, the malformed bytes are discarded and
+    parsing continues at the next Preamble byte, without raising.
+
     Attributes:
-        packet (Packet): ongoing packet
         state (int): current packet parsing state
+        pending (bytes): unparsed bytes left over after a parsing exception
+        strict (bool): raise exceptions on malformed input
+        discarded_bytes (int): number of bytes not part of a valid packet
+        bad_checksums (int): number of packets with a bad checksum
+        bad_lengths (int): number of packets with a bad length
+        unknown_types (int): number of packets with an unknown PacketType
+        unknown_preambles (int): number of unknown Preamble bytes
+        unknown_message_types (int): number of packets with a MessageType
+            not in zwave.functions.FUNCTIONS
+        tracer (zwave.trace.Tracer): called on frame start, frame complete
+            and error, or None
 
     """
 
@@ -327,25 +572,101 @@ class PacketParser(object):
         BODY = 5
         CHECKSUM = 6
 
-    def __init__(self):
+    def __init__(self, strict=True):
+        """
+        Keyword Arguments:
+            strict (bool): raise exceptions on malformed input, default is
+                True
+
+        """
         super(PacketParser, self).__init__()
-        self.packet = None
         self.state = PacketParser.State.PREAMBLE
+        self.pending = b''
+        # Fields of ongoing packet
+        self.length = None
+        self.packet_type = None
+        self.message_type = None
+        self.body = b''
+        # Running checksum of ongoing packet
+        self.check = 0xff
+        # Body bytes of ongoing packet split across chunks
+        self.body_buffer = bytearray()
+        # Packets finished by update, not yet returned
+        self.finished = collections.deque()
+        self.strict = strict
+        self.discarded_bytes = 0
+        self.bad_checksums = 0
+        self.bad_lengths = 0
+        self.unknown_types = 0
+        self.unknown_preambles = 0
+        self.unknown_message_types = 0
+        self.tracer = None
+
+    def counters(self):
+        """Get the error counters
+
+        Return:
+            dict of counter name to value
+
+        """
+        return {
+            'discarded_bytes': self.discarded_bytes,
+            'bad_checksums': self.bad_checksums,
+            'bad_lengths': self.bad_lengths,
+            'unknown_types': self.unknown_types,
+            'unknown_preambles': self.unknown_preambles,
+            'unknown_message_types': self.unknown_message_types,
+        }
+
+    def _reset_state(self, checksum=None):
+        """Reset state and return ongoing packet
 
-    def _reset_state(self):
-        """Reset state and return current packet
+        Keyword Arguments:
+            checksum (int): checksum of ongoing packet, default is None
 
         Return:
             Packet
 
         """
-        packet, self.packet = self.packet, None
-        self.state = PacketParser.State.PREAMBLE
+        packet = Packet(Preamble.SOF, length=self.length,
+                        packet_type=self.packet_type,
+                        message_type=self.message_type, body=self.body,
+                        checksum=checksum)
+        self._clear_state()
         return packet
 
+    def _on_error(self, error):
+        """Pass a parsing error to the tracer, and raise it if strict
+
+        Arguments:
+            error (PacketParserException): parsing error
+
+        Raises:
+            PacketParserException: error, if strict
+
+        """
+        if self.tracer is not None:
+            self.tracer.error(time.monotonic_ns(), error)
+        if self.strict:
+            raise error
+
+    def _clear_state(self):
+        """Reset state and drop ongoing packet
+
+        """
+        self.state = PacketParser.State.PREAMBLE
+        self.length = None
+        self.packet_type = None
+        self.message_type = None
+        self.body = b''
+
     def update(self, n):
         """Update the parse state
 
+        Bytes left in pending by a parsing exception in feed are parsed
+        before n, and may finish several packets. The extra packets are
+        returned first by the following calls to update or feed.
+
         Arguments:
             n (int): byte value
 
@@ -354,10 +675,10 @@ class PacketParser(object):
 
         Raises:
             ValueError: if n is not in range of [0, 255]
-            PacketParserUnknownPreamble; if bad Preamble
-            PacketParserBadLength: if bad length
-            PacketParserUnknownType: if unknown PacketType
-            PacketParserBadChecksum: if bad checksum
+            PacketParserUnknownPreamble; if bad Preamble and strict
+            PacketParserBadLength: if bad length and strict
+            PacketParserUnknownType: if unknown PacketType and strict
+            PacketParserBadChecksum: if bad checksum and strict
 
         """
 
@@ -365,75 +686,185 @@ class PacketParser(object):
         if (n < 0 or n > 255):
             raise ValueError('n must be within byte range of [0, 255]')
 
-        if self.state == PacketParser.State.PREAMBLE:
-            # Got preamble
-            if n not in Preamble.ALL:
-                raise PacketParserUnknownPreamble(n)
-
-            if n == Preamble.ACK:
-                # ACKs are just 0x06
-                return PacketACK()
-            elif n == Preamble.NAK:
-                # NACKs are just 0x15
-                return PacketNAK()
-            elif n == Preamble.CAN:
-                # CANs are just 0x18
-                return PacketCAN()
-            else:
-                # Create new packet
-                self.packet = Packet(n)
-                self.state = PacketParser.State.LENGTH
-
-        elif self.state == PacketParser.State.LENGTH:
-            # Got length
-
-            self.packet.length = n
-
-            if n in (0, 1, 2):
-                raise PacketParserBadLength(self._reset_state())
-            else:
-                self.state = PacketParser.State.PACKET_TYPE
-
-        elif self.state == PacketParser.State.PACKET_TYPE:
-            # Got packet type
-
-            if n not in PacketType.ALL:
-                # Reset
-                raise PacketParserUnknownType(n, self._reset_state())
-            else:
-                # Set packet type
-                self.packet.packet_type = n
-                self.state = PacketParser.State.MESSAGE_TYPE
-
-        elif self.state == PacketParser.State.MESSAGE_TYPE:
-            # Got controller packet type
-            if n not in MessageType.ALL:
-                logger.warn('Unknown byte [%02x] waiting for message type ', n)
-
-            self.packet.message_type = n
-
-            # Done, because message type counts towards length
-            if self.packet.length == 3:
-                # Just get checksum
-                self.state = PacketParser.State.CHECKSUM
-            else:
-                # Get body bytes
-                self.state = PacketParser.State.BODY
-
-        elif self.state == PacketParser.State.BODY:
-            # Get body byte
-            self.packet.body.append(n)
-
-            # Subtract 3 for: packet type, message type, checksum
-            if len(self.packet.body) == self.packet.length - 3:
-                self.state = PacketParser.State.CHECKSUM
-
-        else:  # self.state == PacketParser.State.CHECKSUM
-            # Got checksum
-            self.packet.checksum = n
-
-            # Return and reset
-            if not self.packet.validate_checksum():
-                raise PacketParserBadChecksum(self._reset_state())
-            else:
-                return self._reset_state()
+        # Keep finished packets aside, so feed only yields new ones
+        finished, self.finished = self.finished, ()
+        try:
+            for packet in self.feed(bytes((n,))):
+                finished.append(packet)
+        finally:
+            self.finished = finished
+        return finished.popleft() if finished else None
+
+    def feed(self, data):
+        """Parse a chunk of bytes. Partial packets are kept between calls.
+
+        If a parsing exception is raised, the bytes following the offending
+        byte are kept in pending, and are parsed first on the next call,
+        so that feed(b'') resumes parsing after the error. This produces the
+        same packets and errors as calling update for every byte. The
+        returned generator must be consumed until exhausted or until it
+        raises, otherwise the rest of the chunk is dropped.
+
+        The checksum is computed while parsing, and finished packets are
+        FrozenPackets.
+
+        Arguments:
+            data (bytes, bytearray, memoryview): bytes to parse
+
+        Yield:
+            FrozenPacket for every finished packet
+
+        Raises:
+            PacketParserUnknownPreamble; if bad Preamble and strict
+            PacketParserBadLength: if bad length and strict
+            PacketParserUnknownType: if unknown PacketType and strict
+            PacketParserBadChecksum: if bad checksum and strict
+
+        """
+        while self.finished:
+            yield self.finished.popleft()
+        if self.pending:
+            data, self.pending = self.pending + bytes(data), b''
+
+        State = PacketParser.State
+        strict = self.strict
+        tracer = self.tracer
+        i = 0
+        end = len(data)
+        # Start of ongoing packet in data, None if it began in an earlier
+        # chunk
+        start = None
+        try:
+            while i < end:
+                state = self.state
+
+                if state == State.BODY:
+                    # Take as many body bytes as possible in one slice
+                    # Subtract 3 for: packet type, message type, checksum
+                    size = self.length - 3
+                    body = self.body_buffer
+                    remaining = size - len(body)
+                    if not body and end - i >= remaining:
+                        # Whole body in this chunk
+                        self.body = bytes(data[i:i + remaining])
+                    else:
+                        body += data[i:i + remaining]
+                        if len(body) < size:
+                            # Wait for next chunk
+                            break
+                        self.body = bytes(body)
+                        del body[:]
+                    self.check = checksum(self.body, self.check)
+                    i += remaining
+                    self.state = State.CHECKSUM
+                    continue
+
+                n = data[i]
+                i += 1
+
+                if state == State.PREAMBLE:
+                    # Got preamble
+                    if n not in Preamble.ALL:
+                        self.unknown_preambles += 1
+                        self.discarded_bytes += 1
+                        if strict or tracer is not None:
+                            self._on_error(PacketParserUnknownPreamble(n))
+                        continue
+
+                    if n != Preamble.SOF:
+                        # ACK, NAK and CAN are just the preamble byte
+                        if tracer is not None:
+                            tracer.frame_complete(time.monotonic_ns(),
+                                                  CONTROL_PACKETS[n])
+                        yield CONTROL_PACKETS[n]
+                    else:
+                        # Start new packet
+                        if tracer is not None:
+                            tracer.frame_start(time.monotonic_ns())
+                        start = i - 1
+                        self.state = State.LENGTH
+
+                elif state == State.LENGTH:
+                    # Got length
+
+                    self.length = n
+
+                    if n in (0, 1, 2):
+                        # Discard preamble and length
+                        self.bad_lengths += 1
+                        self.discarded_bytes += 2
+                        if strict or tracer is not None:
+                            self._on_error(PacketParserBadLength(
+                                    self._reset_state()))
+                        self._clear_state()
+                    else:
+                        self.check = 0xff ^ n
+                        self.state = State.PACKET_TYPE
+
+                elif state == State.PACKET_TYPE:
+                    # Got packet type
+
+                    if n not in PacketType.ALL:
+                        # Discard preamble, length and packet type
+                        self.unknown_types += 1
+                        self.discarded_bytes += 3
+                        if strict or tracer is not None:
+                            self._on_error(PacketParserUnknownType(
+                                    n, self._reset_state()))
+                        self._clear_state()
+                    else:
+                        # Set packet type
+                        self.packet_type = n
+                        self.check ^= n
+                        self.state = State.MESSAGE_TYPE
+
+                elif state == State.MESSAGE_TYPE:
+                    # Got controller packet type
+                    if not KNOWN[n]:
+                        # Still parsed, but counted
+                        self.unknown_message_types += 1
+
+                    self.message_type = n
+                    self.check ^= n
+
+                    # Done, because message type counts towards length
+                    if self.length == 3:
+                        # Just get checksum
+                        self.state = State.CHECKSUM
+                    else:
+                        # Get body bytes
+                        self.state = State.BODY
+
+                else:  # state == State.CHECKSUM
+                    # Got checksum
+                    if n != self.check:
+                        # Discard the whole packet
+                        self.bad_checksums += 1
+                        self.discarded_bytes += self.length + 2
+                        if strict or tracer is not None:
+                            self._on_error(PacketParserBadChecksum(
+                                    self._reset_state(checksum=n)))
+                        self._clear_state()
+                        continue
+
+                    if start is not None:
+                        # Whole packet in this chunk
+                        frame = bytes(data[start:i])
+                    else:
+                        frame = bytes((Preamble.SOF, self.length,
+                                       self.packet_type, self.message_type))
+                        frame += self.body + bytes((n,))
+
+                    packet = FrozenPacket(Preamble.SOF, length=self.length,
+                                          packet_type=self.packet_type,
+                                          message_type=self.message_type,
+                                          body=self.body, checksum=n,
+                                          frame=frame, valid=True)
+                    self._clear_state()
+                    if tracer is not None:
+                        tracer.frame_complete(time.monotonic_ns(), packet)
+                    yield packet
+        except PacketParserException:
+            # Keep unparsed bytes for the next call
+            self.pending = bytes(data[i:])
+            raise
@@ -0,0 +1,341 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from .functions import KNOWN
+from .packet import CONTROL_PACKETS
+from .packet import FrozenPacket
+from .packet import PacketType
+from .packet import Preamble
+from .packet import checksum
+
+
+class FrameView(object):
+    """A valid frame in a RingBuffer, without copying it. Has the same fields
+    as a Packet, read from the buffer on access.
+
+    A view is only valid until the RingBuffer wraps, and its bytes are
+    overwritten. Accessing a field of a stale view raises ValueError. Call
+    materialize to keep the frame.
+
+    Attributes:
+        ring (RingBuffer): buffer holding the frame
+        offset (int): of the frame in the buffer
+        size (int): of the frame in bytes, 1 for ACK, NAK and CAN
+        generation (int): of the buffer when the frame was parsed
+
+    """
+    __slots__ = ('ring', 'offset', 'size', 'generation')
+
+    def __init__(self, ring, offset, size):
+        self.ring = ring
+        self.offset = offset
+        self.size = size
+        self.generation = ring.generation
+
+    @property
+    def valid(self):
+        """True until the RingBuffer wraps"""
+        return self.generation == self.ring.generation
+
+    @property
+    def preamble(self):
+        self._check()
+        return self.ring.buffer[self.offset]
+
+    @property
+    def length(self):
+        self._check()
+        if self.size == 1:
+            return None
+        return self.ring.buffer[self.offset + 1]
+
+    @property
+    def packet_type(self):
+        self._check()
+        if self.size == 1:
+            return None
+        return self.ring.buffer[self.offset + 2]
+
+    @property
+    def message_type(self):
+        self._check()
+        if self.size == 1:
+            return None
+        return self.ring.buffer[self.offset + 3]
+
+    @property
+    def body(self):
+        """memoryview of body bytes"""
+        self._check()
+        if self.size == 1:
+            return self.ring.view[0:0]
+        return self.ring.view[self.offset + 4:self.offset + self.size - 1]
+
+    @property
+    def checksum(self):
+        self._check()
+        if self.size == 1:
+            return None
+        return self.ring.buffer[self.offset + self.size - 1]
+
+    def validate_checksum(self):
+        """Only frames with a valid checksum are viewed
+
+        Return:
+            True
+
+        """
+        return True
+
+    def _check(self):
+        if not self.valid:
+            raise ValueError('Stale FrameView, the RingBuffer wrapped')
+
+    def bytes(self):
+        """Get a copy of the frame bytes
+
+        Return:
+            bytes
+
+        Raises:
+            ValueError: if the view is no longer valid
+
+        """
+        self._check()
+        return bytes(self.ring.view[self.offset:self.offset + self.size])
+
+    def materialize(self):
+        """Copy the frame into a Packet, which stays valid
+
+        Return:
+            FrozenPacket, the shared PACKET_ACK, PACKET_NAK or PACKET_CAN for
+            those frames
+
+        Raises:
+            ValueError: if the view is no longer valid
+
+        """
+        self._check()
+        if self.size == 1:
+            return CONTROL_PACKETS[self.preamble]
+        frame = self.bytes()
+        return FrozenPacket(Preamble.SOF, length=frame[1],
+                            packet_type=frame[2], message_type=frame[3],
+                            body=frame[4:-1], checksum=frame[-1],
+                            frame=frame, valid=True)
+
+    def __str__(self):
+        if not self.valid:
+            return 'FrameView: stale'
+        return 'FrameView: %s' % self.materialize()
+
+    def __repr__(self):
+        return 'FrameView(offset=%d, size=%d)' % (self.offset, self.size)
+
+
+class RingBuffer(object):
+    """Preallocated receive buffer, scanned for frames in place
+
+    Bytes are read into writable, and frames are scanned from the first
+    unparsed byte. When there is no more room at the end, the unparsed bytes
+    are moved to the start of the buffer, and generation is incremented,
+    which invalidates all earlier FrameViews. Frames are never split, since
+    they are at most MAX_FRAME bytes.
+
+    Malformed bytes are skipped with the same rules as a PacketParser that
+    is not strict, and are counted. Like there, an unknown MessageType is
+    counted as soon as it is read, before the checksum is checked.
+
+    Attributes:
+        MAX_FRAME (int): largest frame in bytes
+        buffer (bytearray): storage
+        view (memoryview): of buffer
+        start (int): offset of the first unparsed byte
+        end (int): offset after the last byte read
+        generation (int): number of times the buffer wrapped
+        discarded_bytes (int): number of bytes not part of a valid packet
+        bad_checksums (int): number of packets with a bad checksum
+        bad_lengths (int): number of packets with a bad length
+        unknown_types (int): number of packets with an unknown PacketType
+        unknown_preambles (int): number of unknown Preamble bytes
+        unknown_message_types (int): number of packets with a MessageType
+            not in zwave.functions.FUNCTIONS
+        counted (bool): MessageType of the partial frame at start was
+            already counted
+
+    """
+    MAX_FRAME = 0xff + 2
+
+    def __init__(self, size=65536):
+        """
+        Keyword Arguments:
+            size (int): bytes of storage, default is 65536
+
+        Raises:
+            ValueError: if size is less than twice MAX_FRAME
+
+        """
+        super(RingBuffer, self).__init__()
+        if size < 2 * RingBuffer.MAX_FRAME:
+            raise ValueError('Ring buffer size must be at least %d' % (
+                    2 * RingBuffer.MAX_FRAME))
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+        self.generation = 0
+        self.discarded_bytes = 0
+        self.bad_checksums = 0
+        self.bad_lengths = 0
+        self.unknown_types = 0
+        self.unknown_preambles = 0
+        self.unknown_message_types = 0
+        self.counted = False
+
+    def counters(self):
+        """Get the error counters, like PacketParser.counters
+
+        Return:
+            dict of counter name to value
+
+        """
+        return {
+            'discarded_bytes': self.discarded_bytes,
+            'bad_checksums': self.bad_checksums,
+            'bad_lengths': self.bad_lengths,
+            'unknown_types': self.unknown_types,
+            'unknown_preambles': self.unknown_preambles,
+            'unknown_message_types': self.unknown_message_types,
+        }
+
+    def writable(self, size):
+        """Get room to read bytes into, wrapping if needed. Call commit with
+        the number of bytes read.
+
+        Arguments:
+            size (int): bytes wanted
+
+        Return:
+            memoryview of at least 1 and at most size bytes
+
+        """
+        if len(self.buffer) - self.end < min(size, RingBuffer.MAX_FRAME):
+            # Move the unparsed partial frame to the start
+            pending = self.end - self.start
+            self.buffer[:pending] = self.buffer[self.start:self.end]
+            self.start = 0
+            self.end = pending
+            self.generation += 1
+        return self.view[self.end:min(len(self.buffer), self.end + size)]
+
+    def commit(self, n):
+        """Mark bytes read into writable as ready to scan
+
+        Arguments:
+            n (int): number of bytes read
+
+        """
+        self.end += n
+
+    def write(self, data):
+        """Copy bytes into the buffer
+
+        Arguments:
+            data (bytes): to add
+
+        Raises:
+            BufferError: if the buffer is full of unparsed bytes
+
+        """
+        i = 0
+        while i < len(data):
+            room = self.writable(len(data) - i)
+            n = len(room)
+            if n == 0:
+                raise BufferError('Ring buffer full, scan frames first')
+            room[:] = data[i:i + n]
+            self.commit(n)
+            i += n
+
+    def frames(self):
+        """Scan unparsed bytes for frames. A partial frame at the end is
+        kept for the next call.
+
+        Yield:
+            FrameView of every valid frame
+
+        """
+        buffer = self.buffer
+        i = self.start
+        end = self.end
+        # Partial frame scanned again
+        counted = self.start if self.counted else None
+        while i < end:
+            n = buffer[i]
+            if n != Preamble.SOF:
+                if n in CONTROL_PACKETS:
+                    self.start = i + 1
+                    yield FrameView(self, i, 1)
+                else:
+                    self.unknown_preambles += 1
+                    self.discarded_bytes += 1
+                i += 1
+                continue
+
+            if end - i < 2:
+                break
+            length = buffer[i + 1]
+            if length < 3:
+                # Discard preamble and length
+                self.bad_lengths += 1
+                self.discarded_bytes += 2
+                i += 2
+                continue
+
+            if end - i < 3:
+                break
+            if buffer[i + 2] not in PacketType.ALL:
+                # Discard preamble, length and packet type
+                self.unknown_types += 1
+                self.discarded_bytes += 3
+                i += 3
+                continue
+
+            if end - i < 4:
+                break
+            if not KNOWN[buffer[i + 3]] and i != counted:
+                self.unknown_message_types += 1
+
+            size = length + 2
+            if end - i < size:
+                break
+            if (checksum(self.view[i + 1:i + size - 1]) !=
+                    buffer[i + size - 1]):
+                # Discard the whole packet
+                self.bad_checksums += 1
+                self.discarded_bytes += size
+                i += size
+                continue
+
+            self.start = i + size
+            yield FrameView(self, i, size)
+            i += size
+        self.start = i
+        # Stopped at a partial frame with its MessageType
+        self.counted = end - i >= 4
@@ -0,0 +1,322 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import heapq
+import logging
+import os
+import random
+import select
+import struct
+import threading
+import time
+import tty
+
+from .bitmap import NodeBitmap
+from .packet import PACKET_ACK
+from .packet import PACKET_CAN
+from .packet import PACKET_NAK
+from .packet import MessageType
+from .packet import Packet
+from .packet import PacketParser
+from .packet import PacketType
+from .packet import Preamble
+
+
+logger = logging.getLogger(__name__)
+
+
+class TransmitStatus(object):
+    """Status of ZW_SEND_DATA callbacks
+
+    """
+    OK = 0x00
+    NO_ACK = 0x01
+
+
+class SimulatedController(object):
+    """Virtual Serial API controller on a pty, to run ZWaveController without
+    hardware. Connect to path.
+
+    Requests are ACKed, and answered after latency seconds. Every request
+    may instead be dropped, or answered with a NAK or CAN, at random with
+    the configured rates. Basic reports from random nodes are sent as
+    unsolicited APPLICATION_COMMAND_HANDLER requests, on average
+    report_rate times per second.
+
+    Attributes:
+        MESSAGE_TYPES (list(int)): MessageTypes answered
+        path (str): path of the simulated serial device
+        requests (int): number of requests received
+        dropped (int): number of requests dropped
+        naks (int): number of NAKs sent
+        cans (int): number of CANs sent
+        acks (int): number of ACKs received
+        reports (int): number of unsolicited reports sent
+
+    """
+    MESSAGE_TYPES = [
+        MessageType.SERIAL_API_GET_INIT_DATA,
+        MessageType.ZW_GET_CONTROLLER_CAPABILITIES,
+        MessageType.SERIAL_API_GET_CAPABILITIES,
+        MessageType.ZW_SEND_DATA,
+        MessageType.MEMORY_GET_ID,
+    ]
+
+    def __init__(self, nodes=(1,), home_id=0xc0ffee42, node_id=1,
+                 latency=0.0, drop_rate=0.0, nak_rate=0.0, can_rate=0.0,
+                 report_rate=0.0, seed=None):
+        """Open the pty and start answering requests
+
+        Keyword Arguments:
+            nodes (iterable(int)): node ids in the network, default is (1,)
+            home_id (int): home id, default is 0xc0ffee42
+            node_id (int): node id of the controller, default is 1
+            latency (float): seconds before a response is sent, default is 0
+            drop_rate (float): probability of ignoring a request
+            nak_rate (float): probability of answering a request with a NAK
+            can_rate (float): probability of answering a request with a CAN
+            report_rate (float): average unsolicited reports per second,
+                default is 0 for none
+            seed (int): random seed, default is None
+
+        """
+        super(SimulatedController, self).__init__()
+        self.nodes = NodeBitmap(nodes)
+        self.home_id = home_id
+        self.node_id = node_id
+        self.latency = latency
+        self.drop_rate = drop_rate
+        self.nak_rate = nak_rate
+        self.can_rate = can_rate
+        self.report_rate = report_rate
+        self.random = random.Random(seed)
+
+        self.requests = 0
+        self.dropped = 0
+        self.naks = 0
+        self.cans = 0
+        self.acks = 0
+        self.reports = 0
+
+        self.handlers = {
+            MessageType.SERIAL_API_GET_INIT_DATA: self._init_data,
+            MessageType.ZW_GET_CONTROLLER_CAPABILITIES:
+                self._controller_capabilities,
+            MessageType.SERIAL_API_GET_CAPABILITIES: self._capabilities,
+            MessageType.ZW_SEND_DATA: self._send_data,
+            MessageType.MEMORY_GET_ID: self._memory_id,
+        }
+
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.path = os.ttyname(self.slave)
+        self.packet_parser = PacketParser(strict=False)
+        # Heap of (time, sequence, bytes) to write
+        self.scheduled = []
+        self.sequence = 0
+        self.next_report = self._next_report(time.monotonic())
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run,
+                                       name='zwave-simulator')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _next_report(self, now):
+        """Time of the next unsolicited report, or None if disabled"""
+        if self.report_rate <= 0:
+            return None
+        return now + self.random.expovariate(self.report_rate)
+
+    def _schedule(self, delay, packet):
+        """Write a packet after delay seconds
+
+        Arguments:
+            delay (float): seconds from now
+            packet (Packet): to write
+
+        """
+        self.sequence += 1
+        heapq.heappush(self.scheduled, (time.monotonic() + delay,
+                                        self.sequence, packet.bytes()))
+
+    def _run(self):
+        """Simulator thread: answer requests until closed
+
+        """
+        while not self.stopped.is_set():
+            now = time.monotonic()
+            deadlines = [now + 0.1]
+            if self.scheduled:
+                deadlines.append(self.scheduled[0][0])
+            if self.next_report is not None:
+                deadlines.append(self.next_report)
+            timeout = max(0, min(deadlines) - now)
+
+            try:
+                readable = select.select([self.master], [], [], timeout)[0]
+                if readable:
+                    self._on_readable(os.read(self.master, 4096))
+                self._flush()
+            except OSError:
+                if not self.stopped.is_set():
+                    logger.exception('Simulator failed')
+                return
+
+    def _on_readable(self, data):
+        """Answer every packet in data
+
+        Arguments:
+            data (bytes): read from the pty
+
+        """
+        for packet in self.packet_parser.feed(data):
+            if packet.preamble == Preamble.ACK:
+                self.acks += 1
+            elif packet.preamble == Preamble.SOF:
+                self._on_request(packet)
+
+    def _on_request(self, packet):
+        """ACK and answer a request, or drop, NAK or CAN it
+
+        Arguments:
+            packet (Packet): from the host
+
+        """
+        self.requests += 1
+        x = self.random.random()
+        if x < self.drop_rate:
+            self.dropped += 1
+            return
+        x -= self.drop_rate
+        if x < self.nak_rate:
+            self.naks += 1
+            self._schedule(0, PACKET_NAK)
+            return
+        x -= self.nak_rate
+        if x < self.can_rate:
+            self.cans += 1
+            self._schedule(0, PACKET_CAN)
+            return
+
+        self._schedule(0, PACKET_ACK)
+        handler = self.handlers.get(packet.message_type)
+        if packet.packet_type != PacketType.REQUEST or handler is None:
+            logger.warning('Unsupported request: %s', packet)
+            return
+        for delay, response in handler(packet):
+            self._schedule(self.latency + delay, response)
+
+    def _flush(self):
+        """Write all due packets, and the unsolicited report if due, at once
+
+        """
+        now = time.monotonic()
+        data = []
+        while self.scheduled and self.scheduled[0][0] <= now:
+            data.append(heapq.heappop(self.scheduled)[2])
+        if self.next_report is not None and self.next_report <= now:
+            data.append(self._report().bytes())
+            self.next_report = self._next_report(self.next_report)
+        if data:
+            os.write(self.master, b''.join(data))
+
+    def _report(self):
+        """Create a basic report from a random node
+
+        Return:
+            Packet
+
+        """
+        self.reports += 1
+        nodes = [x for x in self.nodes if x != self.node_id] or [self.node_id]
+        node = self.random.choice(nodes)
+        # Status, node, command length, BASIC REPORT, value
+        return Packet.create(
+                packet_type=PacketType.REQUEST,
+                message_type=MessageType.APPLICATION_COMMAND_HANDLER,
+                body=[0x00, node, 0x03, 0x20, 0x03,
+                      self.random.choice([0x00, 0xff])])
+
+    def _response(self, message_type, body):
+        """Create a response packet"""
+        return Packet.create(packet_type=PacketType.RESPONSE,
+                             message_type=message_type, body=body)
+
+    def _init_data(self, packet):
+        # Version, capabilities, bitmap length, bitmap, chip type and version
+        return [(0, self._response(
+                MessageType.SERIAL_API_GET_INIT_DATA,
+                b'\x05\x00\x1d' + self.nodes.to_bytes(29) + b'\x05\x00'))]
+
+    def _controller_capabilities(self, packet):
+        # Primary controller
+        return [(0, self._response(MessageType.ZW_GET_CONTROLLER_CAPABILITIES,
+                                   [0x00]))]
+
+    def _capabilities(self, packet):
+        # Application version and revision, manufacturer id, product type,
+        # product id, and bitmap of supported message types
+        return [(0, self._response(
+                MessageType.SERIAL_API_GET_CAPABILITIES,
+                struct.pack('>BBHHH', 0x01, 0x00, 0x0000, 0x0000, 0x0000) +
+                NodeBitmap(self.MESSAGE_TYPES).to_bytes(32)))]
+
+    def _memory_id(self, packet):
+        return [(0, self._response(MessageType.MEMORY_GET_ID,
+                                   struct.pack('>IB', self.home_id,
+                                               self.node_id)))]
+
+    def _send_data(self, packet):
+        """Accept the request, then send the transmit status callback
+
+        Request body is: node id, data length, data, transmit options, and
+        callback id
+
+        """
+        body = packet.body
+        if len(body) < 4 or len(body) != body[1] + 4:
+            return [(0, self._response(MessageType.ZW_SEND_DATA, [0x00]))]
+
+        node = body[0]
+        callback_id = body[-1]
+        responses = [(0, self._response(MessageType.ZW_SEND_DATA, [0x01]))]
+        if callback_id != 0:
+            status = (TransmitStatus.OK if node in self.nodes else
+                      TransmitStatus.NO_ACK)
+            # Transmission takes about as long as the response
+            responses.append((self.latency, Packet.create(
+                    packet_type=PacketType.REQUEST,
+                    message_type=MessageType.ZW_SEND_DATA,
+                    body=[callback_id, status])))
+        return responses
+
+    def close(self):
+        """Stop the simulator, and close the pty
+
+        """
+        self.stopped.set()
+        self.thread.join()
+        os.close(self.slave)
+        os.close(self.master)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,173 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import socket
+
+from .message import decode
+from .packet import PacketParser
+
+
+# Generator pipeline from any byte source to packets and messages:
+#
+#     for message in decoded(iter_packets(open('dump.bin', 'rb'))):
+#         ...
+#
+# Every stage is lazy, and only the chunk being parsed and one partial packet
+# are held in memory.
+
+CHUNK_SIZE = 4096
+
+
+def iter_chunks(source, size=CHUNK_SIZE):
+    """Read byte chunks from a source until it ends
+
+    Arguments:
+        source: a bytes-like object, a socket.socket, a file-like object
+            with read1 or read (including a serial.Serial), or an iterable
+            of byte chunks. A file-like object ends when read returns no
+            bytes, so a serial.Serial with a timeout ends at the first
+            timeout
+
+    Keyword Arguments:
+        size (int): maximum bytes read at once, default is CHUNK_SIZE
+
+    Yield:
+        bytes-like chunks
+
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        yield source
+        return
+
+    if isinstance(source, socket.socket):
+        read = source.recv
+    elif hasattr(source, 'in_waiting'):
+        # pyserial: read whatever is waiting, at least one byte
+        def read(size):
+            return source.read(min(size, max(1, source.in_waiting)))
+    elif hasattr(source, 'read1'):
+        read = source.read1
+    elif hasattr(source, 'read'):
+        read = source.read
+    else:
+        for chunk in source:
+            yield chunk
+        return
+
+    while True:
+        chunk = read(size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_packets(source, strict=False, size=CHUNK_SIZE):
+    """Parse packets from a byte source
+
+    Arguments:
+        source: any source accepted by iter_chunks
+
+    Keyword Arguments:
+        strict (bool): raise parsing exceptions, default is False to skip
+            malformed bytes
+        size (int): maximum bytes read at once, default is CHUNK_SIZE
+
+    Yield:
+        FrozenPacket for every parsed packet
+
+    Raises:
+        zwave.packet.PacketParserException: if strict and parsing exception
+            occured
+
+    """
+    parser = PacketParser(strict=strict)
+    for chunk in iter_chunks(source, size=size):
+        for packet in parser.feed(chunk):
+            yield packet
+
+
+def decoded(packets):
+    """Decode packets into their Message classes
+
+    Arguments:
+        packets (iterable(Packet)): to decode
+
+    Yield:
+        Message for SOF packets, the packet itself for ACK, NAK and CAN, and
+        for registered messages with a malformed body
+
+    """
+    for packet in packets:
+        try:
+            yield decode(packet)
+        except ValueError:
+            yield packet
+
+
+def filtered(packets, preamble=None, packet_type=None, message_types=None,
+             predicate=None):
+    """Keep packets matching every given condition
+
+    Arguments:
+        packets (iterable(Packet)): to filter
+
+    Keyword Arguments:
+        preamble (int): Preamble to keep, default is None for any
+        packet_type (int): PacketType to keep, default is None for any
+        message_types (iterable(int)): MessageTypes to keep, default is None
+            for any
+        predicate (callable): called with every packet, keep if True,
+            default is None
+
+    Yield:
+        matching packets
+
+    """
+    if message_types is not None:
+        message_types = frozenset(message_types)
+    for packet in packets:
+        if preamble is not None and packet.preamble != preamble:
+            continue
+        if packet_type is not None and packet.packet_type != packet_type:
+            continue
+        if (message_types is not None and
+                packet.message_type not in message_types):
+            continue
+        if predicate is not None and not predicate(packet):
+            continue
+        yield packet
+
+
+def iter_messages(source, strict=False, size=CHUNK_SIZE, **conditions):
+    """Parse, filter and decode messages from a byte source
+
+    Arguments:
+        source: any source accepted by iter_chunks
+
+    Keyword Arguments:
+        strict (bool): raise parsing exceptions, default is False
+        size (int): maximum bytes read at once, default is CHUNK_SIZE
+        conditions: keyword arguments of filtered
+
+    Yield:
+        Message, or Packet, as yielded by decoded
+
+    """
+    return decoded(filtered(iter_packets(source, strict=strict, size=size),
+                            **conditions))
@@ -0,0 +1,205 @@
+"""
+Copyright (C) 2016 Jan Kasiak
+
+This file is part of pyzwave.
+
+    pyzwave is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    pyzwave is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with pyzwave.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import collections
+import random
+
+
+class Tracer(object):
+    """Hooks called on parser and controller events, with time.monotonic_ns
+    timestamps. Every method does nothing, override the ones of interest.
+
+    Attach to the tracer attribute of a PacketParser and/or a
+    ZWaveController. With no tracer attached, the cost is a single
+    attribute check.
+
+    """
+
+    def frame_start(self, timestamp):
+        """PacketParser got the SOF byte of a data frame
+
+        Arguments:
+            timestamp (int): monotonic nanoseconds
+
+        """
+
+    def frame_complete(self, timestamp, packet):
+        """PacketParser finished a frame
+
+        Arguments:
+            timestamp (int): monotonic nanoseconds
+            packet (FrozenPacket): parsed frame
+
+        """
+
+    def error(self, timestamp, error):
+        """PacketParser discarded malformed bytes, also when not strict
+
+        Arguments:
+            timestamp (int): monotonic nanoseconds
+            error (PacketParserException): what was discarded
+
+        """
+
+    def before_write(self, timestamp, data):
+        """ZWaveController is about to write to the device
+
+        Arguments:
+            timestamp (int): monotonic nanoseconds
+            data (bytes): to write
+
+        """
+
+    def after_write(self, timestamp, data):
+        """ZWaveController wrote to the device
+
+        Arguments:
+            timestamp (int): monotonic nanoseconds
+            data (bytes): written
+
+        """
+
+    def frame_received(self, timestamp, packet):
+        """ZWaveController received a frame from the device
+
+        Arguments:
+            timestamp (int): monotonic nanoseconds
+            packet (FrozenPacket): received frame
+
+        """
+
+    def ack_sent(self, timestamp, packets):
+        """ZWaveController sent ACKs and NAKs for received frames. For
+        ThreadedZWaveController, they were queued for the writer thread
+
+        Arguments:
+            timestamp (int): monotonic nanoseconds
+            packets (list(Packet)): ACK and NAK packets sent
+
+        """
+
+
+# Traced event: monotonic nanoseconds, Tracer method name, and arguments
+Event = collections.namedtuple('Event', ['timestamp', 'name', 'args'])
+
+
+class RecordingTracer(Tracer):
+    """Keeps every event
+
+    Attributes:
+        events (collections.deque(Event)): recorded events, oldest first
+
+    """
+
+    def __init__(self, maxlen=None):
+        """
+        Keyword Arguments:
+            maxlen (int): maximum events kept, before the oldest one is
+                dropped, default is None for no limit
+
+        """
+        super(RecordingTracer, self).__init__()
+        self.events = collections.deque(maxlen=maxlen)
+
+    def frame_start(self, timestamp):
+        self.events.append(Event(timestamp, 'frame_start', ()))
+
+    def frame_complete(self, timestamp, packet):
+        self.events.append(Event(timestamp, 'frame_complete', (packet,)))
+
+    def error(self, timestamp, error):
+        self.events.append(Event(timestamp, 'error', (error,)))
+
+    def before_write(self, timestamp, data):
+        self.events.append(Event(timestamp, 'before_write', (data,)))
+
+    def after_write(self, timestamp, data):
+        self.events.append(Event(timestamp, 'after_write', (data,)))
+
+    def frame_received(self, timestamp, packet):
+        self.events.append(Event(timestamp, 'frame_received', (packet,)))
+
+    def ack_sent(self, timestamp, packets):
+        self.events.append(Event(timestamp, 'ack_sent', (packets,)))
+
+
+class SamplingTracer(Tracer):
+    """Passes a random sample of events to another tracer. The start and
+    completion of a frame, and the before and after of a write, are sampled
+    together. Errors are always passed on.
+
+    """
+
+    def __init__(self, tracer, rate, seed=None):
+        """
+        Arguments:
+            tracer (Tracer): to pass sampled events to
+            rate (float): fraction of events passed on, in the range of
+                [0, 1]
+
+        Keyword Arguments:
+            seed (int): random seed, default is None
+
+        """
+        super(SamplingTracer, self).__init__()
+        self.tracer = tracer
+        self.rate = rate
+        self.random = random.Random(seed)
+        # Sampling decision of the ongoing frame, None if none started
+        self.frame_sampled = None
+        # Sampling decision of the ongoing write
+        self.write_sampled = False
+
+    def _sample(self):
+        return self.random.random() < self.rate
+
+    def frame_start(self, timestamp):
+        self.frame_sampled = self._sample()
+        if self.frame_sampled:
+            self.tracer.frame_start(timestamp)
+
+    def frame_complete(self, timestamp, packet):
+        sampled = self.frame_sampled
+        self.frame_sampled = None
+        if sampled is None:
+            # ACK, NAK and CAN have no frame_start
+            sampled = self._sample()
+        if sampled:
+            self.tracer.frame_complete(timestamp, packet)
+
+    def error(self, timestamp, error):
+        self.frame_sampled = None
+        self.tracer.error(timestamp, error)
+
+    def before_write(self, timestamp, data):
+        self.write_sampled = self._sample()
+        if self.write_sampled:
+            self.tracer.before_write(timestamp, data)
+
+    def after_write(self, timestamp, data):
+        if self.write_sampled:
+            self.tracer.after_write(timestamp, data)
+
+    def frame_received(self, timestamp, packet):
+        if self._sample():
+            self.tracer.frame_received(timestamp, packet)
+
+    def ack_sent(self, timestamp, packets):
+        if self._sample():
+            self.tracer.ack_sent(timestamp, packets)